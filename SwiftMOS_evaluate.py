@@ -43,14 +43,41 @@ def mapping(label, mapdict):
     return lut[label]
 
 
-def val(epoch, model, val_loader, category_list, save_path, writer, save_label=True):
+def infer_loader(model, loader, offline_chunk=0):
+    """
+    loader 의 각 프레임에 대해 (pred_cls, batch) 를 순서대로 반환한다. (loader 는 batch_size=1, shuffle=False)
+    offline_chunk > 0 이면 연속된 offline_chunk 개의 프레임을 모아 Encoder 를 한 배치로 실행한다. (MOSNet.infer_sequence)
+    """
+    temporal_res = None
+    if offline_chunk <= 0:
+        for batch in tqdm.tqdm(loader):
+            xyzi, descartes_coord, sphere_coord = batch[:3]
+            pred_cls, temporal_res = model.infer(xyzi.cuda(), descartes_coord.cuda(), sphere_coord.cuda(), temporal_res)
+            yield pred_cls, batch
+        return
+
+    chunk = []
+    for i, batch in enumerate(tqdm.tqdm(loader)):
+        chunk.append(batch)
+        if len(chunk) < offline_chunk and i < len(loader) - 1:
+            continue
+
+        xyzi = torch.cat([b[0] for b in chunk], dim=0).cuda()
+        descartes_coord = torch.cat([b[1] for b in chunk], dim=0).cuda()
+        sphere_coord = torch.cat([b[2] for b in chunk], dim=0).cuda()
+        pred_cls, temporal_res = model.infer_sequence(xyzi, descartes_coord, sphere_coord, temporal_res, chunk_size=offline_chunk)
+        for j, b in enumerate(chunk):
+            yield pred_cls[j : j + 1], b
+        chunk = []
+
+
+def val(epoch, model, val_loader, category_list, save_path, writer, save_label=True, offline_chunk=0):
     criterion_cate = MultiClassMetric(category_list)
     model.eval()
 
     f = open(os.path.join(save_path, "val_log.txt"), "a")
     with torch.no_grad():
-        temporal_res = None
-        for (
+        for pred_cls, (
             xyzi,
             descartes_coord,
             sphere_coord,
@@ -59,8 +86,7 @@ def val(epoch, model, val_loader, category_list, save_path, writer, save_label=T
             valid_mask_list,
             pad_length_list,
             meta_list_raw,
-        ) in tqdm.tqdm(val_loader):
-            pred_cls, temporal_res = model.infer(xyzi.cuda(), descartes_coord.cuda(), sphere_coord.cuda(), temporal_res)
+        ) in infer_loader(model, val_loader, offline_chunk):
             pred_cls = F.softmax(pred_cls[0].squeeze(-1), dim=0).T.contiguous()  # 160000, 3
             label = label[0, :, 0].contiguous()  # 160000,
             criterion_cate.addBatch(label.cpu(), pred_cls.cpu())
@@ -101,20 +127,18 @@ def val(epoch, model, val_loader, category_list, save_path, writer, save_label=T
         f.close()
 
 
-def test(model, test_loader, save_path):
+def test(model, test_loader, save_path, offline_chunk=0):
     model.eval()
 
     with torch.no_grad():
-        temporal_res = None
-        for (
+        for pred_cls, (
             xyzi,
             descartes_coord,
             sphere_coord,
             valid_mask_list,
             pad_length_list,
             meta_list_raw,
-        ) in tqdm.tqdm(test_loader):
-            pred_cls, temporal_res = model.infer(xyzi.cuda(), descartes_coord.cuda(), sphere_coord.cuda(), temporal_res)
+        ) in infer_loader(model, test_loader, offline_chunk):
             pred_cls = F.softmax(pred_cls[0].squeeze(-1), dim=0).T.contiguous()  # 160000, 3
 
             valid_mask = valid_mask_list[0].reshape(-1)
@@ -168,7 +192,16 @@ def main(args, config):
         pretrain_model = os.path.join(model_prefix, "{}-checkpoint.pth".format(model_epoch))
         print("pretrain_model:", pretrain_model)
         model.load_state_dict(torch.load(pretrain_model, map_location="cpu")["model_state_dict"])
-        val(model_epoch, model, eval_loader, pGen.category_list, save_path, None, save_label=args.save_label)
+        val(
+            model_epoch,
+            model,
+            eval_loader,
+            pGen.category_list,
+            save_path,
+            None,
+            save_label=args.save_label,
+            offline_chunk=args.offline_chunk,
+        )
 
     elif args.eval_mode == "test":
         for seq in range(11, 22):
@@ -191,7 +224,7 @@ def main(args, config):
             pretrain_model = os.path.join(model_prefix, "{}-checkpoint.pth".format(model_epoch))
             print("pretrain_model:", pretrain_model)
             model.load_state_dict(torch.load(pretrain_model, map_location="cpu")["model_state_dict"])
-            test(model, eval_loader, save_path)
+            test(model, eval_loader, save_path, offline_chunk=args.offline_chunk)
 
 
 if __name__ == "__main__":
@@ -200,6 +233,7 @@ if __name__ == "__main__":
     parser.add_argument("--model_epoch", type=int, default=0)
     parser.add_argument("--eval_mode", type=str, default="val")
     parser.add_argument("--save_label", default=False, action="store_true")
+    parser.add_argument("--offline_chunk", type=int, default=0, help="frames per encoder batch (0: frame-by-frame infer)")
 
     args = parser.parse_args()
     config = importlib.import_module(args.config.replace(".py", "").replace("/", "."))
@@ -0,0 +1,121 @@
+import argparse
+import importlib
+import os
+import time
+
+import numpy as np
+import torch
+import torch.backends.cudnn as cudnn
+import torch.nn.functional as F
+import tqdm
+import yaml
+
+from datasets import utils
+from networks import MainNetwork
+from networks.Streaming import StreamingMOSNet
+from utils.metric import MultiClassMetric
+
+cudnn.benchmark = True
+cudnn.enabled = True
+
+
+def read_sequence(seq_dir, seq_id):
+    """(fname_pcd, fname_label, pose) 를 프레임 순서대로 반환"""
+    fpath = os.path.join(seq_dir, seq_id)
+    calib = utils.parse_calibration(os.path.join(fpath, "calib.txt"))
+    poses_list = utils.parse_poses(os.path.join(fpath, "poses.txt"), calib)
+    for i, pose in enumerate(poses_list):
+        file_id = str(i).rjust(6, "0")
+        fname_pcd = os.path.join(fpath, "velodyne", "{}.bin".format(file_id))
+        fname_label = os.path.join(fpath, "labels", "{}.label".format(file_id))
+        yield fname_pcd, fname_label, pose
+
+
+def main(args, config):
+    """
+    validation split 에서 StreamingMOSNet 의 각 mode 를 같은 프레임 순서로 실행하여
+    정확도 (moving IoU, exact 대비 label 일치율) 와 프레임당 latency 를 비교한다.
+    """
+    pGen, pDataset, pModel, pOpt = config.get_config()
+
+    prefix = pGen.name
+    save_path = os.path.join("experiments", prefix)
+    model_prefix = os.path.join(save_path, "checkpoint")
+
+    with open("datasets/semantic-kitti.yaml", "r") as f:
+        task_cfg = yaml.load(f, Loader=yaml.FullLoader)
+
+    model = MainNetwork.MOSNet(pModel)
+    pretrain_model = os.path.join(model_prefix, "{}-checkpoint.pth".format(args.model_epoch))
+    print("pretrain_model:", pretrain_model)
+    model.load_state_dict(torch.load(pretrain_model, map_location="cpu")["model_state_dict"])
+    model.cuda()
+    model.eval()
+
+    modes = args.modes
+    streams = {mode: StreamingMOSNet(model, pDataset.Val, mode=mode, warp_interp=args.warp_interp) for mode in modes}
+    metrics = {mode: MultiClassMetric(pGen.category_list) for mode in modes}
+    latency = {mode: [] for mode in modes}
+    agree = {mode: [0, 0] for mode in modes}  # exact 와 label 이 같은 포인트 수, 전체 포인트 수
+
+    seq_split = [str(i).rjust(2, "0") for i in task_cfg["split"]["valid"]]
+    for seq_id in seq_split:
+        for stream in streams.values():
+            stream.reset()
+
+        frames = list(read_sequence(pDataset.Val.SeqDir, seq_id))
+        if args.max_frames > 0:
+            frames = frames[: args.max_frames]
+
+        for fname_pcd, fname_label, pose in tqdm.tqdm(frames, desc=seq_id):
+            pcds = np.fromfile(fname_pcd, dtype=np.float32).reshape((-1, 4))
+            sem_label = np.fromfile(fname_label, dtype=np.uint32).reshape((-1)) & 0xFFFF
+            label = utils.relabel(sem_label, task_cfg["learning_map"])
+
+            pred_map = {}
+            for mode in modes:
+                torch.cuda.synchronize()
+                start = time.time()
+                pred_cls, valid_mask = streams[mode].step(pcds, pose)
+                torch.cuda.synchronize()
+                latency[mode].append(time.time() - start)
+
+                valid_num = int(valid_mask.sum())
+                pred_cls = F.softmax(pred_cls[0, :, :valid_num, 0], dim=0).T.contiguous()  # valid_num, 3
+                metrics[mode].addBatch(torch.from_numpy(label[valid_mask].astype(np.int64)), pred_cls.cpu())
+                pred_map[mode] = pred_cls.argmax(dim=1)
+
+            if "exact" in pred_map:
+                for mode in modes:
+                    agree[mode][0] += int((pred_map[mode] == pred_map["exact"]).sum())
+                    agree[mode][1] += pred_map[mode].shape[0]
+
+    string = "mode; latency(ms) mean / p50 / p90; moving iou; agree with exact\n"
+    for mode in modes:
+        metric_cate = metrics[mode].get_metric()
+        lat = np.array(latency[mode][args.warmup :]) * 1000
+        string += "{}; {:.2f} / {:.2f} / {:.2f}; {:.4f}; {}\n".format(
+            mode,
+            lat.mean(),
+            np.percentile(lat, 50),
+            np.percentile(lat, 90),
+            metric_cate["moving iou"],
+            "{:.4f}".format(agree[mode][0] / agree[mode][1]) if agree[mode][1] > 0 else "-",
+        )
+    print(string)
+    with open(os.path.join(save_path, "stream_eval_log.txt"), "a") as f:
+        f.write("Epoch {}\n".format(args.model_epoch) + string)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="streaming inference accuracy / latency report")
+    parser.add_argument("--config", help="config file path", type=str)
+    parser.add_argument("--model_epoch", type=int, default=0)
+    parser.add_argument("--modes", nargs="+", default=list(StreamingMOSNet.modes), choices=StreamingMOSNet.modes)
+    parser.add_argument("--warp_interp", type=str, default="nearest", choices=("nearest", "bilinear"))
+    parser.add_argument("--max_frames", type=int, default=0, help="frames per sequence (0: all)")
+    parser.add_argument("--warmup", type=int, default=10, help="frames excluded from latency statistics")
+
+    args = parser.parse_args()
+    config = importlib.import_module(args.config.replace(".py", "").replace("/", "."))
+    main(args, config)
@@ -5,6 +5,9 @@ def get_config():
         batch_size_per_gpu = 3
 
         SeqDir = "/home/ssd_4tb/minjae/KITTI/dataset/sequences"
+        PackedDir = None  # datasets.packed 로 변환한 시퀀스 디렉토리 (없는 시퀀스는 SeqDir 에서 읽음)
+        IndexCacheDir = "experiments/sample_index"  # datasets.sample_index.SampleIndex 를 저장할 디렉토리 (None: 매번 생성)
+        TensorCacheDir = "experiments/tensor_cache"  # DataloadVal / DataloadTest 의 전처리 결과 (python -m datasets.tensor_cache, 없으면 매번 계산)
         category_list = ["static", "moving"]
 
         loss_mode = "ohem"
@@ -29,7 +32,11 @@ def get_config():
         class Train:
             num_workers = 4
             frame_point_num = 160000
+            frame_cache_size = 16  # worker 별로 보관할 디코딩된 프레임 수 (datasets.frame_cache.FrameCache, 0: 캐시 없음)
+            window_chunk = 0  # > 0: WindowSampler 로 연속된 window_chunk 개 샘플을 같은 worker 에 배정 (frame cache hit 증가), 0: DistributedSampler
             SeqDir = General.SeqDir
+            PackedDir = General.PackedDir
+            IndexCacheDir = General.IndexCacheDir
             Voxel = General.Voxel
             seq_num = General.K + 1
 
@@ -48,14 +55,22 @@ def get_config():
         class Val:
             num_workers = 3
             frame_point_num = 160000
+            frame_cache_size = 8
             SeqDir = General.SeqDir
+            PackedDir = General.PackedDir
+            IndexCacheDir = General.IndexCacheDir
+            TensorCacheDir = General.TensorCacheDir
             Voxel = General.Voxel
             seq_num = General.K + 1
 
         class Test:
             num_workers = 3
             frame_point_num = 160000
+            frame_cache_size = 8
             SeqDir = General.SeqDir
+            PackedDir = General.PackedDir
+            IndexCacheDir = General.IndexCacheDir
+            TensorCacheDir = General.TensorCacheDir
             Voxel = General.Voxel
             seq_num = General.K + 1
 
@@ -66,6 +81,9 @@ def get_config():
         loss_mode = General.loss_mode
         seq_num = General.K + 1
         fusion_mode = "CatFusion"
+        batch_stages = False  # True: 3개 stage 의 Encoder 를 한 배치로 실행 (BN 은 stage 별로 정규화)
+        sparse_bev = False  # True: BEV 투영을 포인트가 있는 cell 만 sparse pooling 하고 descartes_l1 직전에 한 번만 dense 로 변환
+        fused_point_bev = False  # True: inference 에서 t_0 이외 프레임의 PointNet + BEV 투영을 포인트 feature 없이 한 번에 계산 (CUDA kernel 미검증)
         point_feat_out_channels = 64
 
         class BEVParam:
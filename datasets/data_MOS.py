@@ -4,23 +4,28 @@ import numpy as np
 import yaml
 import deep_point
 from . import utils, copy_paste
+from .frame_cache import FrameCache
+from .packed import PackedStore
+from .sample_index import SampleIndex
+from .tensor_cache import TensorCache
 import os
 import random
 
 
 def VoxelMaxPool(pcds_feat, pcds_ind, output_size, scale_rate):
+    # deep_point 는 정수 feature 도 pooling 하므로 label 을 float 로 변환하지 않음
     voxel_feat = deep_point.VoxelMaxPool(
-        pcds_feat=pcds_feat.float(),
+        pcds_feat=pcds_feat,
         pcds_ind=pcds_ind,
         output_size=output_size,
         scale_rate=scale_rate,
-    ).to(pcds_feat.dtype)
+    )
     return voxel_feat
 
 
 def generate_img_labels(coord, label, size):
     coord = torch.clone(coord[:1, :, :2, :])  # 1, 160000, 2, 1
-    label = torch.clone(label).unsqueeze(0).unsqueeze(0)  # 1, 1, 160000, 1
+    label = torch.clone(label).unsqueeze(0).unsqueeze(0)  # 1, 1, 160000, 1 (int64)
     img_label = (
         VoxelMaxPool(
             pcds_feat=label,
@@ -36,34 +41,20 @@ def generate_img_labels(coord, label, size):
     return img_label  # H, W, 1
 
 
-def make_point_feat(pcds_xyzi, pcds_coord):
-    # make point feat
-    x = pcds_xyzi[:, 0].copy()
-    y = pcds_xyzi[:, 1].copy()
-    z = pcds_xyzi[:, 2].copy()
-    intensity = pcds_xyzi[:, 3].copy()
-
-    dist = np.sqrt(x**2 + y**2 + z**2) + 1e-12
-
-    # grid diff
-    diff_x = pcds_coord[:, 0] - np.floor(pcds_coord[:, 0])
-    diff_y = pcds_coord[:, 1] - np.floor(pcds_coord[:, 1])
-
-    point_feat = np.stack((x, y, z, intensity, dist, diff_x, diff_y), axis=-1)
-    return point_feat
-
-
 other_mode = "sphere"
 
 
 class DataloadTrain(Dataset):
     def __init__(self, config):
-        self.flist = []
         self.config = config
         self.frame_point_num = config.frame_point_num
         self.Voxel = config.Voxel
         with open("datasets/semantic-kitti.yaml", "r") as f:
             self.task_cfg = yaml.load(f, Loader=yaml.FullLoader)
+        # 겹치는 window 끼리 디코딩한 프레임을 재사용 (DataLoader worker 마다 별도)
+        # PackedDir 에 변환된 시퀀스 (datasets.packed) 는 memmap 에서 읽음
+        packed = PackedStore(config.PackedDir, self.task_cfg["learning_map"]) if config.PackedDir else None
+        self.frame_cache = FrameCache(config.frame_cache_size, self.task_cfg["learning_map"], packed)
 
         self.cp_aug = None
         if config.CopyPasteAug.is_use:
@@ -85,63 +76,10 @@ class DataloadTrain(Dataset):
             size_range=(1, 1),
         )
 
-        seq_num = config.seq_num + 2
         # add training data
+        # (meta_list, meta_list_raw) 는 SampleIndex 가 index 마다 만들어 반환 (window 는 seq_num + 2 프레임)
         self.seq_split = [str(i).rjust(2, "0") for i in self.task_cfg["split"]["train"]]
-        for seq_id in self.seq_split:
-            fpath = os.path.join(config.SeqDir, seq_id)
-            fpath_pcd = os.path.join(fpath, "velodyne")
-            fpath_label = os.path.join(fpath, "labels")
-
-            fname_calib = os.path.join(fpath, "calib.txt")
-            fname_pose = os.path.join(fpath, "poses.txt")
-
-            calib = utils.parse_calibration(fname_calib)
-            poses_list = utils.parse_poses(fname_pose, calib)
-            for i in range(len(poses_list)):
-                meta_list = []
-                meta_list_raw = []
-                current_pose_inv = np.linalg.inv(poses_list[i])
-                if i < (seq_num - 1):
-                    # backward
-                    for ht in range(seq_num):
-                        file_id = str(i + ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i + ht])
-                        meta_list.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                        meta_list_raw.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                elif i > (len(poses_list) - seq_num):
-                    # forward
-                    for ht in range(seq_num):
-                        file_id = str(i - ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i - ht])
-                        meta_list.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                        meta_list_raw.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                else:
-                    # forward
-                    for ht in range(seq_num):
-                        file_id = str(i - ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i - ht])
-                        meta_list_raw.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-
-                    # backward
-                    for ht in range(seq_num):
-                        file_id = str(i + ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i + ht])
-                        meta_list.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-
-                self.flist.append((meta_list, meta_list_raw))
+        self.flist = SampleIndex.load(config.SeqDir, self.seq_split, config.seq_num + 2, cache_dir=config.IndexCacheDir)
 
         rank = int(os.environ["LOCAL_RANK"])
         if rank == 0:
@@ -173,15 +111,11 @@ class DataloadTrain(Dataset):
                 keep_dict[seq_id] = set()
             keep_dict[seq_id].add(file_id)
 
-        new_flist = []
-        for meta_list, meta_list_raw in self.flist:
-            center_seq_id = meta_list[0][3]
-            center_file_id = meta_list[0][4]
-
-            if center_seq_id in keep_dict and center_file_id in keep_dict[center_seq_id]:
-                new_flist.append((meta_list, meta_list_raw))
-
-        self.flist = new_flist
+        keep = [
+            center_seq_id in keep_dict and center_file_id in keep_dict[center_seq_id]
+            for center_seq_id, center_file_id in self.flist.center()
+        ]
+        self.flist = self.flist.select(np.array(keep, dtype=bool))
 
     def sample_flist(self):
         """flist를 샘플링해서 크기를 줄이는 메서드"""
@@ -195,8 +129,7 @@ class DataloadTrain(Dataset):
         sampled_indices = random.sample(range(original_size), target_size)
 
         # 샘플링된 인덱스로 새로운 flist 생성
-        new_flist = [self.flist[i] for i in sampled_indices]
-        self.flist = new_flist
+        self.flist = self.flist.select(np.array(sampled_indices, dtype=np.int64))
 
         rank = int(os.environ["LOCAL_RANK"])
         if rank == 0:
@@ -205,34 +138,8 @@ class DataloadTrain(Dataset):
     def form_batch(self, pcds_total):
         pcds_total = self.aug(pcds_total)
 
-        N = pcds_total.shape[0] // self.config.seq_num
-        pcds_xyzi = pcds_total[:, :4]
-
-        pcds_descartes_coord = utils.Quantize(
-            pcds_xyzi,
-            range_x=self.Voxel.range_x,
-            range_y=self.Voxel.range_y,
-            range_z=self.Voxel.range_z,
-            size=self.Voxel.descartes_shape,
-        )
-
-        pcds_sphere_coord = utils.SphereQuantize(
-            pcds_xyzi,
-            phi_range=self.Voxel.range_phi,
-            theta_range=self.Voxel.range_theta,
-            r_range=self.Voxel.range_r,
-            size=self.Voxel.sphere_shape,
-        )
-
-        # make feature
-        pcds_xyzi = make_point_feat(pcds_xyzi, pcds_descartes_coord)
-        pcds_xyzi = torch.FloatTensor(pcds_xyzi.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-        pcds_xyzi = pcds_xyzi.permute(0, 2, 1, 3).contiguous()
-
-        pcds_descartes_coord = torch.FloatTensor(pcds_descartes_coord.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-        pcds_sphere_coord = torch.FloatTensor(pcds_sphere_coord.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-
-        return pcds_xyzi, pcds_descartes_coord, pcds_sphere_coord
+        # Quantize, SphereQuantize, 포인트 feature 를 최종 layout 의 float32 버퍼에 바로 계산
+        return utils.form_batch(pcds_total, self.config.seq_num, self.Voxel)
 
     def form_seq(self, meta_list):
         pc_list = []
@@ -240,23 +147,15 @@ class DataloadTrain(Dataset):
         pc_raw_label_list = []
         pc_road_list = []
         for ht in range(self.config.seq_num):
-            fname_pcd, fname_label, pose_diff, _, _ = meta_list[ht]
-            # load pcd
-            pcds_tmp = np.fromfile(fname_pcd, dtype=np.float32).reshape((-1, 4))
-            pcds_ht = utils.Trans(pcds_tmp, pose_diff)
+            fname_pcd, fname_label, pose_diff, seq_id, file_id = meta_list[ht]
+            # load pcd, label (캐시된 배열은 read-only, Trans 는 복사본을 반환)
+            frame = self.frame_cache.load(seq_id, file_id, fname_pcd, fname_label)
+            pcds_ht = utils.Trans(frame.xyzi, pose_diff)
             pc_list.append(pcds_ht)
 
-            # load label
-            pcds_label = np.fromfile(fname_label, dtype=np.uint32)
-            pcds_label = pcds_label.reshape((-1))
-            sem_label = pcds_label & 0xFFFF
-            inst_label = pcds_label >> 16
-
-            pc_road_list.append(pcds_ht[sem_label == 40])
-
-            pcds_label_use = utils.relabel(sem_label, self.task_cfg["learning_map"])
-            pc_label_list.append(pcds_label_use)
-            pc_raw_label_list.append(sem_label)
+            pc_road_list.append(pcds_ht[frame.road])
+            pc_label_list.append(frame.label)
+            pc_raw_label_list.append(frame.sem_label)
 
         return pc_list, pc_label_list, pc_road_list, pc_raw_label_list
 
@@ -292,20 +191,13 @@ class DataloadTrain(Dataset):
             for ht in range(len(pc_list)):
                 pad_length = self.frame_point_num - pc_list[ht].shape[0]
                 assert pad_length > 0
-                pc_list[ht] = np.pad(
-                    pc_list[ht],
-                    ((0, pad_length), (0, 0)),
-                    "constant",
-                    constant_values=-1000,
-                )
-                pc_list[ht][-pad_length:, 2] = -4000
-
                 pc_label_list[ht] = np.pad(pc_label_list[ht], ((0, pad_length),), "constant", constant_values=0)
 
-            pc_list = np.concatenate(pc_list, axis=0)
+            # padding 하여 이어 붙인 (3 * 160000, 4) 버퍼 (새로 할당하므로 augmentation 이 pc_list 를 바꾸지 않음)
+            pc_total = utils.pad_frames(pc_list, self.frame_point_num)
 
             # [3, 7, 160000, 1], [3, 160000, 3, 1], [3, 160000, 2, 1]
-            xyzi, descartes_coord, sphere_coord = self.form_batch(pc_list.copy())
+            xyzi, descartes_coord, sphere_coord = self.form_batch(pc_total)
             label_3D = torch.LongTensor(pc_label_list[0].astype(np.long)).unsqueeze(-1)
             label_2D = generate_img_labels(descartes_coord, label_3D, size=(256, 256))
 
@@ -338,124 +230,48 @@ class DataloadTrain(Dataset):
 
 class DataloadVal(Dataset):
     def __init__(self, config):
-        self.flist = []
         self.config = config
         self.frame_point_num = config.frame_point_num
         self.Voxel = config.Voxel
         with open("datasets/semantic-kitti.yaml", "r") as f:
             self.task_cfg = yaml.load(f, Loader=yaml.FullLoader)
+        # 겹치는 window 끼리 디코딩한 프레임을 재사용 (DataLoader worker 마다 별도)
+        # PackedDir 에 변환된 시퀀스 (datasets.packed) 는 memmap 에서 읽음
+        packed = PackedStore(config.PackedDir, self.task_cfg["learning_map"]) if config.PackedDir else None
+        self.frame_cache = FrameCache(config.frame_cache_size, self.task_cfg["learning_map"], packed)
 
-        seq_num = config.seq_num
         # add validation data
         seq_split = [str(i).rjust(2, "0") for i in self.task_cfg["split"]["valid"]]
-        for seq_id in seq_split:
-            fpath = os.path.join(config.SeqDir, seq_id)
-            fpath_pcd = os.path.join(fpath, "velodyne")
-            fpath_label = os.path.join(fpath, "labels")
-
-            fname_calib = os.path.join(fpath, "calib.txt")
-            fname_pose = os.path.join(fpath, "poses.txt")
-
-            calib = utils.parse_calibration(fname_calib)
-            poses_list = utils.parse_poses(fname_pose, calib)
-            for i in range(len(poses_list)):
-                meta_list = []
-                meta_list_raw = []
-                current_pose_inv = np.linalg.inv(poses_list[i])
-                if i < (seq_num - 1):
-                    # backward
-                    for ht in range(seq_num):
-                        file_id = str(i + ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i + ht])
-                        meta_list.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                        meta_list_raw.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                elif i > (len(poses_list) - seq_num):
-                    # forward
-                    for ht in range(seq_num):
-                        file_id = str(i - ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i - ht])
-                        meta_list.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                        meta_list_raw.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-                else:
-                    # forward
-                    for ht in range(seq_num):
-                        file_id = str(i - ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i - ht])
-                        meta_list_raw.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-
-                    # backward
-                    for ht in range(seq_num):
-                        file_id = str(i + ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        fname_label = os.path.join(fpath_label, "{}.label".format(file_id))
-
-                        pose_diff = current_pose_inv.dot(poses_list[i + ht])
-                        meta_list.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
-
-                self.flist.append((meta_list, meta_list_raw))
-
-    def form_batch(self, pcds_total):
-        N = pcds_total.shape[0] // self.config.seq_num
-        pcds_xyzi = pcds_total[:, :4]
-
-        pcds_descartes_coord = utils.Quantize(
-            pcds_xyzi,
-            range_x=self.Voxel.range_x,
-            range_y=self.Voxel.range_y,
-            range_z=self.Voxel.range_z,
-            size=self.Voxel.descartes_shape,
-        )
-
-        pcds_sphere_coord = utils.SphereQuantize(
-            pcds_xyzi,
-            phi_range=self.Voxel.range_phi,
-            theta_range=self.Voxel.range_theta,
-            r_range=self.Voxel.range_r,
-            size=self.Voxel.sphere_shape,
+        self.flist = SampleIndex.load(config.SeqDir, seq_split, config.seq_num, cache_dir=config.IndexCacheDir)
+        # python -m datasets.tensor_cache 로 저장한 전처리 결과가 있으면 읽기만 함 (없으면 None, 매번 계산)
+        self.tensor_cache = TensorCache.open(
+            config.TensorCacheDir, config, seq_split, with_labels=True, learning_map=self.task_cfg["learning_map"]
         )
 
-        # make feature
-        pcds_xyzi = make_point_feat(pcds_xyzi, pcds_descartes_coord)
-        pcds_xyzi = torch.FloatTensor(pcds_xyzi.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-        pcds_xyzi = pcds_xyzi.permute(0, 2, 1, 3).contiguous()
-
-        pcds_descartes_coord = torch.FloatTensor(pcds_descartes_coord.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-        pcds_sphere_coord = torch.FloatTensor(pcds_sphere_coord.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-
-        return pcds_xyzi, pcds_descartes_coord, pcds_sphere_coord
+    def form_batch(self, pcds_total):
+        # Quantize, SphereQuantize, 포인트 feature 를 최종 layout 의 float32 버퍼에 바로 계산
+        return utils.form_batch(pcds_total, self.config.seq_num, self.Voxel)
 
     def form_seq(self, meta_list):
         pc_list = []
         pc_label_list = []
         for ht in range(self.config.seq_num):
-            fname_pcd, fname_label, pose_diff, _, _ = meta_list[ht]
-            pcds_tmp = np.fromfile(fname_pcd, dtype=np.float32).reshape((-1, 4))
-            pcds_ht = utils.Trans(pcds_tmp, pose_diff)
+            fname_pcd, fname_label, pose_diff, seq_id, file_id = meta_list[ht]
+            frame = self.frame_cache.load(seq_id, file_id, fname_pcd, fname_label)
+            pcds_ht = utils.Trans(frame.xyzi, pose_diff)
             pc_list.append(pcds_ht)
-
-            # load label
-            pcds_label = np.fromfile(fname_label, dtype=np.uint32)
-            pcds_label = pcds_label.reshape((-1))
-            sem_label = pcds_label & 0xFFFF
-            inst_label = pcds_label >> 16
-
-            pcds_label_use = utils.relabel(sem_label, self.task_cfg["learning_map"])
-            pc_label_list.append(pcds_label_use)
+            pc_label_list.append(frame.label)
 
         return pc_list, pc_label_list
 
     def __getitem__(self, index):
         meta_list, meta_list_raw = self.flist[index]
+        if self.tensor_cache is not None:
+            return self.tensor_cache.read(index) + (meta_list_raw,)
+        return self.process(meta_list_raw) + (meta_list_raw,)
 
+    def process(self, meta_list_raw):
+        """augmentation 이 없으므로 window 마다 항상 같은 결과 (datasets.tensor_cache 에 저장 가능)"""
         pc_list, pc_label_list = self.form_seq(meta_list_raw)
 
         valid_mask_list = []
@@ -474,20 +290,10 @@ class DataloadVal(Dataset):
         for ht in range(len(pc_list)):
             pad_length = self.frame_point_num - pc_list[ht].shape[0]
             assert pad_length >= 0
-            pc_list[ht] = np.pad(
-                pc_list[ht],
-                ((0, pad_length), (0, 0)),
-                "constant",
-                constant_values=-1000,
-            )
-            pc_list[ht][-pad_length:, 2] = -4000
-
             pc_label_list[ht] = np.pad(pc_label_list[ht], ((0, pad_length),), "constant", constant_values=0)
             pad_length_list.append(pad_length)
 
-        pc_list = np.concatenate(pc_list, axis=0)
-
-        xyzi, descartes_coord, sphere_coord = self.form_batch(pc_list.copy())
+        xyzi, descartes_coord, sphere_coord = self.form_batch(utils.pad_frames(pc_list, self.frame_point_num))
         label_3D = torch.LongTensor(pc_label_list[0].astype(np.long)).unsqueeze(-1)
         label_2D = generate_img_labels(descartes_coord, label_3D, size=(256, 256))
 
@@ -499,7 +305,6 @@ class DataloadVal(Dataset):
             label_2D,  # [32, 1024, 1]
             valid_mask_list,
             pad_length_list,
-            meta_list_raw,
         )
 
     def __len__(self):
@@ -508,105 +313,44 @@ class DataloadVal(Dataset):
 
 class DataloadTest(Dataset):
     def __init__(self, config, seq):
-        self.flist = []
         self.config = config
         self.frame_point_num = config.frame_point_num
         self.Voxel = config.Voxel
         with open("datasets/semantic-kitti.yaml", "r") as f:
             self.task_cfg = yaml.load(f, Loader=yaml.FullLoader)
-
-        seq_num = config.seq_num
-        # add validation data
-        seq_split = [seq]
-
-        for seq_id in seq_split:
-            fpath = os.path.join(config.SeqDir, seq_id)
-            fpath_pcd = os.path.join(fpath, "velodyne")
-            fname_calib = os.path.join(fpath, "calib.txt")
-            fname_pose = os.path.join(fpath, "poses.txt")
-
-            calib = utils.parse_calibration(fname_calib)
-            poses_list = utils.parse_poses(fname_pose, calib)
-            for i in range(len(poses_list)):
-                meta_list = []
-                meta_list_raw = []
-                current_pose_inv = np.linalg.inv(poses_list[i])
-                if i < (seq_num - 1):
-                    # backward
-                    for ht in range(seq_num):
-                        file_id = str(i + ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        pose_diff = current_pose_inv.dot(poses_list[i + ht])
-                        meta_list.append((fname_pcd, pose_diff, seq_id, file_id))
-                        meta_list_raw.append((fname_pcd, pose_diff, seq_id, file_id))
-                elif i > (len(poses_list) - seq_num):
-                    # forward
-                    for ht in range(seq_num):
-                        file_id = str(i - ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        pose_diff = current_pose_inv.dot(poses_list[i - ht])
-                        meta_list.append((fname_pcd, pose_diff, seq_id, file_id))
-                        meta_list_raw.append((fname_pcd, pose_diff, seq_id, file_id))
-                else:
-                    # forward
-                    for ht in range(seq_num):
-                        file_id = str(i - ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        pose_diff = current_pose_inv.dot(poses_list[i - ht])
-                        meta_list_raw.append((fname_pcd, pose_diff, seq_id, file_id))
-
-                    # backward
-                    for ht in range(seq_num):
-                        file_id = str(i + ht).rjust(6, "0")
-                        fname_pcd = os.path.join(fpath_pcd, "{}.bin".format(file_id))
-                        pose_diff = current_pose_inv.dot(poses_list[i + ht])
-                        meta_list.append((fname_pcd, pose_diff, seq_id, file_id))
-
-                self.flist.append((meta_list, meta_list_raw))
-
-    def form_batch(self, pcds_total):
-        N = pcds_total.shape[0] // self.config.seq_num
-        pcds_xyzi = pcds_total[:, :4]
-
-        pcds_descartes_coord = utils.Quantize(
-            pcds_xyzi,
-            range_x=self.Voxel.range_x,
-            range_y=self.Voxel.range_y,
-            range_z=self.Voxel.range_z,
-            size=self.Voxel.descartes_shape,
-        )
-
-        pcds_sphere_coord = utils.SphereQuantize(
-            pcds_xyzi,
-            phi_range=self.Voxel.range_phi,
-            theta_range=self.Voxel.range_theta,
-            r_range=self.Voxel.range_r,
-            size=self.Voxel.sphere_shape,
+        # 겹치는 window 끼리 디코딩한 프레임을 재사용 (DataLoader worker 마다 별도)
+        # PackedDir 에 변환된 시퀀스 (datasets.packed) 는 memmap 에서 읽음
+        packed = PackedStore(config.PackedDir, self.task_cfg["learning_map"]) if config.PackedDir else None
+        self.frame_cache = FrameCache(config.frame_cache_size, self.task_cfg["learning_map"], packed)
+
+        # add test data
+        self.flist = SampleIndex.load(config.SeqDir, [seq], config.seq_num, with_labels=False, cache_dir=config.IndexCacheDir)
+        self.tensor_cache = TensorCache.open(
+            config.TensorCacheDir, config, [seq], with_labels=False, learning_map=self.task_cfg["learning_map"]
         )
 
-        # make feature
-        pcds_xyzi = make_point_feat(pcds_xyzi, pcds_descartes_coord)
-        pcds_xyzi = torch.FloatTensor(pcds_xyzi.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-        pcds_xyzi = pcds_xyzi.permute(0, 2, 1, 3).contiguous()
-
-        pcds_descartes_coord = torch.FloatTensor(pcds_descartes_coord.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-        pcds_sphere_coord = torch.FloatTensor(pcds_sphere_coord.astype(np.float32)).view(self.config.seq_num, N, -1, 1)
-
-        return pcds_xyzi, pcds_descartes_coord, pcds_sphere_coord
+    def form_batch(self, pcds_total):
+        # Quantize, SphereQuantize, 포인트 feature 를 최종 layout 의 float32 버퍼에 바로 계산
+        return utils.form_batch(pcds_total, self.config.seq_num, self.Voxel)
 
     def form_seq(self, meta_list):
         pc_list = []
         for ht in range(self.config.seq_num):
-            fname_pcd, pose_diff, _, _ = meta_list[ht]
-            pcds_tmp = np.fromfile(fname_pcd, dtype=np.float32).reshape((-1, 4))
-            pcds_ht = utils.Trans(pcds_tmp, pose_diff)
+            fname_pcd, pose_diff, seq_id, file_id = meta_list[ht]
+            frame = self.frame_cache.load(seq_id, file_id, fname_pcd)
+            pcds_ht = utils.Trans(frame.xyzi, pose_diff)
             pc_list.append(pcds_ht)
 
         return pc_list
 
     def __getitem__(self, index):
         meta_list, meta_list_raw = self.flist[index]
+        if self.tensor_cache is not None:
+            return self.tensor_cache.read(index) + (meta_list_raw,)
+        return self.process(meta_list_raw) + (meta_list_raw,)
 
+    def process(self, meta_list_raw):
+        """DataloadVal.process 와 같음 (label 제외)"""
         pc_list = self.form_seq(meta_list_raw)
 
         valid_mask_list = []
@@ -620,22 +364,8 @@ class DataloadTest(Dataset):
             pc_list[ht] = pc_list[ht][valid_mask_ht]
             valid_mask_list.append(valid_mask_ht)
 
-        pad_length_list = []
-        for ht in range(len(pc_list)):
-            pad_length = self.frame_point_num - pc_list[ht].shape[0]
-            assert pad_length >= 0
-            pc_list[ht] = np.pad(
-                pc_list[ht],
-                ((0, pad_length), (0, 0)),
-                "constant",
-                constant_values=-1000,
-            )
-            pc_list[ht][-pad_length:, 2] = -4000
-            pad_length_list.append(pad_length)
-
-        pc_list = np.concatenate(pc_list, axis=0)
-
-        xyzi, descartes_coord, sphere_coord = self.form_batch(pc_list.copy())
+        pad_length_list = [self.frame_point_num - pcds.shape[0] for pcds in pc_list]
+        xyzi, descartes_coord, sphere_coord = self.form_batch(utils.pad_frames(pc_list, self.frame_point_num))
 
         return (
             xyzi,  # [3, 7, 160000, 1]
@@ -643,7 +373,6 @@ class DataloadTest(Dataset):
             sphere_coord,  # [3, 160000, 2, 1]
             valid_mask_list,
             pad_length_list,
-            meta_list_raw,
         )
 
     def __len__(self):
@@ -0,0 +1,150 @@
+import collections
+import math
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+from . import utils
+
+# 디코딩한 프레임 (scan 좌표계, pose 변환 전)
+#   xyzi: (N, 4) float32, sem_label: (N,) label & 0xFFFF, label: (N,) learning_map 으로 relabel, road: (N,) bool (sem_label == 40)
+#   (label 파일에서 읽으면 sem_label, label 은 uint32, datasets.packed 에서 읽으면 uint16, uint8)
+#   label 파일이 없으면 (test) sem_label, label, road 는 None
+# 캐시에서 여러 샘플이 공유하므로 배열은 read-only (수정이 필요하면 복사해서 사용)
+Frame = collections.namedtuple("Frame", ["xyzi", "sem_label", "label", "road"])
+
+
+def load_frame(fname_pcd, fname_label, learning_map):
+    """.bin / .label 파일을 읽어 Frame 으로 디코딩"""
+    xyzi = np.fromfile(fname_pcd, dtype=np.float32).reshape((-1, 4))
+    sem_label = label = road = None
+    if fname_label is not None:
+        pcds_label = np.fromfile(fname_label, dtype=np.uint32).reshape((-1))
+        sem_label = pcds_label & 0xFFFF
+        label = utils.relabel(sem_label, learning_map)
+        road = sem_label == 40
+
+    for array in (xyzi, sem_label, label, road):
+        if array is not None:
+            array.setflags(write=False)
+    return Frame(xyzi, sem_label, label, road)
+
+
+class FrameCache:
+    """
+    (seq_id, file_id) 별로 디코딩한 프레임을 최대 capacity 개까지 보관하는 LRU 캐시
+    연속된 샘플의 window 는 한 프레임만 다르고 DataloadTrain 은 index, index-1, index-2 의 window 를 함께 읽으므로
+    같은 scan 을 여러 번 읽고 relabel 하지 않도록 한다. (capacity 0 이면 캐시 없이 매번 디코딩)
+    Dataset 의 속성으로 두면 DataLoader worker 마다 별도의 캐시가 된다. (worker 간 공유 없음, 메모리는 worker 수 × capacity)
+    hits / misses 로 캐시 효율을 확인할 수 있다.
+    packed: datasets.packed.PackedStore ─ 변환된 시퀀스는 파일 대신 memmap 에서 읽음 (없는 시퀀스는 기존 디렉토리 구조)
+    """
+
+    def __init__(self, capacity, learning_map=None, packed=None):
+        self.capacity = capacity
+        self.learning_map = learning_map
+        self.packed = packed
+        self._frames = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, seq_id, file_id, fname_pcd, fname_label=None):
+        key = (seq_id, file_id)
+        frame = self._frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            self._frames.move_to_end(key)
+            return frame
+
+        self.misses += 1
+        sequence = self.packed.sequence(seq_id) if self.packed is not None else None
+        if sequence is not None and (fname_label is None or sequence.has_labels):
+            frame = sequence.frame(file_id, with_labels=fname_label is not None)
+        else:
+            frame = load_frame(fname_pcd, fname_label, self.learning_map)
+        if self.capacity > 0:
+            self._frames[key] = frame
+            if len(self._frames) > self.capacity:
+                self._frames.popitem(last=False)
+        return frame
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+            "size": len(self._frames),
+        }
+
+    def clear(self):
+        self._frames.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class WindowSampler(Sampler):
+    """
+    DistributedSampler 대신 사용하는 sampler, 연속된 index 를 같은 DataLoader worker 가 처리하도록 순서를 정한다.
+    DataLoader 는 batch k 를 worker k % num_workers 에 보내므로 기본 순서 (shuffle 또는 순차) 에서는
+    이웃한 window 가 서로 다른 worker 로 가서 worker 별 FrameCache 가 거의 hit 하지 않는다.
+      - index 를 chunk_size 개씩 연속된 chunk 로 나누고, shuffle 이면 epoch 마다 chunk 순서만 섞는다 (chunk 안은 순차)
+      - chunk 를 이어 붙인 뒤 replica (rank) 마다 같은 길이의 연속 구간으로 나눈다 (부족하면 앞에서부터 반복, DistributedSampler 와 같음)
+      - replica 안에서 worker 마다 연속된 batch 묶음을 배정하고, DataLoader 의 round-robin 순서에 맞게 batch 를 섞어 내보낸다
+    DataLoader 의 batch_size, num_workers 와 같은 값을 넘겨야 한다. 출력 순서가 index 순서와 다르므로 순서가 필요한 평가에는 사용하지 않는다.
+    """
+
+    def __init__(self, dataset, batch_size, num_workers, chunk_size=64, shuffle=True, num_replicas=None, rank=None, seed=0):
+        if num_replicas is None:
+            num_replicas = torch.distributed.get_world_size() if torch.distributed.is_initialized() else 1
+        if rank is None:
+            rank = torch.distributed.get_rank() if torch.distributed.is_initialized() else 0
+
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.num_workers = max(num_workers, 1)
+        self.chunk_size = chunk_size
+        self.shuffle = shuffle
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.seed = seed
+        self.epoch = 0
+        self.num_samples = math.ceil(len(dataset) / num_replicas)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def replica_indices(self):
+        """이 rank 가 처리할 index (num_samples 개), chunk 단위로 연속"""
+        n = len(self.dataset)
+        chunks = [list(range(start, min(start + self.chunk_size, n))) for start in range(0, n, self.chunk_size)]
+        if self.shuffle:
+            g = torch.Generator()
+            g.manual_seed(self.seed + self.epoch)
+            chunks = [chunks[i] for i in torch.randperm(len(chunks), generator=g).tolist()]
+        indices = [i for chunk in chunks for i in chunk]
+
+        total_size = self.num_samples * self.num_replicas
+        indices += (indices * math.ceil(total_size / max(n, 1)))[: total_size - n]
+        return indices[self.rank * self.num_samples : (self.rank + 1) * self.num_samples]
+
+    def __iter__(self):
+        indices = self.replica_indices()
+        batches = [indices[i : i + self.batch_size] for i in range(0, len(indices), self.batch_size)]
+        W = self.num_workers
+
+        # worker w 는 batch w, w + W, ... 를 처리 ─ worker 별로 batches 의 연속 구간을 배정
+        # 마지막 (크기가 작을 수 있는) batch 가 제자리에 오도록 마지막 batch 를 처리하는 worker 를 가장 뒤에 배정
+        last = (len(batches) - 1) % W
+        order = [(last + 1 + i) % W for i in range(W)]
+        out = [None] * len(batches)
+        pos = 0
+        for w in order:
+            for k in range(w, len(batches), W):
+                out[k] = batches[pos]
+                pos += 1
+        return iter([i for batch in out for i in batch])
+
+    def __len__(self):
+        return self.num_samples
@@ -0,0 +1,137 @@
+"""
+SemanticKITTI 시퀀스를 파일 몇 개로 묶은 packed store (작은 .bin / .label 파일을 프레임마다 여는 비용 제거)
+
+python -m datasets.packed --src /path/to/sequences --dst /path/to/packed --seqs 00 01 08 11
+  - <dst>/<seq_id>/points.bin : 모든 프레임의 xyzi 를 이어 붙인 (P, 4) float32
+  - <dst>/<seq_id>/label.bin  : learning_map 으로 relabel 한 label (P,) uint8
+  - <dst>/<seq_id>/sem.bin    : 원본 semantic label (label & 0xFFFF) (P,) uint16
+  - <dst>/<seq_id>/offsets.npy : 프레임 i 의 포인트는 [offsets[i], offsets[i + 1]) (F + 1,) int64
+  - <dst>/<seq_id>/meta.json  : 프레임 수, label 유무, 변환에 사용한 learning_map
+  - label 파일이 없는 시퀀스 (test) 는 points.bin 만 만든다
+읽을 때는 np.memmap 의 slice 를 그대로 반환 (복사 없음, read-only)
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import yaml
+
+from . import utils
+from .frame_cache import Frame
+
+
+def pack_sequence(src_dir, dst_dir, learning_map):
+    """src_dir (velodyne/, labels/) 의 프레임을 dst_dir 에 packed 형식으로 저장, return: 프레임 수"""
+    fpath_pcd = os.path.join(src_dir, "velodyne")
+    fpath_label = os.path.join(src_dir, "labels")
+    file_ids = sorted(os.path.splitext(fname)[0] for fname in os.listdir(fpath_pcd) if fname.endswith(".bin"))
+    # file_id 로 프레임을 찾으므로 000000 부터 연속이어야 함
+    assert file_ids == [str(i).rjust(6, "0") for i in range(len(file_ids))], "frames of {} are not contiguous".format(src_dir)
+    has_labels = os.path.isdir(fpath_label)
+
+    os.makedirs(dst_dir, exist_ok=True)
+    offsets = [0]
+    f_points = open(os.path.join(dst_dir, "points.bin"), "wb")
+    f_label = open(os.path.join(dst_dir, "label.bin"), "wb") if has_labels else None
+    f_sem = open(os.path.join(dst_dir, "sem.bin"), "wb") if has_labels else None
+    for file_id in file_ids:
+        pcds = np.fromfile(os.path.join(fpath_pcd, "{}.bin".format(file_id)), dtype=np.float32).reshape((-1, 4))
+        pcds.tofile(f_points)
+        offsets.append(offsets[-1] + pcds.shape[0])
+        if has_labels:
+            sem_label = np.fromfile(os.path.join(fpath_label, "{}.label".format(file_id)), dtype=np.uint32) & 0xFFFF
+            assert sem_label.shape[0] == pcds.shape[0]
+            utils.relabel(sem_label, learning_map).astype(np.uint8).tofile(f_label)
+            sem_label.astype(np.uint16).tofile(f_sem)
+
+    for f in (f_points, f_label, f_sem):
+        if f is not None:
+            f.close()
+    np.save(os.path.join(dst_dir, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(dst_dir, "meta.json"), "w") as f:
+        json.dump({"frames": len(file_ids), "has_labels": has_labels, "learning_map": learning_map}, f)
+    return len(file_ids)
+
+
+class PackedSequence:
+    """pack_sequence 로 만든 시퀀스 하나의 reader, frame(file_id) 는 memmap 의 slice 로 Frame 을 반환"""
+
+    def __init__(self, seq_dir, learning_map=None):
+        self.seq_dir = seq_dir
+        with open(os.path.join(seq_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.has_labels = meta["has_labels"]
+        self.offsets = np.load(os.path.join(seq_dir, "offsets.npy"))
+        # json 의 key 는 str 이므로 int 로 비교, learning_map 이 다르면 sem 에서 다시 relabel
+        self.learning_map = learning_map
+        self.relabel = learning_map is not None and {int(k): v for k, v in meta["learning_map"].items()} != learning_map
+
+        P = int(self.offsets[-1])
+        self.points = np.memmap(os.path.join(seq_dir, "points.bin"), dtype=np.float32, mode="r", shape=(P, 4))
+        self.label = self.sem = None
+        if self.has_labels:
+            self.label = np.memmap(os.path.join(seq_dir, "label.bin"), dtype=np.uint8, mode="r", shape=(P,))
+            self.sem = np.memmap(os.path.join(seq_dir, "sem.bin"), dtype=np.uint16, mode="r", shape=(P,))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def frame(self, file_id, with_labels=True):
+        i = int(file_id)
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        xyzi = self.points[start:end]
+        if not (with_labels and self.has_labels):
+            return Frame(xyzi, None, None, None)
+
+        sem_label = self.sem[start:end]
+        label = self.label[start:end]
+        if self.relabel:
+            label = utils.relabel(sem_label, self.learning_map)
+        road = sem_label == 40
+        road.setflags(write=False)
+        return Frame(xyzi, sem_label, label, road)
+
+
+class PackedStore:
+    """
+    packed_dir 아래의 시퀀스를 처음 사용할 때 연다. 변환하지 않은 시퀀스는 None (기존 디렉토리 구조로 읽기)
+    memmap 은 pickle 하지 않고 (spawn 방식의 DataLoader worker) worker 안에서 다시 연다.
+    """
+
+    def __init__(self, packed_dir, learning_map=None):
+        self.packed_dir = packed_dir
+        self.learning_map = learning_map
+        self._sequences = {}
+
+    def sequence(self, seq_id):
+        if seq_id not in self._sequences:
+            seq_dir = os.path.join(self.packed_dir, seq_id)
+            exists = os.path.exists(os.path.join(seq_dir, "meta.json"))
+            self._sequences[seq_id] = PackedSequence(seq_dir, self.learning_map) if exists else None
+        return self._sequences[seq_id]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_sequences"] = {}
+        return state
+
+
+def main(args):
+    with open(args.task_cfg, "r") as f:
+        learning_map = yaml.load(f, Loader=yaml.FullLoader)["learning_map"]
+    for seq_id in args.seqs:
+        frames = pack_sequence(os.path.join(args.src, seq_id), os.path.join(args.dst, seq_id), learning_map)
+        print("[Info] {}: {} frames -> {}".format(seq_id, frames, os.path.join(args.dst, seq_id)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pack SemanticKITTI sequences into memory-mapped files")
+    parser.add_argument("--src", type=str, required=True, help="SemanticKITTI sequences directory")
+    parser.add_argument("--dst", type=str, required=True, help="output directory (config PackedDir)")
+    parser.add_argument("--seqs", type=str, nargs="+", default=[str(i).rjust(2, "0") for i in range(22)])
+    parser.add_argument("--task_cfg", type=str, default="datasets/semantic-kitti.yaml")
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from . import utils
+
+
+def load_poses(fname_pose, calibration):
+    """utils.parse_poses 와 같은 결과 (F, 4, 4) float64, 한 번에 읽고 변환"""
+    values = np.loadtxt(fname_pose, dtype=np.float64, ndmin=2)
+    poses = np.zeros((values.shape[0], 4, 4))
+    poses[:, :3, :4] = values.reshape(-1, 3, 4)
+    poses[:, 3, 3] = 1.0
+    Tr = calibration["Tr"]
+    Tr_inv = np.linalg.inv(Tr)
+    return np.matmul(Tr_inv, np.matmul(poses, Tr))
+
+
+def sample_dtype(seq_num):
+    """
+    샘플 하나 (프레임 frame 을 t_0 로 하는 window)
+      seq: seq_ids 의 index, frame: t_0 프레임 번호, pose: poses 에서 이 시퀀스의 프레임 0 의 행
+      window: meta_list 의 프레임 번호, window_raw: meta_list_raw (실제로 읽는 window) 의 프레임 번호
+    """
+    return np.dtype(
+        [
+            ("seq", np.int16),
+            ("frame", np.int32),
+            ("pose", np.int32),
+            ("window", np.int32, (seq_num,)),
+            ("window_raw", np.int32, (seq_num,)),
+        ]
+    )
+
+
+def build_windows(F, seq_num):
+    """
+    DataloadTrain / DataloadVal / DataloadTest 의 flist 와 같은 window (F, seq_num), (F, seq_num)
+      - 앞쪽 (i < seq_num - 1): 둘 다 i, i+1, ... (backward)
+      - 뒤쪽 (i > F - seq_num): 둘 다 i, i-1, ... (forward)
+      - 나머지: window 는 backward, window_raw 는 forward
+    """
+    i = np.arange(F, dtype=np.int32)[:, None]
+    ht = np.arange(seq_num, dtype=np.int32)[None, :]
+    backward, forward = i + ht, i - ht
+    head = i < (seq_num - 1)
+    window_raw = np.where(head, backward, forward)
+    window = np.where(head | (i > F - seq_num), window_raw, backward)
+    return window, window_raw
+
+
+class SampleIndex:
+    """
+    flist (샘플마다 경로 문자열과 4x4 pose_diff 를 담은 tuple 의 list) 대신 사용하는 배열 기반 index
+      - samples: sample_dtype 의 structured array, poses: 모든 시퀀스의 pose 를 이어 붙인 (P, 4, 4) float64
+      - index[i] 는 flist[i] 와 같은 (meta_list, meta_list_raw) 를 그때그때 만들어 반환 (음수 index, len 지원)
+      - cache_dir 가 있으면 (SeqDir, 시퀀스, seq_num, poses / calib 파일 상태) 로 만든 key 로 디스크에 저장하고 mmap 으로 읽는다.
+        (DDP rank 마다 poses.txt 를 다시 parsing 하지 않고, DataLoader worker 간에 페이지가 공유되어 refcount 로 복사되지 않음)
+    with_labels 가 False 이면 (test) meta tuple 에 label 경로가 없다: (fname_pcd, pose_diff, seq_id, file_id)
+    """
+
+    def __init__(self, seq_dir, seq_ids, samples, poses, with_labels=True):
+        self.seq_dir = seq_dir
+        self.seq_ids = list(seq_ids)
+        self.samples = samples
+        self.poses = poses
+        self.with_labels = with_labels
+
+    @classmethod
+    def build(cls, seq_dir, seq_ids, seq_num, with_labels=True):
+        samples, poses = [], []
+        pose_base = 0
+        for s, seq_id in enumerate(seq_ids):
+            fpath = os.path.join(seq_dir, seq_id)
+            calib = utils.parse_calibration(os.path.join(fpath, "calib.txt"))
+            seq_poses = load_poses(os.path.join(fpath, "poses.txt"), calib)
+            F = seq_poses.shape[0]
+
+            seq_samples = np.zeros(F, dtype=sample_dtype(seq_num))
+            seq_samples["seq"] = s
+            seq_samples["frame"] = np.arange(F)
+            seq_samples["pose"] = pose_base
+            seq_samples["window"], seq_samples["window_raw"] = build_windows(F, seq_num)
+
+            samples.append(seq_samples)
+            poses.append(seq_poses)
+            pose_base += F
+        return cls(seq_dir, seq_ids, np.concatenate(samples), np.concatenate(poses), with_labels)
+
+    @classmethod
+    def load(cls, seq_dir, seq_ids, seq_num, with_labels=True, cache_dir=None):
+        """cache_dir 에 같은 key 의 index 가 있으면 mmap 으로 읽고, 없으면 만들어 저장"""
+        if cache_dir is None:
+            return cls.build(seq_dir, seq_ids, seq_num, with_labels)
+
+        prefix = os.path.join(cache_dir, cls.cache_key(seq_dir, seq_ids, seq_num))
+        fname_samples, fname_poses = prefix + ".samples.npy", prefix + ".poses.npy"
+        if not (os.path.exists(fname_samples) and os.path.exists(fname_poses)):
+            index = cls.build(seq_dir, seq_ids, seq_num, with_labels)
+            os.makedirs(cache_dir, exist_ok=True)
+            # 여러 rank 가 동시에 만들 수 있으므로 임시 파일에 쓴 뒤 rename
+            for fname, array in ((fname_samples, index.samples), (fname_poses, index.poses)):
+                tmp = "{}.{}.tmp.npy".format(fname[: -len(".npy")], os.getpid())
+                np.save(tmp, array)
+                os.replace(tmp, fname)
+
+        samples = np.load(fname_samples, mmap_mode="r")
+        poses = np.load(fname_poses, mmap_mode="r")
+        return cls(seq_dir, seq_ids, samples, poses, with_labels)
+
+    @staticmethod
+    def cache_key(seq_dir, seq_ids, seq_num):
+        files = []
+        for seq_id in seq_ids:
+            for fname in ("calib.txt", "poses.txt"):
+                stat = os.stat(os.path.join(seq_dir, seq_id, fname))
+                files.append((seq_id, fname, stat.st_size, stat.st_mtime_ns))
+        key = json.dumps([os.path.abspath(seq_dir), list(seq_ids), seq_num, files])
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def select(self, mask):
+        """mask (len,) bool 또는 샘플 index 배열로 고른 샘플만 남긴 index"""
+        return SampleIndex(self.seq_dir, self.seq_ids, self.samples[mask], self.poses, self.with_labels)
+
+    def center(self):
+        """샘플별 (seq_id, file_id) 의 t_0 프레임 (meta_list[0][3], meta_list[0][4])"""
+        return [
+            (self.seq_ids[s], str(f).rjust(6, "0")) for s, f in zip(self.samples["seq"].tolist(), self.samples["frame"].tolist())
+        ]
+
+    def meta(self, seq_id, frame_ids, pose_inv, seq_poses):
+        fpath = os.path.join(self.seq_dir, seq_id)
+        meta_list = []
+        for frame_id in frame_ids:
+            file_id = str(frame_id).rjust(6, "0")
+            fname_pcd = os.path.join(fpath, "velodyne", "{}.bin".format(file_id))
+            pose_diff = pose_inv.dot(np.asarray(seq_poses[frame_id]))
+            if self.with_labels:
+                fname_label = os.path.join(fpath, "labels", "{}.label".format(file_id))
+                meta_list.append((fname_pcd, fname_label, pose_diff, seq_id, file_id))
+            else:
+                meta_list.append((fname_pcd, pose_diff, seq_id, file_id))
+        return meta_list
+
+    def __getitem__(self, index):
+        sample = self.samples[index]
+        seq_id = self.seq_ids[int(sample["seq"])]
+        seq_poses = self.poses[int(sample["pose"]) :]
+        pose_inv = np.linalg.inv(np.asarray(seq_poses[int(sample["frame"])]))
+        meta_list = self.meta(seq_id, sample["window"].tolist(), pose_inv, seq_poses)
+        meta_list_raw = self.meta(seq_id, sample["window_raw"].tolist(), pose_inv, seq_poses)
+        return meta_list, meta_list_raw
+
+    def __len__(self):
+        return len(self.samples)
@@ -0,0 +1,304 @@
+"""
+DataloadVal / DataloadTest 의 전처리 결과 (Trans, filter, pad, Quantize, SphereQuantize, 포인트 feature, generate_img_labels) 를
+디스크에 저장해 두고 memmap 으로 읽는 캐시 (augmentation 이 없고 window 가 고정이므로 샘플마다 결과가 항상 같다)
+
+python -m datasets.tensor_cache --config config/config_MOS.py --split val
+python -m datasets.tensor_cache --config config/config_MOS.py --split test --seqs 11 12
+  - <TensorCacheDir>/<key>/ 에 저장, key 는 SeqDir, Voxel 설정, frame_point_num, seq_num, 시퀀스, label 유무, learning_map,
+    원본 데이터 (poses.txt, calib.txt 의 크기 / mtime, velodyne/, labels/ 디렉토리의 mtime / 파일 수,
+    PackedDir 에서 읽는 시퀀스는 packed 의 meta.json, offsets.npy 의 크기 / mtime) 의 hash (meta.json 에도 기록)
+  - 캐시가 없거나 설정 / 원본 데이터가 바뀌면 (key 가 다르면) Dataset 은 기존처럼 다시 계산한다
+저장 형식 (padding 을 제외한 포인트만 저장)
+  - rows.bin: 프레임별 유효 포인트의 [xyzi feature (7), descartes_coord (3), sphere_coord (3)] (R, 13) float32
+  - labels.bin: t_0 프레임 유효 포인트의 label_3D (R0,) uint8, label_2D.npy: (S, 256, 256) uint8
+  - masks.bin: 프레임별 valid_mask 를 np.packbits 로 묶은 bit
+  - samples.npy: 샘플별 offset / 개수와 padding 포인트의 row (padding 은 모두 같은 값)
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+VERSION = 1
+ROW_CHANNELS = 13  # xyzi feature 7 + descartes_coord 3 + sphere_coord 3
+
+
+def sample_dtype(seq_num):
+    return np.dtype(
+        [
+            ("row", np.int64, (seq_num,)),  # rows.bin 에서 프레임의 시작 row
+            ("count", np.int32, (seq_num,)),  # 프레임의 유효 포인트 수 (frame_point_num - pad_length)
+            ("pad_row", np.float32, (seq_num, ROW_CHANNELS)),
+            ("label", np.int64),  # labels.bin 에서 t_0 의 시작 위치
+            ("mask", np.int64, (seq_num,)),  # masks.bin 에서 프레임의 시작 byte
+            ("mask_len", np.int32, (seq_num,)),  # valid_mask 길이 (원본 scan 의 포인트 수)
+        ]
+    )
+
+
+def packed_sequence_dir(packed_dir, seq_id, with_labels):
+    """FrameCache 와 같은 기준으로 packed 에서 읽는 시퀀스이면 그 디렉토리, 아니면 None"""
+    if packed_dir is None:
+        return None
+    seq_dir = os.path.join(packed_dir, seq_id)
+    fname_meta = os.path.join(seq_dir, "meta.json")
+    if not os.path.exists(fname_meta):
+        return None
+    with open(fname_meta, "r") as f:
+        has_labels = json.load(f)["has_labels"]
+    return seq_dir if has_labels or not with_labels else None
+
+
+def source_fingerprint(seq_dir, seq_ids, with_labels, packed_dir=None):
+    """
+    시퀀스별 poses.txt, calib.txt 의 (크기, mtime) 와 프레임 데이터의 fingerprint (프레임 파일마다 stat 하지 않음)
+      - packed 에서 읽으면 meta.json, offsets.npy 의 (크기, mtime)
+      - 아니면 velodyne/, labels/ 디렉토리의 (mtime, 파일 수) ─ 파일 추가 / 삭제 / 교체 (rename) 를 감지
+    """
+    files = []
+    for seq_id in seq_ids:
+        fpath = os.path.join(seq_dir, seq_id)
+        for fname in ("calib.txt", "poses.txt"):
+            stat = os.stat(os.path.join(fpath, fname))
+            files.append((seq_id, fname, stat.st_size, stat.st_mtime_ns))
+        packed_seq_dir = packed_sequence_dir(packed_dir, seq_id, with_labels)
+        if packed_seq_dir is not None:
+            for fname in ("meta.json", "offsets.npy"):
+                stat = os.stat(os.path.join(packed_seq_dir, fname))
+                files.append((seq_id, "packed", fname, stat.st_size, stat.st_mtime_ns))
+            continue
+        for dname in ("velodyne", "labels") if with_labels else ("velodyne",):
+            dpath = os.path.join(fpath, dname)
+            files.append((seq_id, dname, os.stat(dpath).st_mtime_ns, len(os.listdir(dpath))))
+    return files
+
+
+def has_cache(cache_root):
+    """cache_root 에 완성된 캐시가 하나라도 있는지 (없으면 key 를 계산하지 않음)"""
+    if not os.path.isdir(cache_root):
+        return False
+    return any(os.path.exists(os.path.join(cache_root, name, "meta.json")) for name in os.listdir(cache_root))
+
+
+def config_key(config, seq_ids, with_labels, learning_map=None):
+    voxel = {k: v for k, v in vars(config.Voxel).items() if not k.startswith("__")}
+    key = json.dumps(
+        [
+            VERSION,
+            os.path.abspath(config.SeqDir),
+            voxel,
+            config.frame_point_num,
+            config.seq_num,
+            list(seq_ids),
+            with_labels,
+            learning_map if with_labels else None,
+            source_fingerprint(config.SeqDir, seq_ids, with_labels, config.PackedDir),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def compact(output, with_labels):
+    """
+    Dataset.process 결과를 저장 형식으로 변환
+    return: rows [(count_t, 13)] * T, pad_row (T, 13), label (count_0,) uint8 | None, label_2D (H, W) uint8 | None, valid_mask_list
+    """
+    if with_labels:
+        xyzi, descartes_coord, sphere_coord, label_3D, label_2D, valid_mask_list, pad_length_list = output
+    else:
+        xyzi, descartes_coord, sphere_coord, valid_mask_list, pad_length_list = output
+    T, _, P, _ = xyzi.shape
+    full = torch.cat([xyzi[..., 0].transpose(1, 2), descartes_coord[..., 0], sphere_coord[..., 0]], dim=2).numpy()  # (T, P, 13)
+
+    counts = [P - pad_length for pad_length in pad_length_list]
+    rows = [full[t, : counts[t]] for t in range(T)]
+    pad_row = np.stack([full[t, counts[t]] if counts[t] < P else np.zeros(ROW_CHANNELS, np.float32) for t in range(T)])
+    label = label_img = None
+    if with_labels:
+        label = label_3D[: counts[0], 0].numpy().astype(np.uint8)
+        label_img = label_2D[..., 0].numpy().astype(np.uint8)
+    return rows, pad_row, label, label_img, valid_mask_list
+
+
+class TensorCache:
+    """TensorCache.open 으로 만든 cache_dir 의 reader, read(index) 는 Dataset.process 와 같은 결과를 반환"""
+
+    def __init__(self, cache_dir, frame_point_num, with_labels):
+        self.cache_dir = cache_dir
+        self.frame_point_num = frame_point_num
+        self.with_labels = with_labels
+        self._arrays = None
+
+    @classmethod
+    def open(cls, cache_root, config, seq_ids, with_labels, learning_map=None):
+        """완성된 캐시가 있으면 TensorCache, 없거나 meta.json 의 key 가 다르면 None (Dataset 이 다시 계산)"""
+        if cache_root is None or not has_cache(cache_root):
+            return None
+        key = config_key(config, seq_ids, with_labels, learning_map)
+        cache_dir = os.path.join(cache_root, key)
+        fname_meta = os.path.join(cache_dir, "meta.json")
+        if not os.path.exists(fname_meta):
+            return None
+        with open(fname_meta, "r") as f:
+            meta = json.load(f)
+        if meta.get("key") != key:
+            return None
+        return cls(cache_dir, config.frame_point_num, with_labels)
+
+    def arrays(self):
+        # memmap 은 처음 읽을 때 연다 (DataLoader worker 안에서)
+        if self._arrays is None:
+            samples = np.load(os.path.join(self.cache_dir, "samples.npy"), mmap_mode="r")
+            rows = np.memmap(os.path.join(self.cache_dir, "rows.bin"), dtype=np.float32, mode="r").reshape(-1, ROW_CHANNELS)
+            masks = np.memmap(os.path.join(self.cache_dir, "masks.bin"), dtype=np.uint8, mode="r")
+            labels = label_2D = None
+            if self.with_labels:
+                labels = np.memmap(os.path.join(self.cache_dir, "labels.bin"), dtype=np.uint8, mode="r")
+                label_2D = np.load(os.path.join(self.cache_dir, "label_2D.npy"), mmap_mode="r")
+            self._arrays = (samples, rows, masks, labels, label_2D)
+        return self._arrays
+
+    def __len__(self):
+        return len(self.arrays()[0])
+
+    def read(self, index):
+        samples, rows, masks, labels, label_2D = self.arrays()
+        sample = samples[index]
+        T, P = sample["count"].shape[0], self.frame_point_num
+
+        full = np.empty((T, P, ROW_CHANNELS), dtype=np.float32)
+        valid_mask_list, pad_length_list = [], []
+        for t in range(T):
+            row, count = int(sample["row"][t]), int(sample["count"][t])
+            full[t, :count] = rows[row : row + count]
+            full[t, count:] = sample["pad_row"][t]
+            mask, mask_len = int(sample["mask"][t]), int(sample["mask_len"][t])
+            valid_mask_list.append(np.unpackbits(masks[mask : mask + (mask_len + 7) // 8], count=mask_len).astype(bool))
+            pad_length_list.append(P - count)
+
+        full = torch.from_numpy(full)
+        xyzi = full[..., :7].transpose(1, 2).unsqueeze(-1).contiguous()  # (T, 7, P, 1)
+        descartes_coord = full[..., 7:10].unsqueeze(-1).contiguous()  # (T, P, 3, 1)
+        sphere_coord = full[..., 10:].unsqueeze(-1).contiguous()  # (T, P, 3, 1)
+        if not self.with_labels:
+            return xyzi, descartes_coord, sphere_coord, valid_mask_list, pad_length_list
+
+        count, label = int(sample["count"][0]), int(sample["label"])
+        label_3D = torch.zeros(P, 1, dtype=torch.long)
+        label_3D[:count, 0] = torch.from_numpy(labels[label : label + count].astype(np.int64))
+        label_img = torch.from_numpy(label_2D[index].astype(np.int64)).unsqueeze(-1)  # (H, W, 1)
+        return xyzi, descartes_coord, sphere_coord, label_3D, label_img, valid_mask_list, pad_length_list
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_arrays"] = None
+        return state
+
+
+class _Compact(Dataset):
+    def __init__(self, dataset, with_labels):
+        self.dataset = dataset
+        self.with_labels = with_labels
+
+    def __getitem__(self, index):
+        return compact(self.dataset.process(self.dataset.flist[index][1]), self.with_labels)
+
+    def __len__(self):
+        return len(self.dataset)
+
+
+def _first(batch):
+    return batch[0]
+
+
+def build(dataset, cache_root, config, seq_ids, with_labels, num_workers=0):
+    """dataset (DataloadVal / DataloadTest) 의 모든 샘플을 계산하여 저장, return: cache_dir"""
+    key = config_key(config, seq_ids, with_labels, dataset.task_cfg["learning_map"])
+    cache_dir = os.path.join(cache_root, key)
+    tmp_dir = "{}.{}.tmp".format(cache_dir, os.getpid())
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    samples = np.zeros(len(dataset), dtype=sample_dtype(config.seq_num))
+    label_2D = None
+    row = label = mask = 0
+    names = ("rows", "masks", "labels") if with_labels else ("rows", "masks")
+    files = {name: open(os.path.join(tmp_dir, name + ".bin"), "wb") for name in names}
+    loader = DataLoader(_Compact(dataset, with_labels), batch_size=1, num_workers=num_workers, collate_fn=_first)
+    for index, (rows, pad_row, label_3D, label_img, valid_mask_list) in enumerate(loader):
+        sample = samples[index]
+        for t, rows_t in enumerate(rows):
+            sample["row"][t], sample["count"][t] = row, rows_t.shape[0]
+            np.ascontiguousarray(rows_t, dtype=np.float32).tofile(files["rows"])
+            row += rows_t.shape[0]
+
+            bits = np.packbits(valid_mask_list[t])
+            sample["mask"][t], sample["mask_len"][t] = mask, valid_mask_list[t].shape[0]
+            bits.tofile(files["masks"])
+            mask += bits.shape[0]
+        sample["pad_row"] = pad_row
+
+        if with_labels:
+            sample["label"] = label
+            label_3D.tofile(files["labels"])
+            label += label_3D.shape[0]
+            if label_2D is None:
+                label_2D = np.lib.format.open_memmap(
+                    os.path.join(tmp_dir, "label_2D.npy"), mode="w+", dtype=np.uint8, shape=(len(dataset),) + label_img.shape
+                )
+            label_2D[index] = label_img
+
+    for f in files.values():
+        f.close()
+    if label_2D is not None:
+        label_2D.flush()
+    np.save(os.path.join(tmp_dir, "samples.npy"), samples)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(
+            {"version": VERSION, "key": key, "samples": len(dataset), "seq_ids": list(seq_ids), "with_labels": with_labels}, f
+        )
+
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def main(args):
+    from . import data_MOS
+
+    os.environ.setdefault("LOCAL_RANK", "0")
+    config = importlib.import_module(args.config.replace(".py", "").replace("/", "."))
+    pGen, pDataset, pModel, pOpt = config.get_config()
+
+    if args.split == "val":
+        dataset_config = pDataset.Val
+        datasets = [(data_MOS.DataloadVal(dataset_config), True)]
+    else:
+        dataset_config = pDataset.Test
+        datasets = [(data_MOS.DataloadTest(dataset_config, seq), False) for seq in args.seqs]
+    assert dataset_config.TensorCacheDir is not None, "TensorCacheDir is not set"
+
+    for dataset, with_labels in datasets:
+        seq_ids = dataset.flist.seq_ids
+        cache_dir = build(dataset, dataset_config.TensorCacheDir, dataset_config, seq_ids, with_labels, args.num_workers)
+        print("[Info] {} {}: {} samples -> {}".format(args.split, seq_ids, len(dataset), cache_dir))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cache preprocessed DataloadVal / DataloadTest tensors")
+    parser.add_argument("--config", help="config file path", type=str, required=True)
+    parser.add_argument("--split", type=str, default="val", choices=("val", "test"))
+    parser.add_argument("--seqs", type=str, nargs="+", default=[str(i).rjust(2, "0") for i in range(11, 22)])
+    parser.add_argument("--num_workers", type=int, default=4)
+
+    args = parser.parse_args()
+    main(args)
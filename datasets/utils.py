@@ -1,4 +1,5 @@
 import numpy as np
+import torch
 import random
 import cv2
 from scipy.spatial import Delaunay
@@ -239,6 +240,83 @@ def PolarQuantize(pcds, phi_range, r_range, size):
     return polar_coords
 
 
+def pad_frames(pc_list, frame_point_num, out=None):
+    """
+    프레임별 (filter 된) 포인트를 frame_point_num 개로 padding 하여 이어 붙임 (np.pad + np.concatenate 와 같은 결과)
+    padding 포인트는 (-1000, -1000, -4000, -1000)
+    pc_list: [(n_t, >=4)] * T
+    out: (T * frame_point_num, 4) float32 (없으면 할당)
+    """
+    if out is None:
+        out = np.empty((len(pc_list) * frame_point_num, 4), dtype=np.float32)
+    for t, pcds in enumerate(pc_list):
+        n = pcds.shape[0]
+        assert n <= frame_point_num
+        frame = out[t * frame_point_num : (t + 1) * frame_point_num]
+        frame[:n] = pcds[:, :4]
+        frame[n:] = (-1000, -1000, -4000, -1000)
+    return out
+
+
+def form_batch(pcds_total, seq_num, Voxel, out=None):
+    """
+    Quantize, SphereQuantize, 포인트 feature (x, y, z, intensity, 반경, diff_x, diff_y) 를 한 번에 계산하여
+    최종 layout 의 float32 버퍼에 바로 기록 (copy / np.stack / astype / permute 없음, 반경 d 는 SphereQuantize 와 공유)
+    pcds_total: (seq_num * N, >=4) float32
+    out: (xyzi, descartes_coord, sphere_coord) 미리 할당한 버퍼 (없으면 할당)
+    return: xyzi (seq_num, 7, N, 1), descartes_coord (seq_num, N, 3, 1), sphere_coord (seq_num, N, 3, 1)
+    """
+    N = pcds_total.shape[0] // seq_num
+    if out is None:
+        out = (torch.empty(seq_num, 7, N, 1), torch.empty(seq_num, N, 3, 1), torch.empty(seq_num, N, 3, 1))
+    xyzi, descartes_coord, sphere_coord = out
+    feat = xyzi.numpy().reshape(seq_num, 7, N)
+    des = descartes_coord.numpy().reshape(seq_num * N, 3)
+    sph = sphere_coord.numpy().reshape(seq_num * N, 3)
+    x, y, z, intensity = pcds_total[:, 0], pcds_total[:, 1], pcds_total[:, 2], pcds_total[:, 3]
+
+    # Quantize
+    for c, (v, v_range, size) in enumerate(((x, Voxel.range_x, 0), (y, Voxel.range_y, 1), (z, Voxel.range_z, 2))):
+        dv = (v_range[1] - v_range[0]) / Voxel.descartes_shape[size]
+        np.subtract(v, v_range[0], out=des[:, c])
+        np.divide(des[:, c], dv, out=des[:, c])
+
+    # 포인트 feature: x, y, z, intensity, 반경, grid 안에서의 위치 (diff_x, diff_y)
+    for c, v in enumerate((x, y, z, intensity)):
+        feat[:, c] = v.reshape(seq_num, N)
+    d = np.multiply(x, x)
+    tmp = np.multiply(y, y)
+    np.add(d, tmp, out=d)
+    np.multiply(z, z, out=tmp)
+    np.add(d, tmp, out=d)
+    np.sqrt(d, out=d)
+    np.add(d, 1e-12, out=d)
+    feat[:, 4] = d.reshape(seq_num, N)
+    for c in range(2):
+        np.floor(des[:, c], out=tmp)
+        np.subtract(des[:, c], tmp, out=tmp)
+        feat[:, 5 + c] = tmp.reshape(seq_num, N)
+
+    # SphereQuantize: (theta, phi, r) ─ 삼각함수는 SphereQuantize 와 같은 입력 / 출력 layout 으로 계산 (연속 버퍼)
+    H, W, R = Voxel.sphere_shape
+    phi_rad_min, phi_rad_max = Voxel.range_phi[0] * np.pi / 180.0, Voxel.range_phi[1] * np.pi / 180.0
+    theta_rad_min, theta_rad_max = Voxel.range_theta[0] * np.pi / 180.0, Voxel.range_theta[1] * np.pi / 180.0
+    dphi = (phi_rad_max - phi_rad_min) / W
+    dtheta = (theta_rad_max - theta_rad_min) / H
+    dr = (Voxel.range_r[1] - Voxel.range_r[0]) / R
+
+    np.divide(z, d, out=tmp)
+    np.arcsin(tmp, out=tmp)
+    np.subtract(theta_rad_max, tmp, out=tmp)
+    np.divide(tmp, dtheta, out=sph[:, 0])
+    np.arctan2(x, y, out=tmp)
+    np.subtract(phi_rad_max, tmp, out=tmp)
+    np.divide(tmp, dphi, out=sph[:, 1])
+    np.subtract(d, Voxel.range_r[0], out=tmp)
+    np.divide(tmp, dr, out=sph[:, 2])
+    return xyzi, descartes_coord, sphere_coord
+
+
 class DataAugment:
     def __init__(
         self,
@@ -2,21 +2,48 @@ import torch
 from torch import nn
 from torch.autograd import Function
 
-import point_deep.cuda_kernel
-import point_deep.cpu_kernel
 import copy
 
+from . import backends, torch_backend
+from .backends import get_backend, set_backend
+from .plan import VoxelPlan, VoxelPlanEntry
+from .workspace import Workspace, metadata
+
 import pdb
 
 
-# pcds_feat, (BS, C, N, 1)
-# pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
+def _output(out, voxel_out_shape, pcds_feat, needs_grad):
+    """out 이 주어지면 0 으로 초기화하여 voxel_out 으로 사용 (gradient 가 필요 없을 때만)"""
+    if out is None:
+        return torch.zeros(voxel_out_shape, dtype=pcds_feat.dtype, device=pcds_feat.device)
+    assert not needs_grad, "out= 는 gradient 가 필요 없을 때만 사용"
+    assert list(out.shape) == voxel_out_shape and out.dtype == pcds_feat.dtype and out.is_contiguous()
+    return out.zero_()
+
+
+def _scratch(workspace, name, shape, dtype, device):
+    """-1 로 초기화한 index / argmax 버퍼 (workspace 가 있으면 재사용)"""
+    if workspace is None:
+        return torch.full(shape, -1, dtype=dtype, device=device)
+    return workspace.buffer(name, shape, dtype, device).fill_(-1)
+
+
+# CPU 에서 채널 수가 이 값 이상이면 point-major 커널 사용 (포인트별 voxel index 를 한 번만 계산하여 모든 채널에서 재사용)
+POINT_MAJOR_MIN_CHANNELS = 4
+
+
+# pcds_feat, (BS, C, N, 1) ─ 정수 dtype (ex. label) 도 가능 (backward 는 float 만)
+# pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn ─ float 좌표 또는 정수 (int16 / int32 / int64) voxel index, dtype 은 pcds_feat 와 무관
 # voxel_out, (BS, C, D1, D2, ..., Dn)
-# voxel_max_idx, (BS, N)
+# pcds_ind 대신 VoxelPlan 을 넘기면 plan 에 캐시된 voxel offset 을 사용
+# voxel_max_idx, (BS, N) ─ (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1
+# voxel_max_arg, (BS, C, D1, D2, ..., Dn), int32 ─ voxel 별로 선택된 포인트 n (빈 voxel 은 -1, 같은 값이면 가장 작은 n), backward 는 이 index 로 gather
 class VoxelMaxPoolFunction(Function):
     @staticmethod
-    def forward(ctx, pcds_feat, pcds_ind, output_size, scale_rate):
-        assert pcds_feat.dtype == pcds_ind.dtype
+    def forward(ctx, pcds_feat, pcds_ind, output_size, scale_rate, out=None, workspace=None):
+        plan = pcds_ind if isinstance(pcds_ind, VoxelPlan) else None
+        if plan is not None:
+            pcds_ind = plan.pcds_ind
         assert pcds_feat.dim() == 4
         assert pcds_ind.dim() == 4
         assert pcds_feat.size(2) == pcds_ind.size(1)
@@ -24,32 +51,74 @@ class VoxelMaxPoolFunction(Function):
         assert pcds_ind.size(2) == len(scale_rate)
 
         voxel_out_shape = [pcds_feat.size(0), pcds_feat.size(1)] + list(output_size)
-        voxel_out = torch.zeros(voxel_out_shape, dtype=pcds_feat.dtype, device=pcds_feat.device)
-        voxel_max_idx = torch.full([pcds_ind.size(0), pcds_ind.size(1)], -1, dtype=torch.int64, device=pcds_feat.device)
+        voxel_out = _output(out, voxel_out_shape, pcds_feat, ctx.needs_input_grad[0])
+        ctx.backend = get_backend(pcds_feat.device.type)
+        # gradient 가 필요 없으면 index / argmax 버퍼는 workspace 에서 재사용 (torch backend 는 argmax 계산 생략)
+        workspace = None if ctx.needs_input_grad[0] else (workspace or Workspace.current())
+        if plan is not None:
+            voxel_max_idx = plan.entry(output_size, scale_rate).offset
+        elif ctx.backend == "torch":
+            voxel_max_idx = VoxelPlanEntry.build(pcds_ind, output_size, scale_rate).offset
+        else:
+            voxel_max_idx = _scratch(workspace, "idx", [pcds_ind.size(0), pcds_ind.size(1)], torch.int64, pcds_feat.device)
+        if ctx.backend == "torch" and not ctx.needs_input_grad[0]:
+            voxel_max_arg = None
+        else:
+            voxel_max_arg = _scratch(workspace, "arg", voxel_out_shape, torch.int32, pcds_feat.device)
 
-        voxel_out_size_pt = torch.LongTensor(voxel_out_shape).to(pcds_feat.device)
-        voxel_out_stride_pt = torch.LongTensor(voxel_out.stride()).to(pcds_feat.device)
-        output_size_pt = voxel_out_size_pt[2:]  # torch.LongTensor(output_size).to(pcds_feat.device)
-        scale_rate_pt = torch.FloatTensor(scale_rate).to(pcds_feat.device)
+        voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt = metadata(
+            voxel_out_shape, scale_rate, pcds_feat.device
+        )
 
-        ctx.use_cuda = pcds_feat.is_cuda
-        if ctx.use_cuda:
-            point_deep.cuda_kernel.voxel_maxpooling_forward(
+        ctx.use_cuda = ctx.backend == "cuda"
+        # 원소 단위 CPU 커널은 pcds_feat, pcds_ind 가 같은 float dtype 일 때만 사용
+        elem_ok = pcds_feat.dtype == pcds_ind.dtype and pcds_feat.is_floating_point()
+        ctx.point_major = (ctx.backend == "cpu") and (
+            plan is not None or not elem_ok or pcds_feat.size(1) >= POINT_MAJOR_MIN_CHANNELS
+        )
+        if ctx.backend == "torch":
+            torch_backend.voxel_pooling_forward("amax", pcds_feat, voxel_out, voxel_max_idx, voxel_max_arg)
+        elif plan is not None:
+            # plan 의 voxel offset 을 그대로 사용 (좌표 quantize 생략), CPU backward 는 point-major 커널
+            forward_with_idx = (
+                backends.cuda_kernel.voxel_maxpooling_forward_with_idx
+                if ctx.use_cuda
+                else backends.cpu_kernel.voxel_maxpooling_cpu_forward_with_idx
+            )
+            forward_with_idx(
+                pcds_feat, voxel_out, voxel_max_idx, voxel_max_arg, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt
+            )
+        elif ctx.use_cuda:
+            backends.cuda_kernel.voxel_maxpooling_forward(
+                pcds_feat,
+                pcds_ind,
+                voxel_out,
+                voxel_max_idx,
+                voxel_max_arg,
+                voxel_out_size_pt,
+                voxel_out_stride_pt,
+                output_size_pt,
+                scale_rate_pt,
+            )
+        elif ctx.point_major:
+            backends.cpu_kernel.voxel_maxpooling_cpu_forward_point_major(
                 pcds_feat,
                 pcds_ind,
                 voxel_out,
                 voxel_max_idx,
+                voxel_max_arg,
                 voxel_out_size_pt,
                 voxel_out_stride_pt,
                 output_size_pt,
                 scale_rate_pt,
             )
         else:
-            point_deep.cpu_kernel.voxel_maxpooling_cpu_forward(
+            backends.cpu_kernel.voxel_maxpooling_cpu_forward(
                 pcds_feat,
                 pcds_ind,
                 voxel_out,
                 voxel_max_idx,
+                voxel_max_arg,
                 voxel_out_size_pt,
                 voxel_out_stride_pt,
                 output_size_pt,
@@ -58,24 +127,37 @@ class VoxelMaxPoolFunction(Function):
 
         ctx.input_shape = pcds_feat.shape
         ctx.save_for_backward(
-            pcds_feat, pcds_ind, voxel_out, voxel_max_idx, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt
+            pcds_ind, voxel_max_idx, voxel_max_arg, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt
         )
         return voxel_out
 
     @staticmethod
     def backward(ctx, grad_voxel_out):
-        pcds_feat, pcds_ind, voxel_out, voxel_max_idx, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt = (
+        pcds_ind, voxel_max_idx, voxel_max_arg, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt = (
             ctx.saved_tensors
         )
         if ctx.needs_input_grad[0]:
             grad_voxel_out = grad_voxel_out.contiguous()
             grad_pcds_feat = torch.zeros(ctx.input_shape, dtype=grad_voxel_out.dtype, device=grad_voxel_out.device)
-            if ctx.use_cuda:
-                point_deep.cuda_kernel.voxel_maxpooling_backward(
-                    pcds_feat,
+            if ctx.backend == "torch":
+                torch_backend.voxel_pooling_backward(voxel_max_idx, voxel_max_arg, grad_pcds_feat, grad_voxel_out)
+            elif ctx.use_cuda:
+                backends.cuda_kernel.voxel_maxpooling_backward(
                     pcds_ind,
-                    voxel_out,
                     voxel_max_idx,
+                    voxel_max_arg,
+                    grad_pcds_feat,
+                    grad_voxel_out,
+                    voxel_out_size_pt,
+                    voxel_out_stride_pt,
+                    output_size_pt,
+                    scale_rate_pt,
+                )
+            elif ctx.point_major:
+                backends.cpu_kernel.voxel_maxpooling_cpu_backward_point_major(
+                    pcds_ind,
+                    voxel_max_idx,
+                    voxel_max_arg,
                     grad_pcds_feat,
                     grad_voxel_out,
                     voxel_out_size_pt,
@@ -84,11 +166,10 @@ class VoxelMaxPoolFunction(Function):
                     scale_rate_pt,
                 )
             else:
-                point_deep.cpu_kernel.voxel_maxpooling_cpu_backward(
-                    pcds_feat,
+                backends.cpu_kernel.voxel_maxpooling_cpu_backward(
                     pcds_ind,
-                    voxel_out,
                     voxel_max_idx,
+                    voxel_max_arg,
                     grad_pcds_feat,
                     grad_voxel_out,
                     voxel_out_size_pt,
@@ -97,23 +178,27 @@ class VoxelMaxPoolFunction(Function):
                     scale_rate_pt,
                 )
 
-            return grad_pcds_feat, None, None, None
+            return grad_pcds_feat, None, None, None, None, None
         else:
-            return None, None, None, None
+            return None, None, None, None, None, None
 
 
-def VoxelMaxPool(pcds_feat, pcds_ind, output_size, scale_rate):
-    return VoxelMaxPoolFunction.apply(pcds_feat, pcds_ind, output_size, scale_rate)
+def VoxelMaxPool(pcds_feat, pcds_ind, output_size, scale_rate, out=None, workspace=None):
+    return VoxelMaxPoolFunction.apply(pcds_feat, pcds_ind, output_size, scale_rate, out, workspace)
 
 
-# pcds_feat, (BS, C, N, 1)
-# pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
+# pcds_feat, (BS, C, N, 1) ─ 정수 dtype (ex. label) 도 가능 (backward 는 float 만)
+# pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn ─ float 좌표 또는 정수 (int16 / int32 / int64) voxel index, dtype 은 pcds_feat 와 무관
 # voxel_out, (BS, C, D1, D2, ..., Dn)
-# voxel_min_idx, (BS, N)
+# pcds_ind 대신 VoxelPlan 을 넘기면 plan 에 캐시된 voxel offset 을 사용
+# voxel_min_idx, (BS, N) ─ (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1
+# voxel_min_arg, (BS, C, D1, D2, ..., Dn), int32 ─ voxel 별로 선택된 포인트 n (빈 voxel 은 -1, 같은 값이면 가장 작은 n), backward 는 이 index 로 gather
 class VoxelMinPoolFunction(Function):
     @staticmethod
-    def forward(ctx, pcds_feat, pcds_ind, output_size, scale_rate):
-        assert pcds_feat.dtype == pcds_ind.dtype
+    def forward(ctx, pcds_feat, pcds_ind, output_size, scale_rate, out=None, workspace=None):
+        plan = pcds_ind if isinstance(pcds_ind, VoxelPlan) else None
+        if plan is not None:
+            pcds_ind = plan.pcds_ind
         assert pcds_feat.dim() == 4
         assert pcds_ind.dim() == 4
         assert pcds_feat.size(2) == pcds_ind.size(1)
@@ -121,32 +206,74 @@ class VoxelMinPoolFunction(Function):
         assert pcds_ind.size(2) == len(scale_rate)
 
         voxel_out_shape = [pcds_feat.size(0), pcds_feat.size(1)] + list(output_size)
-        voxel_out = torch.zeros(voxel_out_shape, dtype=pcds_feat.dtype, device=pcds_feat.device)
-        voxel_min_idx = torch.full([pcds_ind.size(0), pcds_ind.size(1)], -1, dtype=torch.int64, device=pcds_feat.device)
+        voxel_out = _output(out, voxel_out_shape, pcds_feat, ctx.needs_input_grad[0])
+        ctx.backend = get_backend(pcds_feat.device.type)
+        # gradient 가 필요 없으면 index / argmax 버퍼는 workspace 에서 재사용 (torch backend 는 argmax 계산 생략)
+        workspace = None if ctx.needs_input_grad[0] else (workspace or Workspace.current())
+        if plan is not None:
+            voxel_min_idx = plan.entry(output_size, scale_rate).offset
+        elif ctx.backend == "torch":
+            voxel_min_idx = VoxelPlanEntry.build(pcds_ind, output_size, scale_rate).offset
+        else:
+            voxel_min_idx = _scratch(workspace, "idx", [pcds_ind.size(0), pcds_ind.size(1)], torch.int64, pcds_feat.device)
+        if ctx.backend == "torch" and not ctx.needs_input_grad[0]:
+            voxel_min_arg = None
+        else:
+            voxel_min_arg = _scratch(workspace, "arg", voxel_out_shape, torch.int32, pcds_feat.device)
 
-        voxel_out_size_pt = torch.LongTensor(voxel_out_shape).to(pcds_feat.device)
-        voxel_out_stride_pt = torch.LongTensor(voxel_out.stride()).to(pcds_feat.device)
-        output_size_pt = voxel_out_size_pt[2:]  # torch.LongTensor(output_size).to(pcds_feat.device)
-        scale_rate_pt = torch.FloatTensor(scale_rate).to(pcds_feat.device)
+        voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt = metadata(
+            voxel_out_shape, scale_rate, pcds_feat.device
+        )
 
-        ctx.use_cuda = pcds_feat.is_cuda
-        if ctx.use_cuda:
-            point_deep.cuda_kernel.voxel_minpooling_forward(
+        ctx.use_cuda = ctx.backend == "cuda"
+        # 원소 단위 CPU 커널은 pcds_feat, pcds_ind 가 같은 float dtype 일 때만 사용
+        elem_ok = pcds_feat.dtype == pcds_ind.dtype and pcds_feat.is_floating_point()
+        ctx.point_major = (ctx.backend == "cpu") and (
+            plan is not None or not elem_ok or pcds_feat.size(1) >= POINT_MAJOR_MIN_CHANNELS
+        )
+        if ctx.backend == "torch":
+            torch_backend.voxel_pooling_forward("amin", pcds_feat, voxel_out, voxel_min_idx, voxel_min_arg)
+        elif plan is not None:
+            # plan 의 voxel offset 을 그대로 사용 (좌표 quantize 생략), CPU backward 는 point-major 커널
+            forward_with_idx = (
+                backends.cuda_kernel.voxel_minpooling_forward_with_idx
+                if ctx.use_cuda
+                else backends.cpu_kernel.voxel_minpooling_cpu_forward_with_idx
+            )
+            forward_with_idx(
+                pcds_feat, voxel_out, voxel_min_idx, voxel_min_arg, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt
+            )
+        elif ctx.use_cuda:
+            backends.cuda_kernel.voxel_minpooling_forward(
                 pcds_feat,
                 pcds_ind,
                 voxel_out,
                 voxel_min_idx,
+                voxel_min_arg,
+                voxel_out_size_pt,
+                voxel_out_stride_pt,
+                output_size_pt,
+                scale_rate_pt,
+            )
+        elif ctx.point_major:
+            backends.cpu_kernel.voxel_minpooling_cpu_forward_point_major(
+                pcds_feat,
+                pcds_ind,
+                voxel_out,
+                voxel_min_idx,
+                voxel_min_arg,
                 voxel_out_size_pt,
                 voxel_out_stride_pt,
                 output_size_pt,
                 scale_rate_pt,
             )
         else:
-            point_deep.cpu_kernel.voxel_minpooling_cpu_forward(
+            backends.cpu_kernel.voxel_minpooling_cpu_forward(
                 pcds_feat,
                 pcds_ind,
                 voxel_out,
                 voxel_min_idx,
+                voxel_min_arg,
                 voxel_out_size_pt,
                 voxel_out_stride_pt,
                 output_size_pt,
@@ -155,24 +282,37 @@ class VoxelMinPoolFunction(Function):
 
         ctx.input_shape = pcds_feat.shape
         ctx.save_for_backward(
-            pcds_feat, pcds_ind, voxel_out, voxel_min_idx, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt
+            pcds_ind, voxel_min_idx, voxel_min_arg, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt
         )
         return voxel_out
 
     @staticmethod
     def backward(ctx, grad_voxel_out):
-        pcds_feat, pcds_ind, voxel_out, voxel_min_idx, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt = (
+        pcds_ind, voxel_min_idx, voxel_min_arg, voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt = (
             ctx.saved_tensors
         )
         if ctx.needs_input_grad[0]:
             grad_voxel_out = grad_voxel_out.contiguous()
             grad_pcds_feat = torch.zeros(ctx.input_shape, dtype=grad_voxel_out.dtype, device=grad_voxel_out.device)
-            if ctx.use_cuda:
-                point_deep.cuda_kernel.voxel_minpooling_backward(
-                    pcds_feat,
+            if ctx.backend == "torch":
+                torch_backend.voxel_pooling_backward(voxel_min_idx, voxel_min_arg, grad_pcds_feat, grad_voxel_out)
+            elif ctx.use_cuda:
+                backends.cuda_kernel.voxel_minpooling_backward(
+                    pcds_ind,
+                    voxel_min_idx,
+                    voxel_min_arg,
+                    grad_pcds_feat,
+                    grad_voxel_out,
+                    voxel_out_size_pt,
+                    voxel_out_stride_pt,
+                    output_size_pt,
+                    scale_rate_pt,
+                )
+            elif ctx.point_major:
+                backends.cpu_kernel.voxel_minpooling_cpu_backward_point_major(
                     pcds_ind,
-                    voxel_out,
                     voxel_min_idx,
+                    voxel_min_arg,
                     grad_pcds_feat,
                     grad_voxel_out,
                     voxel_out_size_pt,
@@ -181,11 +321,10 @@ class VoxelMinPoolFunction(Function):
                     scale_rate_pt,
                 )
             else:
-                point_deep.cpu_kernel.voxel_minpooling_cpu_backward(
-                    pcds_feat,
+                backends.cpu_kernel.voxel_minpooling_cpu_backward(
                     pcds_ind,
-                    voxel_out,
                     voxel_min_idx,
+                    voxel_min_arg,
                     grad_pcds_feat,
                     grad_voxel_out,
                     voxel_out_size_pt,
@@ -194,10 +333,170 @@ class VoxelMinPoolFunction(Function):
                     scale_rate_pt,
                 )
 
-            return grad_pcds_feat, None, None, None
+            return grad_pcds_feat, None, None, None, None, None
+        else:
+            return None, None, None, None, None, None
+
+
+def VoxelMinPool(pcds_feat, pcds_ind, output_size, scale_rate, out=None, workspace=None):
+    return VoxelMinPoolFunction.apply(pcds_feat, pcds_ind, output_size, scale_rate, out, workspace)
+
+
+# sparse pooling: 포인트가 있는 voxel 만 출력 (dense (BS, C, D1, ..., Dn) 을 만들고 훑지 않음)
+# pcds_feat, (BS, C, N, 1), pcds_ind, (BS, N, D, 1) 또는 VoxelPlan
+# return: cells, (V,) int64 ─ 포인트가 있는 voxel 의 bs * (D1 * ... * Dn) + offset (오름차순)
+#         voxel_feat, (C, V) ─ cells 별 pooling 결과, sparse_to_dense 로 dense 변환
+def _sparse_pool(function, pcds_feat, pcds_ind, output_size, scale_rate):
+    plan = pcds_ind if isinstance(pcds_ind, VoxelPlan) else VoxelPlan(pcds_ind)
+    entry = plan.entry(output_size, scale_rate)
+    sparse_plan = entry.sparse_plan
+
+    BS, C, N, _ = pcds_feat.shape
+    pcds_feat = pcds_feat.transpose(0, 1).reshape(1, C, BS * N, 1)  # 배치를 포인트 차원으로
+    voxel_feat = function.apply(pcds_feat, sparse_plan, (entry.cells.numel(),), (1.0,))
+    return entry.cells, voxel_feat.view(C, -1)
+
+
+def VoxelMaxPoolSparse(pcds_feat, pcds_ind, output_size, scale_rate):
+    return _sparse_pool(VoxelMaxPoolFunction, pcds_feat, pcds_ind, output_size, scale_rate)
+
+
+def VoxelMinPoolSparse(pcds_feat, pcds_ind, output_size, scale_rate):
+    return _sparse_pool(VoxelMinPoolFunction, pcds_feat, pcds_ind, output_size, scale_rate)
+
+
+# multi-scale pooling: 같은 포인트를 여러 (output_size, scale_rate) 로 pooling 하는 것을 커널 한 번으로 실행
+# pcds_feat, (BS, C, N, 1), pcds_ind, (BS, N, D, 1) 또는 VoxelPlan
+# targets: [(output_size, scale_rate), ...]
+# return: target 별 voxel_out, (BS, C, D1, ..., Dn) 목록 (VoxelMaxPool / VoxelMinPool 을 따로 호출한 것과 같은 결과)
+def _multi_scale_pool(function, pcds_feat, pcds_ind, targets):
+    plan = pcds_ind if isinstance(pcds_ind, VoxelPlan) else VoxelPlan(pcds_ind)
+    multi_scale_plan, plane_sizes = plan.multi_scale(targets)
+
+    BS, C = pcds_feat.shape[:2]
+    pcds_feat = pcds_feat.repeat(1, 1, len(targets), 1)  # (BS, C, K * N, 1), target 별 포인트 복사
+    voxel_out = function.apply(pcds_feat, multi_scale_plan, (sum(plane_sizes),), (1.0,))
+    return [
+        voxel_feat.view(BS, C, *output_size)
+        for voxel_feat, (output_size, _) in zip(torch.split(voxel_out, plane_sizes, dim=2), targets)
+    ]
+
+
+def VoxelMaxPoolMultiScale(pcds_feat, pcds_ind, targets):
+    return _multi_scale_pool(VoxelMaxPoolFunction, pcds_feat, pcds_ind, targets)
+
+
+def VoxelMinPoolMultiScale(pcds_feat, pcds_ind, targets):
+    return _multi_scale_pool(VoxelMinPoolFunction, pcds_feat, pcds_ind, targets)
+
+
+def sparse_to_dense(cells, voxel_feat, batch_size, output_size):
+    """
+    VoxelMaxPoolSparse / VoxelMinPoolSparse 결과를 dense 로 변환 (빈 voxel 은 0, VoxelMaxPool / VoxelMinPool 과 같은 결과)
+    cells: (V,), voxel_feat: (C, V), return: (batch_size, C, D1, ..., Dn)
+    """
+    plane_size = 1
+    for s in output_size:
+        plane_size *= s
+    voxel_out = voxel_feat.new_zeros(batch_size, voxel_feat.size(0), plane_size)
+    voxel_out[cells // plane_size, :, cells % plane_size] = voxel_feat.t()
+    return voxel_out.view(batch_size, voxel_feat.size(0), *output_size)
+
+
+def dense_to_sparse(voxel_out, cells):
+    """sparse_to_dense 의 역, voxel_out: (BS, C, D1, ..., Dn), return: voxel_feat (C, V)"""
+    BS, C = voxel_out.shape[:2]
+    plane_size = voxel_out[0, 0].numel()
+    return voxel_out.reshape(BS, C, plane_size)[cells // plane_size, :, cells % plane_size].t()
+
+
+# pointnet + maxpool: 1x1 conv (BN fold) + ReLU layer 들을 포인트마다 계산하여 바로 voxel 로 max-reduce (inference 전용)
+# 포인트 전체의 feature (BS, CL, N, 1) 를 만들지 않음 ─ VoxelMaxPool(PointNetStacker(pcds_feat), ...) 와 같은 결과
+# pcds_feat, (BS, C0, N, 1), pcds_ind, (BS, N, D, 1) 또는 VoxelPlan
+# layers: [(weight (C_{l+1}, C_l), bias (C_{l+1},)), ...] ─ backbone.PointNetStacker.fold() 결과, 모든 layer 뒤에 ReLU
+# return: voxel_out, (BS, CL, D1, ..., Dn)
+def PointNetVoxelMaxPool(pcds_feat, pcds_ind, layers, output_size, scale_rate, out=None):
+    plan = pcds_ind if isinstance(pcds_ind, VoxelPlan) else VoxelPlan(pcds_ind)
+    voxel_idx = plan.entry(output_size, scale_rate).offset
+
+    BS = pcds_feat.size(0)
+    weights = [weight.to(pcds_feat.dtype).contiguous() for weight, _ in layers]
+    biases = [bias.to(pcds_feat.dtype).contiguous() for _, bias in layers]
+    voxel_out = _output(out, [BS, weights[-1].size(0)] + list(output_size), pcds_feat, False)
+
+    backend = get_backend(pcds_feat.device.type)
+    kernel_dtype = pcds_feat.dtype in (torch.float32, torch.float64)
+    with torch.no_grad():
+        if backend == "cpu" and kernel_dtype:
+            backends.cpu_kernel.pointnet_maxpooling_cpu_forward(pcds_feat.contiguous(), voxel_idx, weights, biases, voxel_out)
+        elif backend == "cuda" and kernel_dtype and max(w.size(1) for w in weights) <= 64 and weights[-1].size(0) <= 64:
+            # CUDA 커널은 포인트별 layer 출력을 레지스터에 두므로 채널 64 이하만
+            backends.cuda_kernel.pointnet_maxpooling_forward(pcds_feat.contiguous(), voxel_idx, weights, biases, voxel_out)
+        else:
+            torch_backend.pointnet_maxpool_forward(pcds_feat, voxel_idx, list(zip(weights, biases)), voxel_out)
+    return voxel_out
+
+
+# unpooling: grid feature 를 포인트로 gather (backbone.BilinearSample 의 F.grid_sample 대신 사용)
+# grid_feat, (BS, C, D1, ..., Dn)
+# index, weight, (BS, K, N) ─ VoxelPlan.unpool_index 결과, 포인트 n 의 feature = sum_k weight[k] * grid_feat[index[k]]
+# return: pcds_feat, (BS, C, N, 1)
+# "torch" backend 는 corner 마다 gather + addcmul, backward 는 scatter_add
+class VoxelUnpoolFunction(Function):
+    @staticmethod
+    def forward(ctx, grid_feat, index, weight):
+        BS, C = grid_feat.shape[:2]
+        K, N = index.shape[1:]
+        grid = grid_feat.reshape(BS, C, -1)
+        weight = weight.to(grid_feat.dtype).contiguous()
+
+        backend = get_backend(grid_feat.device.type)
+        if backend == "torch":
+            pcds_feat = grid.gather(2, index[:, :1].expand(BS, C, N)) * weight[:, :1]
+            for k in range(1, K):
+                pcds_feat.addcmul_(grid.gather(2, index[:, k : k + 1].expand(BS, C, N)), weight[:, k : k + 1])
+        else:
+            pcds_feat = grid_feat.new_empty(BS, C, N)
+            kernel = (
+                backends.cpu_kernel.voxel_unpool_cpu_forward if backend == "cpu" else backends.cuda_kernel.voxel_unpool_forward
+            )
+            kernel(grid, index.contiguous(), weight, pcds_feat)
+
+        ctx.grid_shape = grid_feat.shape
+        ctx.save_for_backward(index, weight)
+        return pcds_feat.unsqueeze(-1)
+
+    @staticmethod
+    def backward(ctx, grad_pcds_feat):
+        index, weight = ctx.saved_tensors
+        if ctx.needs_input_grad[0]:
+            BS, C, N = grad_pcds_feat.shape[:3]
+            grad_pcds_feat = grad_pcds_feat.reshape(BS, C, N).contiguous()
+            grad_grid = grad_pcds_feat.new_zeros(BS, C, ctx.grid_shape[2:].numel())
+
+            backend = get_backend(grad_pcds_feat.device.type)
+            if backend == "torch":
+                for k in range(index.size(1)):
+                    grad_grid.scatter_add_(2, index[:, k : k + 1].expand(BS, C, N), grad_pcds_feat * weight[:, k : k + 1])
+            else:
+                kernel = (
+                    backends.cpu_kernel.voxel_unpool_cpu_backward
+                    if backend == "cpu"
+                    else backends.cuda_kernel.voxel_unpool_backward
+                )
+                kernel(index.contiguous(), weight, grad_pcds_feat, grad_grid)
+            return grad_grid.view(ctx.grid_shape), None, None
         else:
-            return None, None, None, None
+            return None, None, None
 
 
-def VoxelMinPool(pcds_feat, pcds_ind, output_size, scale_rate):
-    return VoxelMinPoolFunction.apply(pcds_feat, pcds_ind, output_size, scale_rate)
+def VoxelUnpool(grid_feat, pcds_ind, scale_rate, mode="bilinear"):
+    """
+    grid_feat: (BS, C, D1, ..., Dn), pcds_ind: (BS, N, D, 1) 또는 VoxelPlan
+    mode="bilinear": backbone.BilinearSample 과 같은 결과 (align_corners=True, zeros padding, D=2)
+    mode="nearest": VoxelMaxPool 이 포인트를 넣는 cell 의 feature (범위 밖 포인트는 0)
+    return: (BS, C, N, 1)
+    """
+    plan = pcds_ind if isinstance(pcds_ind, VoxelPlan) else VoxelPlan(pcds_ind)
+    index, weight = plan.unpool_index(grid_feat.shape[2:], scale_rate, mode)
+    return VoxelUnpoolFunction.apply(grid_feat.contiguous(), index, weight)
@@ -0,0 +1,70 @@
+"""
+deep_point 연산 backend 선택
+  - "cpu": 컴파일된 point_deep.cpu_kernel
+  - "cuda": 컴파일된 point_deep.cuda_kernel
+  - "torch": torch.scatter_reduce 로 구현한 backend (컴파일 불필요, CPU / CUDA tensor 모두 가능, torch >= 1.12)
+import 시 device 별로 컴파일된 커널이 있으면 커널, 없으면 torch 를 선택한다.
+환경 변수 DEEP_POINT_BACKEND=torch (또는 cpu / cuda) 나 set_backend 로 바꿀 수 있다.
+"""
+
+import os
+
+from . import torch_backend
+
+try:
+    import point_deep.cpu_kernel as cpu_kernel
+except (ImportError, OSError):
+    cpu_kernel = None
+
+try:
+    import point_deep.cuda_kernel as cuda_kernel
+except (ImportError, OSError):
+    cuda_kernel = None
+
+# device type: 사용할 수 있는 backend
+device_backends = {"cpu": ("cpu", "torch"), "cuda": ("cuda", "torch")}
+
+
+def available(name):
+    if name == "cpu":
+        return cpu_kernel is not None
+    if name == "cuda":
+        return cuda_kernel is not None
+    if name == "torch":
+        return torch_backend.available
+    raise ValueError("unknown backend: {}".format(name))
+
+
+def _default(device_type):
+    for name in device_backends[device_type]:
+        if available(name):
+            return name
+    return None
+
+
+selected = {device_type: _default(device_type) for device_type in device_backends}
+
+
+def set_backend(name, device_type=None):
+    """device_type (None 이면 name 을 사용할 수 있는 모든 device) 의 backend 를 name 으로 변경"""
+    device_types = [device_type] if device_type is not None else [d for d, names in device_backends.items() if name in names]
+    assert len(device_types) > 0, "unknown backend: {}".format(name)
+    for d in device_types:
+        assert name in device_backends[d], "backend {} can not run on {}".format(name, d)
+        assert available(name), "backend {} is not available (not compiled or torch < 1.12)".format(name)
+        selected[d] = name
+
+
+def get_backend(device_type):
+    name = selected.get(device_type)
+    if name is None:
+        raise RuntimeError(
+            "no deep_point backend for {} tensors: build deep_point (python setup.py install) or use torch >= 1.12".format(
+                device_type
+            )
+        )
+    return name
+
+
+if os.environ.get("DEEP_POINT_BACKEND"):
+    set_backend(os.environ["DEEP_POINT_BACKEND"])
@@ -0,0 +1,201 @@
+"""
+deep_point 커널 / backend throughput 벤치마크
+
+python -m deep_point.benchmark --threads 1 2 4 8 --kernels elem point_major torch
+python -m deep_point.benchmark --device cuda
+  - elem: 원소 (bs, c, n) 마다 voxel index 를 계산하는 CPU 커널, threads=1 이 기존 단일 스레드 커널과 같은 실행
+  - point_major: 포인트별 voxel index 를 한 번만 계산하여 모든 채널에서 재사용하는 CPU 커널
+  - plan, cuda_plan: deep_point.VoxelPlan 에 미리 계산해 둔 voxel index 를 사용 (plan 생성 시간은 제외)
+  - sparse, cuda_sparse: VoxelMaxPoolSparse / VoxelMinPoolSparse (포인트가 있는 voxel 만 pooling) + sparse_to_dense
+  - cuda: CUDA 커널
+  - torch: 컴파일 없이 torch.scatter_reduce 로 구현한 backend (CPU / CUDA)
+  - --kernels 를 생략하면 --device 에서 사용할 수 있는 (컴파일된) 모든 커널을 비교
+  - --index_dtype int32 / int16: float 좌표 대신 scale_rate 를 미리 곱한 정수 voxel index (scale_rate 1) 를 사용
+  - 각 커널, 스레드 수에 대해 forward / backward 시간과 throughput (BS*C*N 원소 / 초) 을 출력
+  - torch scatter_reduce 로 계산한 결과와 비교하여 forward 결과, gradient (같은 값이면 가장 작은 n 의 포인트만) 가 같은지 확인
+"""
+
+import argparse
+import time
+
+import torch
+import torch.nn.functional as F
+
+import deep_point
+
+# kernel: (backend, deep_point.POINT_MAJOR_MIN_CHANNELS, mode) ─ mode: None, "plan" (VoxelPlan 사용), "sparse"
+kernels = {
+    "elem": ("cpu", float("inf"), None),
+    "point_major": ("cpu", 0, None),
+    "plan": ("cpu", 0, "plan"),
+    "sparse": ("cpu", 0, "sparse"),
+    "cuda": ("cuda", float("inf"), None),
+    "cuda_plan": ("cuda", float("inf"), "plan"),
+    "cuda_sparse": ("cuda", float("inf"), "sparse"),
+    "torch": ("torch", float("inf"), None),
+}
+
+# name: (BS, C, N, output_size, scale_rate)
+presets = {
+    "bev": (3, 64, 160000, (512, 512), (1.0, 1.0)),  # MOSNet.encode_point_feats 의 descartes BEV 투영 (T=3)
+    "label": (1, 1, 160000, (256, 256), (0.5, 0.5)),  # data_MOS.generate_img_labels
+}
+
+
+def make_inputs(BS, C, N, output_size, scale_rate, ties=False, seed=0):
+    g = torch.Generator().manual_seed(seed)
+    pcds_feat = torch.randn(BS, C, N, 1, generator=g)
+    if ties:
+        pcds_feat = pcds_feat.round()  # 같은 voxel 안에 같은 값이 많도록
+    # 범위 밖 포인트 (padding) 도 일부 포함
+    pcds_ind = torch.stack(
+        [torch.rand(BS, N, generator=g) * (s / r) * 1.1 - (s / r) * 0.05 for s, r in zip(output_size, scale_rate)], dim=2
+    ).unsqueeze(-1)
+    return pcds_feat, pcds_ind
+
+
+def flat_index(pcds_ind, output_size, scale_rate):
+    """(BS, N) voxel 의 linear index, 범위 밖 포인트는 마지막 dummy voxel (= voxel 개수)"""
+    ind = (pcds_ind[..., 0] * torch.tensor(scale_rate, dtype=pcds_ind.dtype)).long()  # (BS, N, D), 0 방향으로 버림
+    size = torch.tensor(output_size)
+    valid = ((ind >= 0) & (ind < size)).all(dim=-1)
+
+    flat = torch.zeros(ind.shape[:2], dtype=torch.int64)
+    for d in range(len(output_size)):
+        flat = flat * output_size[d] + ind[..., d]
+
+    total = int(size.prod())
+    return torch.where(valid, flat, torch.full_like(flat, total)), total
+
+
+def reference_pool(pcds_feat, pcds_ind, output_size, scale_rate, reduce="amax"):
+    """scatter_reduce 로 구현한 VoxelMaxPool / VoxelMinPool (비교용)"""
+    BS, C, N, _ = pcds_feat.shape
+    flat, total = flat_index(pcds_ind, output_size, scale_rate)
+    voxel_out = torch.zeros(BS, C, total + 1, dtype=pcds_feat.dtype)
+    voxel_out.scatter_reduce_(2, flat.unsqueeze(1).expand(BS, C, N), pcds_feat[..., 0], reduce=reduce, include_self=False)
+    return voxel_out[:, :, :total].view(BS, C, *output_size)
+
+
+def reference_grad(pcds_feat, pcds_ind, output_size, scale_rate, grad_voxel_out, reduce="amax"):
+    """voxel 마다 값이 같은 포인트 중 가장 작은 n 에만 gradient 를 전달 (비교용)"""
+    BS, C, N, _ = pcds_feat.shape
+    flat, total = flat_index(pcds_ind, output_size, scale_rate)
+    flat = flat.unsqueeze(1).expand(BS, C, N)
+    voxel_out = F.pad(reference_pool(pcds_feat, pcds_ind, output_size, scale_rate, reduce).view(BS, C, -1), (0, 1))
+    grad_voxel_out = F.pad(grad_voxel_out.reshape(BS, C, -1), (0, 1))
+
+    n = torch.arange(N).expand(BS, C, N)
+    hit = (voxel_out.gather(2, flat) == pcds_feat[..., 0]) & (flat < total)
+    arg = torch.full((BS, C, total + 1), N, dtype=torch.int64)
+    arg.scatter_reduce_(2, flat, torch.where(hit, n, torch.full_like(n, N)), reduce="amin")
+    win = (arg.gather(2, flat) == n) & (flat < total)
+    return torch.where(win, grad_voxel_out.gather(2, flat), torch.zeros_like(pcds_feat[..., 0])).unsqueeze(-1)
+
+
+def timeit(fn, repeat, device):
+    def sync():
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+
+    fn()  # warm up
+    sync()
+    start = time.time()
+    for _ in range(repeat):
+        fn()
+    sync()
+    return (time.time() - start) / repeat
+
+
+def main(args):
+    BS, C, N, output_size, scale_rate = presets[args.preset]
+    if args.n > 0:
+        N = args.n
+    pcds_feat, pcds_ind = make_inputs(BS, C, N, output_size, scale_rate, ties=args.ties)
+    print(
+        "preset {}: BS={}, C={}, N={}, output_size={}, scale_rate={}, index_dtype={}".format(
+            args.preset, BS, C, N, output_size, scale_rate, args.index_dtype
+        )
+    )
+
+    # 커널에 넘기는 index: float 좌표 그대로, 또는 커널과 같게 quantize 한 (0 방향으로 버림) 정수 voxel index
+    ind_in, rate_in = pcds_ind, scale_rate
+    if args.index_dtype != "float32":
+        ind_in = (pcds_ind * torch.tensor(scale_rate).view(-1, 1)).to(getattr(torch, args.index_dtype))
+        rate_in = (1.0,) * len(scale_rate)
+
+    device = torch.device(args.device)
+    names = args.kernels or [
+        kernel
+        for kernel, (backend, _, _) in kernels.items()
+        if backend in deep_point.backends.device_backends[device.type] and deep_point.backends.available(backend)
+    ]
+    feat_in, ind_in = pcds_feat.to(device), ind_in.to(device)
+
+    def sparse_pool(sparse_function):
+        def pool(pcds_feat, pcds_ind, output_size, scale_rate):
+            cells, voxel_feat = sparse_function(pcds_feat, pcds_ind, output_size, scale_rate)
+            return deep_point.sparse_to_dense(cells, voxel_feat, pcds_feat.size(0), output_size)
+
+        return pool
+
+    for name, dense_pool, sparse_function, reduce in (
+        ("max", deep_point.VoxelMaxPool, deep_point.VoxelMaxPoolSparse, "amax"),
+        ("min", deep_point.VoxelMinPool, deep_point.VoxelMinPoolSparse, "amin"),
+    ):
+        ref = reference_pool(pcds_feat, pcds_ind, output_size, scale_rate, reduce)
+        grad_voxel_out = torch.randn_like(ref)
+        ref_grad = reference_grad(pcds_feat, pcds_ind, output_size, scale_rate, grad_voxel_out, reduce)
+        grad_in = grad_voxel_out.to(device)
+
+        base = None
+        for kernel in names:
+            backend, min_channels, mode = kernels[kernel]
+            deep_point.set_backend(backend, device.type)
+            deep_point.POINT_MAJOR_MIN_CHANNELS = min_channels
+            ind = deep_point.VoxelPlan(ind_in, [(output_size, rate_in)]) if mode == "plan" else ind_in
+            pool = sparse_pool(sparse_function) if mode == "sparse" else dense_pool
+            feat = feat_in.clone().requires_grad_(True)
+            voxel_out = pool(feat, ind, output_size, rate_in)
+            (grad,) = torch.autograd.grad(voxel_out, feat, grad_in, retain_graph=True)
+            print(
+                "[{} {}] forward == scatter_reduce: {}, grad == reference: {}".format(
+                    name, kernel, torch.equal(voxel_out.detach().cpu(), ref), torch.equal(grad.cpu(), ref_grad)
+                )
+            )
+
+            for threads in args.threads:
+                torch.set_num_threads(threads)
+                t_fwd = timeit(lambda: pool(feat_in, ind, output_size, rate_in), args.repeat, device)
+                t_bwd = timeit(lambda: torch.autograd.grad(voxel_out, feat, grad_in, retain_graph=True), args.repeat, device)
+                base = base or (t_fwd, t_bwd)
+                print(
+                    "[{} {}] threads {:2d}: forward {:8.2f} ms ({:7.1f} M/s, x{:.2f}), backward {:8.2f} ms ({:7.1f} M/s, x{:.2f})".format(
+                        name,
+                        kernel,
+                        threads,
+                        t_fwd * 1000,
+                        BS * C * N / t_fwd / 1e6,
+                        base[0] / t_fwd,
+                        t_bwd * 1000,
+                        BS * C * N / t_bwd / 1e6,
+                        base[1] / t_bwd,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="deep_point kernel / backend benchmark")
+    parser.add_argument("--preset", type=str, default="bev", choices=list(presets.keys()))
+    parser.add_argument("--n", type=int, default=0, help="points per frame (0: preset)")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, torch.get_num_threads()])
+    parser.add_argument("--device", type=str, default="cpu", choices=("cpu", "cuda"))
+    parser.add_argument(
+        "--kernels", type=str, nargs="+", default=None, choices=list(kernels.keys()), help="default: all available"
+    )
+    parser.add_argument("--index_dtype", type=str, default="float32", choices=("float32", "int32", "int16"))
+    parser.add_argument("--ties", default=False, action="store_true", help="round features so that voxels contain ties")
+    parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    main(args)
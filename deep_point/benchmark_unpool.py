@@ -0,0 +1,105 @@
+"""
+deep_point.VoxelUnpool 과 F.grid_sample (backbone.BilinearSample) 의 grid -> point 벤치마크
+
+python -m deep_point.benchmark_unpool --threads 1 4 --preset des_out sph_out
+  - grid_sample: backbone.BilinearSample 과 같은 F.grid_sample (grid 계산은 VoxelPlan 에 캐시)
+  - bilinear: VoxelUnpool(mode="bilinear"), VoxelPlan 에 캐시한 4 corner index / weight 로 gather
+  - nearest: VoxelUnpool(mode="nearest"), 포인트가 속한 cell 하나만 gather
+  - VoxelUnpool 은 deep_point 에서 선택된 backend (컴파일된 커널, 없으면 torch) 로 실행, DEEP_POINT_BACKEND=torch 로 변경 가능
+  - 각 방식, 스레드 수에 대해 forward / backward 시간을 출력 (index / grid 계산 시간은 제외)
+  - bilinear 는 grid_sample 과의 최대 오차 (forward / grad), nearest 는 cell 값을 직접 gather 한 결과와 같은지 확인
+"""
+
+import argparse
+import time
+
+import torch
+import torch.nn.functional as F
+
+import deep_point
+
+# name: (BS, C, N, grid_size, scale_rate, 좌표 범위)
+presets = {
+    "des_out": (1, 64, 160000, (256, 256), (0.5, 0.5), (512, 512)),  # MultiViewNetwork.decode 의 des_out
+    "sph_out": (1, 32, 160000, (32, 1024), (0.5, 0.5), (64, 2048)),  # MultiViewNetwork.decode 의 sph1
+}
+
+
+def make_inputs(BS, C, N, grid_size, coord_range, seed=0):
+    g = torch.Generator().manual_seed(seed)
+    grid_feat = torch.randn(BS, C, *grid_size, generator=g)
+    # 범위 밖 포인트 (padding) 도 일부 포함
+    pcds_ind = torch.stack([torch.rand(BS, N, generator=g) * r * 1.1 - r * 0.05 for r in coord_range], dim=2).unsqueeze(-1)
+    return grid_feat, pcds_ind
+
+
+def timeit(fn, repeat):
+    fn()  # warm up
+    start = time.time()
+    for _ in range(repeat):
+        fn()
+    return (time.time() - start) / repeat
+
+
+def main(args):
+    for preset in args.preset:
+        BS, C, N, grid_size, scale_rate, coord_range = presets[preset]
+        if args.n > 0:
+            N = args.n
+        grid_feat, pcds_ind = make_inputs(BS, C, N, grid_size, coord_range)
+        plan = deep_point.VoxelPlan(pcds_ind)
+        grid = plan.sample_grid(grid_size, scale_rate)
+        print(
+            "preset {}: BS={}, C={}, N={}, grid_size={}, scale_rate={}, backend={}".format(
+                preset, BS, C, N, grid_size, scale_rate, deep_point.get_backend("cpu")
+            )
+        )
+
+        methods = {
+            "grid_sample": lambda x: F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=True),
+            "bilinear": lambda x: deep_point.VoxelUnpool(x, plan, scale_rate, mode="bilinear"),
+            "nearest": lambda x: deep_point.VoxelUnpool(x, plan, scale_rate, mode="nearest"),
+        }
+        feat = grid_feat.clone().requires_grad_(True)
+        ref = methods["grid_sample"](feat)
+        grad_pcds_feat = torch.randn_like(ref)
+        (ref_grad,) = torch.autograd.grad(ref, feat, grad_pcds_feat)
+
+        entry = plan.entry(grid_size, scale_rate)
+        cell_feat = grid_feat.view(BS, C, -1).gather(2, entry.offset.clamp(min=0).unsqueeze(1).expand(BS, C, N))
+        ref_nearest = torch.where(entry.valid.unsqueeze(1), cell_feat, torch.zeros_like(cell_feat)).unsqueeze(-1)
+
+        base = None
+        for name, fn in methods.items():
+            pcds_feat = fn(feat)
+            (grad,) = torch.autograd.grad(pcds_feat, feat, grad_pcds_feat, retain_graph=True)
+            if name == "bilinear":
+                print(
+                    "[{}] max |diff| vs grid_sample: forward {:.2e}, grad {:.2e}".format(
+                        name, (pcds_feat - ref).abs().max().item(), (grad - ref_grad).abs().max().item()
+                    )
+                )
+            elif name == "nearest":
+                print("[{}] forward == cell gather: {}".format(name, torch.equal(pcds_feat.detach(), ref_nearest)))
+
+            for threads in args.threads:
+                torch.set_num_threads(threads)
+                t_fwd = timeit(lambda: fn(grid_feat), args.repeat)
+                t_bwd = timeit(lambda: torch.autograd.grad(pcds_feat, feat, grad_pcds_feat, retain_graph=True), args.repeat)
+                base = base or (t_fwd, t_bwd)
+                print(
+                    "[{}] threads {:2d}: forward {:8.2f} ms (x{:.2f}), backward {:8.2f} ms (x{:.2f})".format(
+                        name, threads, t_fwd * 1000, base[0] / t_fwd, t_bwd * 1000, base[1] / t_bwd
+                    )
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="deep_point VoxelUnpool / grid_sample benchmark")
+    parser.add_argument("--preset", type=str, nargs="+", default=list(presets.keys()), choices=list(presets.keys()))
+    parser.add_argument("--n", type=int, default=0, help="points per frame (0: preset)")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, torch.get_num_threads()])
+    parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,237 @@
+import torch
+
+
+# output_size, scale_rate 하나에 대한 voxelization 결과
+# offset, (BS, N) int64 ─ (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1 (커널의 voxel_max_idx / voxel_min_idx 와 동일)
+# valid, (BS, N) bool
+# order, cells, counts, inverse ─ (bs, offset) 기준 정렬 순서와 segment, occupancy ─ 포인트가 있는 voxel (처음 사용할 때 계산)
+class VoxelPlanEntry:
+    def __init__(self, offset, output_size):
+        self.offset = offset
+        self.valid = offset >= 0
+        self.output_size = output_size
+        self._segments = None
+        self._sparse_plan = None
+        self._occupancy = None
+
+    @classmethod
+    def build(cls, pcds_ind, output_size, scale_rate):
+        # 커널의 ComputeIdx 와 같은 계산: float 로 변환 후 scale_rate 를 곱하고 0 방향으로 버림
+        ind = (
+            pcds_ind[..., 0].float() * torch.tensor(scale_rate, dtype=torch.float32, device=pcds_ind.device)
+        ).long()  # (BS, N, D)
+        size = torch.tensor(output_size, dtype=torch.int64, device=pcds_ind.device)
+        valid = ((ind >= 0) & (ind < size)).all(dim=-1)
+
+        offset = torch.zeros(ind.shape[:2], dtype=torch.int64, device=pcds_ind.device)
+        for d in range(len(output_size)):
+            offset = offset * output_size[d] + ind[..., d]
+        return cls(torch.where(valid, offset, torch.full_like(offset, -1)), output_size)
+
+    @property
+    def plane_size(self):
+        plane_size = 1
+        for s in self.output_size:
+            plane_size *= s
+        return plane_size
+
+    def _sort(self):
+        # key = bs * plane_size + offset, 범위 밖 포인트는 마지막 (BS * plane_size)
+        BS, N = self.offset.shape
+        plane_size = self.plane_size
+        bs = torch.arange(BS, device=self.offset.device).unsqueeze(1)
+        key = torch.where(self.valid, self.offset + bs * plane_size, torch.full_like(self.offset, BS * plane_size)).view(-1)
+
+        key_sorted, order = torch.sort(key, stable=True)
+        cells, counts = torch.unique_consecutive(key_sorted, return_counts=True)
+        if cells.numel() > 0 and cells[-1] == BS * plane_size:
+            cells, counts = cells[:-1], counts[:-1]
+        order = order[: int(counts.sum())]
+        inverse = torch.full_like(key, -1)
+        inverse[order] = torch.repeat_interleave(torch.arange(cells.numel(), device=key.device), counts)
+        self._segments = (order, cells, counts, inverse.view(BS, N))
+
+    @property
+    def order(self):
+        """(M,) valid 포인트의 flat index (bs * N + n) 를 (bs, offset) 순서로 정렬, 같은 voxel 안에서는 n 순서"""
+        if self._segments is None:
+            self._sort()
+        return self._segments[0]
+
+    @property
+    def cells(self):
+        """(V,) 포인트가 있는 voxel 의 bs * plane_size + offset"""
+        if self._segments is None:
+            self._sort()
+        return self._segments[1]
+
+    @property
+    def counts(self):
+        """(V,) cells 별 포인트 수, order 를 counts 단위로 나누면 voxel 별 segment"""
+        if self._segments is None:
+            self._sort()
+        return self._segments[2]
+
+    @property
+    def inverse(self):
+        """(BS, N) 포인트가 속한 voxel 의 cells 상 index, 범위 밖이면 -1"""
+        if self._segments is None:
+            self._sort()
+        return self._segments[3]
+
+    @property
+    def sparse_plan(self):
+        """
+        sparse pooling (deep_point.VoxelMaxPoolSparse) 용 plan
+        (BS * N) 포인트를 cells 순서의 1D grid (V,) 로 pooling, pcds_ind: (1, BS * N, 1, 1) int64 = inverse
+        """
+        if self._sparse_plan is None:
+            self._sparse_plan = VoxelPlan.from_offset(self.inverse.view(1, -1), self.cells.numel())
+        return self._sparse_plan
+
+    @property
+    def occupancy(self):
+        """(BS, D1, ..., Dn) bool, 포인트가 하나 이상 들어간 voxel (VoxelMaxPool / VoxelMinPool 결과에서 빈 voxel 이 아닌 곳)"""
+        if self._occupancy is None:
+            BS = self.offset.size(0)
+            plane_size = self.plane_size
+            occupancy = torch.zeros(BS, plane_size + 1, dtype=torch.bool, device=self.offset.device)
+            occupancy.scatter_(1, torch.where(self.valid, self.offset, torch.full_like(self.offset, plane_size)), True)
+            self._occupancy = occupancy[:, :plane_size].reshape(BS, *self.output_size)
+        return self._occupancy
+
+    def __getitem__(self, index):
+        return VoxelPlanEntry(self.offset[index], self.output_size)
+
+    def to(self, device, non_blocking=False):
+        return VoxelPlanEntry(self.offset.to(device, non_blocking=non_blocking), self.output_size)
+
+
+class VoxelPlan:
+    """
+    같은 포인트 좌표로 여러 번 pooling / sampling 할 때 좌표 quantize 결과를 재사용하기 위한 voxelization plan.
+    (output_size, scale_rate) 별 voxel offset / valid / segment 와 BilinearSample 의 grid, VoxelUnpool 의 index 를
+    처음 사용할 때 계산하여 캐시한다.
+    VoxelMaxPool / VoxelMinPool / VoxelUnpool 의 pcds_ind, backbone.BilinearSample 의 grid_coord 자리에 좌표 대신 넘길 수 있다.
+
+    pcds_ind: (BS, N, D, 1)
+    entries: 미리 계산할 (output_size, scale_rate) 목록
+    """
+
+    def __init__(self, pcds_ind, entries=()):
+        assert pcds_ind.dim() == 4
+        self.pcds_ind = pcds_ind.contiguous()
+        self._entries = {}
+        self._grids = {}
+        self._multi_scales = {}
+        self._unpools = {}
+        for output_size, scale_rate in entries:
+            self.entry(output_size, scale_rate)
+
+    @classmethod
+    def from_offset(cls, offset, plane_size):
+        """
+        이미 계산된 1D voxel offset 으로 plan 생성 (output_size=(plane_size,), scale_rate=(1.0,))
+        offset: (BS, N) int64, 범위 밖이면 -1
+        """
+        plan = cls(offset.view(offset.size(0), -1, 1, 1))
+        plan._entries[((int(plane_size),), (1.0,))] = VoxelPlanEntry(offset, (int(plane_size),))
+        return plan
+
+    @property
+    def shape(self):
+        return self.pcds_ind.shape
+
+    def entry(self, output_size, scale_rate):
+        assert self.pcds_ind.size(2) == len(output_size)
+        assert self.pcds_ind.size(2) == len(scale_rate)
+        key = (tuple(int(s) for s in output_size), tuple(float(r) for r in scale_rate))
+        if key not in self._entries:
+            self._entries[key] = VoxelPlanEntry.build(self.pcds_ind, *key)
+        return self._entries[key]
+
+    def multi_scale(self, targets):
+        """
+        여러 (output_size, scale_rate) 를 한 번에 pooling 하기 위한 plan (deep_point.VoxelMaxPoolMultiScale)
+        포인트를 target 수 K 만큼 이어 붙여 (BS, K * N) 각 target 의 grid 를 이어 붙인 1D grid 로 pooling
+        return: VoxelPlan, target 별 plane_size 목록
+        """
+        key = tuple(
+            (tuple(int(s) for s in output_size), tuple(float(r) for r in scale_rate)) for output_size, scale_rate in targets
+        )
+        if key not in self._multi_scales:
+            offsets, plane_sizes, base = [], [], 0
+            for output_size, scale_rate in key:
+                entry = self.entry(output_size, scale_rate)
+                offsets.append(torch.where(entry.valid, entry.offset + base, entry.offset))
+                plane_sizes.append(entry.plane_size)
+                base += entry.plane_size
+            self._multi_scales[key] = (VoxelPlan.from_offset(torch.cat(offsets, dim=1), base), plane_sizes)
+        return self._multi_scales[key]
+
+    def sample_grid(self, grid_size, scale_rate):
+        """
+        backbone.BilinearSample 과 같은 grid (align_corners=True)
+        grid_size: (H, W), return: (BS, N, 1, 2)
+        """
+        key = (tuple(int(s) for s in grid_size), tuple(float(r) for r in scale_rate))
+        if key not in self._grids:
+            H, W = key[0]
+            grid_sample_x = (2 * self.pcds_ind[:, :, 1] * scale_rate[1] / (W - 1)) - 1
+            grid_sample_y = (2 * self.pcds_ind[:, :, 0] * scale_rate[0] / (H - 1)) - 1
+            self._grids[key] = torch.stack((grid_sample_x, grid_sample_y), dim=-1)
+        return self._grids[key]
+
+    def unpool_index(self, grid_size, scale_rate, mode):
+        """
+        deep_point.VoxelUnpool 용 포인트별 gather index, weight (범위 밖 corner 는 index 0, weight 0)
+        mode="nearest": VoxelMaxPool 과 같은 cell (0 방향으로 버림) 하나, mode="bilinear": BilinearSample 과 같은 4 corner (D=2)
+        return: index (BS, K, N) int64, weight (BS, K, N) float ─ K = 1 (nearest) 또는 4 (bilinear)
+        """
+        key = (tuple(int(s) for s in grid_size), tuple(float(r) for r in scale_rate), mode)
+        if key not in self._unpools:
+            if mode == "nearest":
+                entry = self.entry(key[0], key[1])
+                index = torch.where(entry.valid, entry.offset, torch.zeros_like(entry.offset)).unsqueeze(1)
+                weight = entry.valid.float().unsqueeze(1)
+            elif mode == "bilinear":
+                assert self.pcds_ind.size(2) == 2
+                H, W = key[0]
+                # align_corners=True 의 grid_sample 과 같은 pixel 좌표
+                pos = self.pcds_ind[..., 0].float() * torch.tensor(key[1], device=self.pcds_ind.device)  # (BS, N, 2)
+                pos0 = torch.floor(pos)
+                frac = pos - pos0
+                pos0 = pos0.long()
+                index, weight = [], []
+                for dy in (0, 1):
+                    for dx in (0, 1):
+                        row, col = pos0[..., 0] + dy, pos0[..., 1] + dx
+                        valid = (row >= 0) & (row < H) & (col >= 0) & (col < W)
+                        w = (frac[..., 0] if dy else 1 - frac[..., 0]) * (frac[..., 1] if dx else 1 - frac[..., 1])
+                        index.append(torch.where(valid, row * W + col, torch.zeros_like(row)))
+                        weight.append(torch.where(valid, w, torch.zeros_like(w)))
+                index, weight = torch.stack(index, dim=1), torch.stack(weight, dim=1)
+            else:
+                raise ValueError("unknown unpool mode: {}".format(mode))
+            self._unpools[key] = (index, weight)
+        return self._unpools[key]
+
+    def __getitem__(self, index):
+        """배치 차원 slicing (ex. encoded dict 를 프레임 / stage 별로 나눌 때), 계산된 offset 과 grid 는 유지"""
+        assert isinstance(index, slice)
+        plan = VoxelPlan(self.pcds_ind[index])
+        plan._entries = {key: entry[index] for key, entry in self._entries.items()}
+        plan._grids = {key: grid[index] for key, grid in self._grids.items()}
+        plan._unpools = {key: (i[index], w[index]) for key, (i, w) in self._unpools.items()}
+        return plan
+
+    def to(self, device, non_blocking=False):
+        """device 이동 (ex. DataLoader worker 에서 CPU 로 만든 plan), 계산된 offset 과 grid 는 유지"""
+        plan = VoxelPlan(self.pcds_ind.to(device, non_blocking=non_blocking))
+        plan._entries = {key: entry.to(device, non_blocking) for key, entry in self._entries.items()}
+        plan._grids = {key: grid.to(device, non_blocking=non_blocking) for key, grid in self._grids.items()}
+        plan._unpools = {
+            key: (i.to(device, non_blocking=non_blocking), w.to(device, non_blocking=non_blocking))
+            for key, (i, w) in self._unpools.items()
+        }
+        return plan
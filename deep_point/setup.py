@@ -1,5 +1,19 @@
 from setuptools import setup, find_packages
-from torch.utils.cpp_extension import BuildExtension, CppExtension, CUDAExtension
+from torch.utils.cpp_extension import BuildExtension, CppExtension, CUDAExtension, CUDA_HOME
+
+
+ext_modules = [
+    CppExtension(name = 'point_deep.cpu_kernel',
+                sources = ['src/point_deep.cpp'],
+                extra_compile_args = ['-O3', '-fopenmp'],
+                extra_link_args = ['-fopenmp']),
+]
+# nvcc 가 없는 환경에서는 CPU 커널만 빌드 (CUDA tensor 는 deep_point 의 torch backend 사용)
+if CUDA_HOME is not None:
+    ext_modules.append(
+        CUDAExtension(name = 'point_deep.cuda_kernel',
+                    sources = ['src/point_deep_cuda.cpp', 'src/point_deep_cuda_kernel.cu'],
+                    include_dirs = ['src']))
 
 
 setup(
@@ -8,13 +22,7 @@ setup(
     description='deep layers used to convert between point and voxels',
     author='gang.zhang',
     author_email='zhanggang11021136@gmail.com',
-    ext_modules=[
-        CppExtension(name = 'point_deep.cpu_kernel',
-                    sources = ['src/point_deep.cpp']),
-        CUDAExtension(name = 'point_deep.cuda_kernel',
-                    sources = ['src/point_deep_cuda.cpp', 'src/point_deep_cuda_kernel.cu'],
-                    include_dirs = ['src']),
-    ],
+    ext_modules=ext_modules,
     cmdclass={'build_ext': BuildExtension},
     packages=find_packages()
 )
\ No newline at end of file
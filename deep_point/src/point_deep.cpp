@@ -1,4 +1,5 @@
 #include <torch/extension.h>
+#include <ATen/Parallel.h>
 #include <vector>
 #include <cmath>
 
@@ -8,22 +9,30 @@
 #define DATA_PTR data
 #endif
 
+// CPU 병렬화 (at::parallel_for, torch.set_num_threads 로 스레드 수 조절)
+// forward: (bs, c) plane 단위로 나누어 각 스레드가 자기 plane 을 포인트 순서로 처리 (plane 끼리 출력 voxel 이 겹치지 않아 race 없음)
+// backward: 각 원소가 자기 grad_pcds_feat 만 쓰므로 원소 단위로 나눔
+#define PLANE_GRAIN 1
+#define ELEM_GRAIN 32768
+
 // maxpool
 namespace maxpool{
     // voxel max pooling forward
     // pcds_feat, (BS, C, N, 1)
     // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
     // voxel_out, (BS, C, D1, D2, ..., Dn)
-    // voxel_max_idx, (BS, N)
+    // voxel_max_arg, (BS, C, D1, D2, ..., Dn), int32: voxel 의 최대값을 가진 포인트 n (빈 voxel 은 -1)
+    // start, end 는 plane 단위로 나누어 호출하므로 plane 안에서는 n 이 증가하는 순서로 처리되고,
+    // 같은 값이면 먼저 나온 (n 이 가장 작은) 포인트가 선택된다.
     template<typename real>
-    void VoxelMaxPoolUpdateOutputInit(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data,
-                                    int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
-                                    int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
+    void VoxelMaxPoolUpdateOutputKernel(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data, int32_t* voxel_max_arg_data,
+                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t start, int64_t end,
+                                        int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
         int64_t bs, c, n;
         int64_t index_pcds, index_ind, index_voxel;
         int64_t index_res;
-        for(int64_t i=0; i < loop; i++){
+        for(int64_t i=start; i < end; i++){
             bs = i / (C * N);
             index_res = i - bs * C * N;
             c = index_res / N;
@@ -45,20 +54,28 @@ namespace maxpool{
             }
 
             if(flag){
-                voxel_out_data[index_voxel] = pcds_feat_data[index_pcds];
+                if((voxel_max_arg_data[index_voxel] < 0) || (voxel_out_data[index_voxel] < pcds_feat_data[index_pcds])){
+                    voxel_out_data[index_voxel] = pcds_feat_data[index_pcds];
+                    voxel_max_arg_data[index_voxel] = static_cast<int32_t>(n);
+                }
             }
         }
     }
 
+    // backward
+    // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
+    // voxel_max_arg, (BS, C, D1, D2, ..., Dn)
+    // grad_pcds_feat, (BS, C, N, 1)
+    // grad_voxel_out, (BS, C, D1, D2, ..., Dn)
     template<typename real>
-    void VoxelMaxPoolUpdateOutputKernel(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data,
-                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
+    void VoxelMaxPoolUpdateBackwardKernel(real* pcds_ind_data, int32_t* voxel_max_arg_data, real* grad_pcds_feat_data, real* grad_voxel_out_data,
+                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t start, int64_t end,
                                         int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
         int64_t bs, c, n;
         int64_t index_pcds, index_ind, index_voxel;
         int64_t index_res;
-        for(int64_t i=0; i < loop; i++){
+        for(int64_t i=start; i < end; i++){
             bs = i / (C * N);
             index_res = i - bs * C * N;
             c = index_res / N;
@@ -80,37 +97,24 @@ namespace maxpool{
             }
 
             if(flag){
-                if(voxel_out_data[index_voxel] < pcds_feat_data[index_pcds]){
-                    voxel_out_data[index_voxel] = pcds_feat_data[index_pcds];
+                if(voxel_max_arg_data[index_voxel] == n){
+                    grad_pcds_feat_data[index_pcds] = grad_voxel_out_data[index_voxel];
                 }
             }
         }
     }
 
-    // backward
-    // pcds_feat, (BS, C, N, 1)
-    // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
-    // voxel_out, (BS, C, D1, D2, ..., Dn)
-    // voxel_max_idx, (BS, N)
-    // grad_pcds_feat, (BS, C, N, 1)
-    // grad_voxel_out, (BS, C, D1, D2, ..., Dn)
-    template<typename real>
-    void VoxelMaxPoolUpdateBackwardKernel(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data, real* grad_pcds_feat_data, real* grad_voxel_out_data,
-                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
-                                        int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
+    // point-major (index 를 포인트당 한 번만 계산)
+    // voxel_max_idx, (BS, N): (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1 (CUDA 의 ComputeIdx, deep_point.VoxelPlan 과 동일)
+    template<typename index_t>
+    void VoxelMaxPoolUpdateOutputComputeIdx(index_t* pcds_ind_data, int64_t* voxel_max_idx_data,
+                                            int64_t BS, int64_t N, int64_t D, int64_t start, int64_t end,
+                                            int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
-        int64_t bs, c, n;
-        int64_t index_pcds, index_ind, index_voxel;
-        int64_t index_res;
-        for(int64_t i=0; i < loop; i++){
-            bs = i / (C * N);
-            index_res = i - bs * C * N;
-            c = index_res / N;
-            n = index_res - c * N;
-
-            index_pcds = i;
-            index_ind = bs * N * D + n * D;
-            index_voxel = bs * voxel_out_stride[0] + c * voxel_out_stride[1]; // bs and c
+        int64_t index_ind, index_voxel;
+        for(int64_t i=start; i < end; i++){
+            index_ind = i * D;
+            index_voxel = 0; // plane 안의 offset
 
             bool flag = true;
             for(int64_t d=0; d < D; d++){
@@ -122,10 +126,51 @@ namespace maxpool{
                     flag = false;
                 }
             }
+            voxel_max_idx_data[i] = flag ? index_voxel : -1;
+        }
+    }
 
-            if(flag){
-                if(voxel_out_data[index_voxel] == pcds_feat_data[index_pcds]){
-                    grad_pcds_feat_data[index_pcds] = grad_voxel_out_data[index_voxel];
+    // (bs, c) plane 단위: plane 안에서 포인트 순서로 읽으므로 pcds_feat 접근이 연속적
+    template<typename real>
+    void VoxelMaxPoolUpdateOutputIdxKernel(real* pcds_feat_data, real* voxel_out_data, int64_t* voxel_max_idx_data, int32_t* voxel_max_arg_data,
+                                            int64_t BS, int64_t C, int64_t N, int64_t plane_start, int64_t plane_end, int64_t* voxel_out_stride)
+    {
+        for(int64_t plane=plane_start; plane < plane_end; plane++){
+            int64_t bs = plane / C;
+            int64_t c = plane - bs * C;
+
+            real* feat = pcds_feat_data + plane * N;
+            real* out = voxel_out_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int32_t* arg = voxel_max_arg_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int64_t* idx = voxel_max_idx_data + bs * N;
+
+            for(int64_t n=0; n < N; n++){
+                int64_t v = idx[n];
+                if((v >= 0) && ((arg[v] < 0) || (out[v] < feat[n]))){
+                    out[v] = feat[n];
+                    arg[v] = static_cast<int32_t>(n);
+                }
+            }
+        }
+    }
+
+    template<typename real>
+    void VoxelMaxPoolUpdateBackwardIdxKernel(int64_t* voxel_max_idx_data, int32_t* voxel_max_arg_data, real* grad_pcds_feat_data, real* grad_voxel_out_data,
+                                            int64_t BS, int64_t C, int64_t N, int64_t plane_start, int64_t plane_end, int64_t* voxel_out_stride)
+    {
+        for(int64_t plane=plane_start; plane < plane_end; plane++){
+            int64_t bs = plane / C;
+            int64_t c = plane - bs * C;
+
+            real* grad_feat = grad_pcds_feat_data + plane * N;
+            real* grad_out = grad_voxel_out_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int32_t* arg = voxel_max_arg_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int64_t* idx = voxel_max_idx_data + bs * N;
+
+            for(int64_t n=0; n < N; n++){
+                int64_t v = idx[n];
+                if((v >= 0) && (arg[v] == n)){
+                    grad_feat[n] = grad_out[v];
                 }
             }
         }
@@ -138,16 +183,18 @@ namespace minpool{
     // pcds_feat, (BS, C, N, 1)
     // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
     // voxel_out, (BS, C, D1, D2, ..., Dn)
-    // voxel_min_idx, (BS, N)
+    // voxel_min_arg, (BS, C, D1, D2, ..., Dn), int32: voxel 의 최소값을 가진 포인트 n (빈 voxel 은 -1)
+    // start, end 는 plane 단위로 나누어 호출하므로 plane 안에서는 n 이 증가하는 순서로 처리되고,
+    // 같은 값이면 먼저 나온 (n 이 가장 작은) 포인트가 선택된다.
     template<typename real>
-    void VoxelMinPoolUpdateOutputInit(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data,
-                                    int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
-                                    int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
+    void VoxelMinPoolUpdateOutputKernel(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data, int32_t* voxel_min_arg_data,
+                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t start, int64_t end,
+                                        int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
         int64_t bs, c, n;
         int64_t index_pcds, index_ind, index_voxel;
         int64_t index_res;
-        for(int64_t i=0; i < loop; i++){
+        for(int64_t i=start; i < end; i++){
             bs = i / (C * N);
             index_res = i - bs * C * N;
             c = index_res / N;
@@ -169,20 +216,28 @@ namespace minpool{
             }
 
             if(flag){
-                voxel_out_data[index_voxel] = pcds_feat_data[index_pcds];  // 첫 번째 값으로 초기화
+                if((voxel_min_arg_data[index_voxel] < 0) || (voxel_out_data[index_voxel] > pcds_feat_data[index_pcds])){
+                    voxel_out_data[index_voxel] = pcds_feat_data[index_pcds];
+                    voxel_min_arg_data[index_voxel] = static_cast<int32_t>(n);
+                }
             }
         }
     }
 
+    // backward
+    // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
+    // voxel_min_arg, (BS, C, D1, D2, ..., Dn)
+    // grad_pcds_feat, (BS, C, N, 1)
+    // grad_voxel_out, (BS, C, D1, D2, ..., Dn)
     template<typename real>
-    void VoxelMinPoolUpdateOutputKernel(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data,
-                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
+    void VoxelMinPoolUpdateBackwardKernel(real* pcds_ind_data, int32_t* voxel_min_arg_data, real* grad_pcds_feat_data, real* grad_voxel_out_data,
+                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t start, int64_t end,
                                         int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
         int64_t bs, c, n;
         int64_t index_pcds, index_ind, index_voxel;
         int64_t index_res;
-        for(int64_t i=0; i < loop; i++){
+        for(int64_t i=start; i < end; i++){
             bs = i / (C * N);
             index_res = i - bs * C * N;
             c = index_res / N;
@@ -204,37 +259,24 @@ namespace minpool{
             }
 
             if(flag){
-                if(voxel_out_data[index_voxel] > pcds_feat_data[index_pcds]){  // 최소값 찾기: 현재 값이 포인트 특징값보다 큰 경우
-                    voxel_out_data[index_voxel] = pcds_feat_data[index_pcds];  // 더 작은 값으로 업데이트
+                if(voxel_min_arg_data[index_voxel] == n){
+                    grad_pcds_feat_data[index_pcds] = grad_voxel_out_data[index_voxel];
                 }
             }
         }
     }
 
-    // backward
-    // pcds_feat, (BS, C, N, 1)
-    // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
-    // voxel_out, (BS, C, D1, D2, ..., Dn)
-    // voxel_min_idx, (BS, N)
-    // grad_pcds_feat, (BS, C, N, 1)
-    // grad_voxel_out, (BS, C, D1, D2, ..., Dn)
-    template<typename real>
-    void VoxelMinPoolUpdateBackwardKernel(real* pcds_feat_data, real* pcds_ind_data, real* voxel_out_data, real* grad_pcds_feat_data, real* grad_voxel_out_data,
-                                        int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
-                                        int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
+    // point-major (index 를 포인트당 한 번만 계산)
+    // voxel_min_idx, (BS, N): (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1 (CUDA 의 ComputeIdx, deep_point.VoxelPlan 과 동일)
+    template<typename index_t>
+    void VoxelMinPoolUpdateOutputComputeIdx(index_t* pcds_ind_data, int64_t* voxel_min_idx_data,
+                                            int64_t BS, int64_t N, int64_t D, int64_t start, int64_t end,
+                                            int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
-        int64_t bs, c, n;
-        int64_t index_pcds, index_ind, index_voxel;
-        int64_t index_res;
-        for(int64_t i=0; i < loop; i++){
-            bs = i / (C * N);
-            index_res = i - bs * C * N;
-            c = index_res / N;
-            n = index_res - c * N;
-
-            index_pcds = i;
-            index_ind = bs * N * D + n * D;
-            index_voxel = bs * voxel_out_stride[0] + c * voxel_out_stride[1]; // bs and c
+        int64_t index_ind, index_voxel;
+        for(int64_t i=start; i < end; i++){
+            index_ind = i * D;
+            index_voxel = 0; // plane 안의 offset
 
             bool flag = true;
             for(int64_t d=0; d < D; d++){
@@ -246,17 +288,133 @@ namespace minpool{
                     flag = false;
                 }
             }
+            voxel_min_idx_data[i] = flag ? index_voxel : -1;
+        }
+    }
 
-            if(flag){
-                if(voxel_out_data[index_voxel] == pcds_feat_data[index_pcds]){  // 현재 포인트가 해당 복셀의 최소값을 기여한 경우
-                    grad_pcds_feat_data[index_pcds] = grad_voxel_out_data[index_voxel];  // 그래디언트를 포인트 특징으로 전파
+    // (bs, c) plane 단위: plane 안에서 포인트 순서로 읽으므로 pcds_feat 접근이 연속적
+    template<typename real>
+    void VoxelMinPoolUpdateOutputIdxKernel(real* pcds_feat_data, real* voxel_out_data, int64_t* voxel_min_idx_data, int32_t* voxel_min_arg_data,
+                                            int64_t BS, int64_t C, int64_t N, int64_t plane_start, int64_t plane_end, int64_t* voxel_out_stride)
+    {
+        for(int64_t plane=plane_start; plane < plane_end; plane++){
+            int64_t bs = plane / C;
+            int64_t c = plane - bs * C;
+
+            real* feat = pcds_feat_data + plane * N;
+            real* out = voxel_out_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int32_t* arg = voxel_min_arg_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int64_t* idx = voxel_min_idx_data + bs * N;
+
+            for(int64_t n=0; n < N; n++){
+                int64_t v = idx[n];
+                if((v >= 0) && ((arg[v] < 0) || (out[v] > feat[n]))){
+                    out[v] = feat[n];
+                    arg[v] = static_cast<int32_t>(n);
+                }
+            }
+        }
+    }
+
+    template<typename real>
+    void VoxelMinPoolUpdateBackwardIdxKernel(int64_t* voxel_min_idx_data, int32_t* voxel_min_arg_data, real* grad_pcds_feat_data, real* grad_voxel_out_data,
+                                            int64_t BS, int64_t C, int64_t N, int64_t plane_start, int64_t plane_end, int64_t* voxel_out_stride)
+    {
+        for(int64_t plane=plane_start; plane < plane_end; plane++){
+            int64_t bs = plane / C;
+            int64_t c = plane - bs * C;
+
+            real* grad_feat = grad_pcds_feat_data + plane * N;
+            real* grad_out = grad_voxel_out_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int32_t* arg = voxel_min_arg_data + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+            int64_t* idx = voxel_min_idx_data + bs * N;
+
+            for(int64_t n=0; n < N; n++){
+                int64_t v = idx[n];
+                if((v >= 0) && (arg[v] == n)){
+                    grad_feat[n] = grad_out[v];
+                }
+            }
+        }
+    }
+}
+
+// unpool
+namespace unpool{
+    // grid feature 를 포인트로 gather (deep_point.VoxelUnpool)
+    // grid_feat, (BS, C, D1 * ... * Dn)
+    // index, weight, (BS, K, N): 포인트 n 의 feature = sum_k weight[k] * grid_feat[index[k]] (범위 밖 corner 는 weight 0)
+    // pcds_feat, (BS, C, N)
+    template<typename real>
+    void VoxelUnpoolUpdateOutputKernel(real* grid_feat_data, int64_t* index_data, real* weight_data, real* pcds_feat_data,
+                                    int64_t BS, int64_t C, int64_t N, int64_t K, int64_t P, int64_t plane_start, int64_t plane_end)
+    {
+        for(int64_t plane=plane_start; plane < plane_end; plane++){
+            int64_t bs = plane / C;
+
+            real* grid = grid_feat_data + plane * P;
+            real* feat = pcds_feat_data + plane * N;
+            int64_t* idx = index_data + bs * K * N;
+            real* w = weight_data + bs * K * N;
+
+            for(int64_t n=0; n < N; n++){
+                real acc = 0;
+                for(int64_t k=0; k < K; k++){
+                    acc += w[k * N + n] * grid[idx[k * N + n]];
+                }
+                feat[n] = acc;
+            }
+        }
+    }
+
+    // (bs, c) plane 단위로 나누므로 한 plane 의 grad_grid_feat 는 한 스레드만 누적 (race 없음)
+    template<typename real>
+    void VoxelUnpoolUpdateBackwardKernel(int64_t* index_data, real* weight_data, real* grad_pcds_feat_data, real* grad_grid_feat_data,
+                                    int64_t BS, int64_t C, int64_t N, int64_t K, int64_t P, int64_t plane_start, int64_t plane_end)
+    {
+        for(int64_t plane=plane_start; plane < plane_end; plane++){
+            int64_t bs = plane / C;
+
+            real* grad_grid = grad_grid_feat_data + plane * P;
+            real* grad_feat = grad_pcds_feat_data + plane * N;
+            int64_t* idx = index_data + bs * K * N;
+            real* w = weight_data + bs * K * N;
+
+            for(int64_t k=0; k < K; k++){
+                for(int64_t n=0; n < N; n++){
+                    grad_grid[idx[k * N + n]] += w[k * N + n] * grad_feat[n];
+                }
+            }
+        }
+    }
+}
+
+// pointnet + maxpool
+namespace pointnet{
+    // chunk 포인트의 PointNet (BN fold) 출력을 바로 voxel 로 max-reduce (deep_point.PointNetVoxelMaxPool, inference 전용)
+    // point_feat, (CL, count) ─ chunk 포인트의 마지막 layer 출력 (채널 우선)
+    // voxel_idx, (count,) ─ chunk 포인트의 (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1
+    // ReLU 출력은 0 이상이므로 0 으로 초기화한 voxel_out 에 max 만 하면 빈 voxel 은 0 (VoxelMaxPool 과 동일)
+    // 채널 단위로 나누므로 한 voxel 은 한 스레드만 씀 (race 없음)
+    template<typename real>
+    void PointNetUpdateOutputKernel(real* point_feat_data, int64_t* voxel_idx_data, real* voxel_out_data,
+                                int64_t P, int64_t count, int64_t c_begin, int64_t c_end)
+    {
+        for(int64_t c=c_begin; c < c_end; c++){
+            real* feat = point_feat_data + c * count;
+            real* out = voxel_out_data + c * P;
+            for(int64_t i=0; i < count; i++){
+                int64_t index_voxel = voxel_idx_data[i];
+                if((index_voxel >= 0) && (out[index_voxel] < feat[i])){
+                    out[index_voxel] = feat[i];
                 }
             }
         }
     }
 }
 
-void voxel_maxpooling_cpu_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
+
+void voxel_maxpooling_cpu_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
 at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
 {
     int64_t BS = pcds_feat.size(0);
@@ -264,47 +422,115 @@ at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size,
     int64_t N = pcds_feat.size(2);
 
     int64_t D = pcds_ind.size(2);
-    int64_t loop = BS * C * N;
 
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMaxPoolUpdateOutputInit", [&] {
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMaxPoolUpdateOutputKernel", [&] {
         scalar_t *pcds_feat_data = pcds_feat.DATA_PTR<scalar_t>();
         scalar_t *pcds_ind_data = pcds_ind.DATA_PTR<scalar_t>();
         scalar_t *voxel_out_data = voxel_out.DATA_PTR<scalar_t>();
+        int32_t *voxel_max_arg_data = voxel_max_arg.DATA_PTR<int32_t>();
 
-        maxpool::VoxelMaxPoolUpdateOutputInit<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, BS, C, N, D, loop,
-        voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
-
-        maxpool::VoxelMaxPoolUpdateOutputKernel<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, BS, C, N, D, loop,
-        voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            maxpool::VoxelMaxPoolUpdateOutputKernel<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, voxel_max_arg_data, BS, C, N, D, plane_begin * N, plane_end * N,
+            voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        });
     });
 }
 
 
-void voxel_maxpooling_cpu_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
+void voxel_maxpooling_cpu_backward(at::Tensor pcds_ind, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
 at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    int64_t BS = grad_pcds_feat.size(0);
+    int64_t C = grad_pcds_feat.size(1);
+    int64_t N = grad_pcds_feat.size(2);
+
+    int64_t D = pcds_ind.size(2);
+    int64_t loop = BS * C * N;
+
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_pcds_feat.scalar_type(), "VoxelMaxPoolUpdateBackwardKernel", [&] {
+        scalar_t *pcds_ind_data = pcds_ind.DATA_PTR<scalar_t>();
+        int32_t *voxel_max_arg_data = voxel_max_arg.DATA_PTR<int32_t>();
+
+        scalar_t *grad_pcds_feat_data = grad_pcds_feat.DATA_PTR<scalar_t>();
+        scalar_t *grad_voxel_out_data = grad_voxel_out.DATA_PTR<scalar_t>();
+
+        at::parallel_for(0, loop, ELEM_GRAIN, [&](int64_t begin, int64_t end) {
+            maxpool::VoxelMaxPoolUpdateBackwardKernel<scalar_t>(pcds_ind_data, voxel_max_arg_data, grad_pcds_feat_data, grad_voxel_out_data,
+            BS, C, N, D, begin, end, voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        });
+    });
+}
+
+
+// voxel_max_idx 가 이미 계산된 경우 (point-major, deep_point.VoxelPlan)
+void voxel_maxpooling_cpu_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size)
 {
     int64_t BS = pcds_feat.size(0);
     int64_t C = pcds_feat.size(1);
     int64_t N = pcds_feat.size(2);
 
+    // 정수 feature (ex. label) 도 pooling 가능
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_feat.scalar_type(), "VoxelMaxPoolUpdateOutputIdxKernel", [&] {
+        scalar_t *pcds_feat_data = pcds_feat.DATA_PTR<scalar_t>();
+        scalar_t *voxel_out_data = voxel_out.DATA_PTR<scalar_t>();
+        int64_t *voxel_max_idx_data = voxel_max_idx.DATA_PTR<int64_t>();
+        int32_t *voxel_max_arg_data = voxel_max_arg.DATA_PTR<int32_t>();
+
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            maxpool::VoxelMaxPoolUpdateOutputIdxKernel<scalar_t>(pcds_feat_data, voxel_out_data, voxel_max_idx_data, voxel_max_arg_data, BS, C, N, plane_begin, plane_end,
+            voxel_out_stride.DATA_PTR<int64_t>());
+        });
+    });
+}
+
+
+// point-major: 포인트별 voxel index 를 voxel_max_idx 에 한 번만 계산한 뒤 모든 채널에서 재사용
+void voxel_maxpooling_cpu_forward_point_major(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    int64_t BS = pcds_ind.size(0);
+    int64_t N = pcds_ind.size(1);
+
     int64_t D = pcds_ind.size(2);
-    int64_t loop = BS * C * N;
 
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMaxPoolUpdateBackwardKernel", [&] {
-        scalar_t *pcds_feat_data = pcds_feat.DATA_PTR<scalar_t>();
+    // pcds_ind 는 pcds_feat 와 독립적인 dtype (float 좌표 또는 int16 / int32 / int64 voxel index)
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_ind.scalar_type(), "VoxelMaxPoolUpdateOutputComputeIdx", [&] {
         scalar_t *pcds_ind_data = pcds_ind.DATA_PTR<scalar_t>();
-        scalar_t *voxel_out_data = voxel_out.DATA_PTR<scalar_t>();
+        int64_t *voxel_max_idx_data = voxel_max_idx.DATA_PTR<int64_t>();
+
+        at::parallel_for(0, BS * N, ELEM_GRAIN, [&](int64_t begin, int64_t end) {
+            maxpool::VoxelMaxPoolUpdateOutputComputeIdx<scalar_t>(pcds_ind_data, voxel_max_idx_data, BS, N, D, begin, end,
+            voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        });
+    });
+
+    voxel_maxpooling_cpu_forward_with_idx(pcds_feat, voxel_out, voxel_max_idx, voxel_max_arg, voxel_out_size, voxel_out_stride, output_size);
+}
+
+
+void voxel_maxpooling_cpu_backward_point_major(at::Tensor pcds_ind, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    int64_t BS = grad_pcds_feat.size(0);
+    int64_t C = grad_pcds_feat.size(1);
+    int64_t N = grad_pcds_feat.size(2);
+
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_pcds_feat.scalar_type(), "VoxelMaxPoolUpdateBackwardIdxKernel", [&] {
+        int64_t *voxel_max_idx_data = voxel_max_idx.DATA_PTR<int64_t>();
+        int32_t *voxel_max_arg_data = voxel_max_arg.DATA_PTR<int32_t>();
 
         scalar_t *grad_pcds_feat_data = grad_pcds_feat.DATA_PTR<scalar_t>();
         scalar_t *grad_voxel_out_data = grad_voxel_out.DATA_PTR<scalar_t>();
 
-        maxpool::VoxelMaxPoolUpdateBackwardKernel<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, grad_pcds_feat_data, grad_voxel_out_data,
-        BS, C, N, D, loop, voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            maxpool::VoxelMaxPoolUpdateBackwardIdxKernel<scalar_t>(voxel_max_idx_data, voxel_max_arg_data, grad_pcds_feat_data, grad_voxel_out_data,
+            BS, C, N, plane_begin, plane_end, voxel_out_stride.DATA_PTR<int64_t>());
+        });
     });
 }
 
-
-void voxel_minpooling_cpu_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
+void voxel_minpooling_cpu_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
 at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
 {
     int64_t BS = pcds_feat.size(0);
@@ -312,42 +538,189 @@ at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size,
     int64_t N = pcds_feat.size(2);
 
     int64_t D = pcds_ind.size(2);
-    int64_t loop = BS * C * N;
 
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMinPoolUpdateOutputInit", [&] {
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMinPoolUpdateOutputKernel", [&] {
         scalar_t *pcds_feat_data = pcds_feat.DATA_PTR<scalar_t>();
         scalar_t *pcds_ind_data = pcds_ind.DATA_PTR<scalar_t>();
         scalar_t *voxel_out_data = voxel_out.DATA_PTR<scalar_t>();
+        int32_t *voxel_min_arg_data = voxel_min_arg.DATA_PTR<int32_t>();
 
-        minpool::VoxelMinPoolUpdateOutputInit<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, BS, C, N, D, loop,
-        voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
-
-        minpool::VoxelMinPoolUpdateOutputKernel<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, BS, C, N, D, loop,
-        voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            minpool::VoxelMinPoolUpdateOutputKernel<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, voxel_min_arg_data, BS, C, N, D, plane_begin * N, plane_end * N,
+            voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        });
     });
 }
 
 
-void voxel_minpooling_cpu_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
+void voxel_minpooling_cpu_backward(at::Tensor pcds_ind, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
 at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    int64_t BS = grad_pcds_feat.size(0);
+    int64_t C = grad_pcds_feat.size(1);
+    int64_t N = grad_pcds_feat.size(2);
+
+    int64_t D = pcds_ind.size(2);
+    int64_t loop = BS * C * N;
+
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_pcds_feat.scalar_type(), "VoxelMinPoolUpdateBackwardKernel", [&] {
+        scalar_t *pcds_ind_data = pcds_ind.DATA_PTR<scalar_t>();
+        int32_t *voxel_min_arg_data = voxel_min_arg.DATA_PTR<int32_t>();
+
+        scalar_t *grad_pcds_feat_data = grad_pcds_feat.DATA_PTR<scalar_t>();
+        scalar_t *grad_voxel_out_data = grad_voxel_out.DATA_PTR<scalar_t>();
+
+        at::parallel_for(0, loop, ELEM_GRAIN, [&](int64_t begin, int64_t end) {
+            minpool::VoxelMinPoolUpdateBackwardKernel<scalar_t>(pcds_ind_data, voxel_min_arg_data, grad_pcds_feat_data, grad_voxel_out_data,
+            BS, C, N, D, begin, end, voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        });
+    });
+}
+
+
+// voxel_min_idx 가 이미 계산된 경우 (point-major, deep_point.VoxelPlan)
+void voxel_minpooling_cpu_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size)
 {
     int64_t BS = pcds_feat.size(0);
     int64_t C = pcds_feat.size(1);
     int64_t N = pcds_feat.size(2);
 
+    // 정수 feature (ex. label) 도 pooling 가능
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_feat.scalar_type(), "VoxelMinPoolUpdateOutputIdxKernel", [&] {
+        scalar_t *pcds_feat_data = pcds_feat.DATA_PTR<scalar_t>();
+        scalar_t *voxel_out_data = voxel_out.DATA_PTR<scalar_t>();
+        int64_t *voxel_min_idx_data = voxel_min_idx.DATA_PTR<int64_t>();
+        int32_t *voxel_min_arg_data = voxel_min_arg.DATA_PTR<int32_t>();
+
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            minpool::VoxelMinPoolUpdateOutputIdxKernel<scalar_t>(pcds_feat_data, voxel_out_data, voxel_min_idx_data, voxel_min_arg_data, BS, C, N, plane_begin, plane_end,
+            voxel_out_stride.DATA_PTR<int64_t>());
+        });
+    });
+}
+
+
+// point-major: 포인트별 voxel index 를 voxel_min_idx 에 한 번만 계산한 뒤 모든 채널에서 재사용
+void voxel_minpooling_cpu_forward_point_major(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    int64_t BS = pcds_ind.size(0);
+    int64_t N = pcds_ind.size(1);
+
     int64_t D = pcds_ind.size(2);
-    int64_t loop = BS * C * N;
 
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMinPoolUpdateBackwardKernel", [&] {
-        scalar_t *pcds_feat_data = pcds_feat.DATA_PTR<scalar_t>();
+    // pcds_ind 는 pcds_feat 와 독립적인 dtype (float 좌표 또는 int16 / int32 / int64 voxel index)
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_ind.scalar_type(), "VoxelMinPoolUpdateOutputComputeIdx", [&] {
         scalar_t *pcds_ind_data = pcds_ind.DATA_PTR<scalar_t>();
-        scalar_t *voxel_out_data = voxel_out.DATA_PTR<scalar_t>();
+        int64_t *voxel_min_idx_data = voxel_min_idx.DATA_PTR<int64_t>();
+
+        at::parallel_for(0, BS * N, ELEM_GRAIN, [&](int64_t begin, int64_t end) {
+            minpool::VoxelMinPoolUpdateOutputComputeIdx<scalar_t>(pcds_ind_data, voxel_min_idx_data, BS, N, D, begin, end,
+            voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        });
+    });
+
+    voxel_minpooling_cpu_forward_with_idx(pcds_feat, voxel_out, voxel_min_idx, voxel_min_arg, voxel_out_size, voxel_out_stride, output_size);
+}
+
+
+void voxel_minpooling_cpu_backward_point_major(at::Tensor pcds_ind, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    int64_t BS = grad_pcds_feat.size(0);
+    int64_t C = grad_pcds_feat.size(1);
+    int64_t N = grad_pcds_feat.size(2);
+
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_pcds_feat.scalar_type(), "VoxelMinPoolUpdateBackwardIdxKernel", [&] {
+        int64_t *voxel_min_idx_data = voxel_min_idx.DATA_PTR<int64_t>();
+        int32_t *voxel_min_arg_data = voxel_min_arg.DATA_PTR<int32_t>();
 
         scalar_t *grad_pcds_feat_data = grad_pcds_feat.DATA_PTR<scalar_t>();
         scalar_t *grad_voxel_out_data = grad_voxel_out.DATA_PTR<scalar_t>();
 
-        minpool::VoxelMinPoolUpdateBackwardKernel<scalar_t>(pcds_feat_data, pcds_ind_data, voxel_out_data, grad_pcds_feat_data, grad_voxel_out_data,
-        BS, C, N, D, loop, voxel_out_size.DATA_PTR<int64_t>(), voxel_out_stride.DATA_PTR<int64_t>(), output_size.DATA_PTR<int64_t>(), scale_rate.DATA_PTR<float>());
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            minpool::VoxelMinPoolUpdateBackwardIdxKernel<scalar_t>(voxel_min_idx_data, voxel_min_arg_data, grad_pcds_feat_data, grad_voxel_out_data,
+            BS, C, N, plane_begin, plane_end, voxel_out_stride.DATA_PTR<int64_t>());
+        });
+    });
+}
+
+
+void voxel_unpool_cpu_forward(at::Tensor grid_feat, at::Tensor index, at::Tensor weight, at::Tensor pcds_feat)
+{
+    int64_t BS = grid_feat.size(0);
+    int64_t C = grid_feat.size(1);
+    int64_t P = grid_feat.size(2);
+    int64_t K = index.size(1);
+    int64_t N = index.size(2);
+
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grid_feat.scalar_type(), "VoxelUnpoolUpdateOutputKernel", [&] {
+        scalar_t *grid_feat_data = grid_feat.DATA_PTR<scalar_t>();
+        int64_t *index_data = index.DATA_PTR<int64_t>();
+        scalar_t *weight_data = weight.DATA_PTR<scalar_t>();
+        scalar_t *pcds_feat_data = pcds_feat.DATA_PTR<scalar_t>();
+
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            unpool::VoxelUnpoolUpdateOutputKernel<scalar_t>(grid_feat_data, index_data, weight_data, pcds_feat_data, BS, C, N, K, P, plane_begin, plane_end);
+        });
+    });
+}
+
+
+void voxel_unpool_cpu_backward(at::Tensor index, at::Tensor weight, at::Tensor grad_pcds_feat, at::Tensor grad_grid_feat)
+{
+    int64_t BS = grad_grid_feat.size(0);
+    int64_t C = grad_grid_feat.size(1);
+    int64_t P = grad_grid_feat.size(2);
+    int64_t K = index.size(1);
+    int64_t N = index.size(2);
+
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_grid_feat.scalar_type(), "VoxelUnpoolUpdateBackwardKernel", [&] {
+        int64_t *index_data = index.DATA_PTR<int64_t>();
+        scalar_t *weight_data = weight.DATA_PTR<scalar_t>();
+        scalar_t *grad_pcds_feat_data = grad_pcds_feat.DATA_PTR<scalar_t>();
+        scalar_t *grad_grid_feat_data = grad_grid_feat.DATA_PTR<scalar_t>();
+
+        at::parallel_for(0, BS * C, PLANE_GRAIN, [&](int64_t plane_begin, int64_t plane_end) {
+            unpool::VoxelUnpoolUpdateBackwardKernel<scalar_t>(index_data, weight_data, grad_pcds_feat_data, grad_grid_feat_data, BS, C, N, K, P, plane_begin, plane_end);
+        });
+    });
+}
+
+
+// 포인트를 POINT_CHUNK 개씩 나누어 feature 는 (CL, POINT_CHUNK) 크기로만 계산 (포인트 전체의 feature 를 만들지 않음)
+// layer 계산은 at::addmm (BLAS), max-reduce 는 채널 단위 병렬
+#define POINT_CHUNK 16384
+
+void pointnet_maxpooling_cpu_forward(at::Tensor pcds_feat, at::Tensor voxel_idx, std::vector<at::Tensor> weights, std::vector<at::Tensor> biases,
+at::Tensor voxel_out)
+{
+    int64_t BS = pcds_feat.size(0);
+    int64_t N = pcds_feat.size(2);
+    int64_t CL = voxel_out.size(1);
+    int64_t P = voxel_out.numel() / (BS * CL);
+
+    AT_DISPATCH_FLOATING_TYPES(pcds_feat.scalar_type(), "PointNetUpdateOutputKernel", [&] {
+        for(int64_t bs=0; bs < BS; bs++){
+            at::Tensor pcds_feat_bs = pcds_feat.select(0, bs).view({pcds_feat.size(1), N});
+            int64_t *voxel_idx_data = voxel_idx.DATA_PTR<int64_t>() + bs * N;
+            scalar_t *voxel_out_data = voxel_out.DATA_PTR<scalar_t>() + bs * CL * P;
+
+            for(int64_t n_begin=0; n_begin < N; n_begin += POINT_CHUNK){
+                int64_t count = std::min<int64_t>(POINT_CHUNK, N - n_begin);
+                at::Tensor point_feat = pcds_feat_bs.narrow(1, n_begin, count);
+                for(size_t l=0; l < weights.size(); l++){
+                    point_feat = at::addmm(biases[l].unsqueeze(1), weights[l], point_feat).clamp_min_(0);  // (C_{l+1}, count)
+                }
+                scalar_t *point_feat_data = point_feat.DATA_PTR<scalar_t>();
+
+                at::parallel_for(0, CL, PLANE_GRAIN, [&](int64_t c_begin, int64_t c_end) {
+                    pointnet::PointNetUpdateOutputKernel<scalar_t>(point_feat_data, voxel_idx_data + n_begin, voxel_out_data,
+                    P, count, c_begin, c_end);
+                });
+            }
+        }
     });
 }
 
@@ -357,4 +730,13 @@ PYBIND11_MODULE(TORCH_EXTENSION_NAME, m) {
   m.def("voxel_maxpooling_cpu_backward", &voxel_maxpooling_cpu_backward, "maxpooling backward (CPU)");
   m.def("voxel_minpooling_cpu_forward", &voxel_minpooling_cpu_forward, "minpooling forward (CPU)");
   m.def("voxel_minpooling_cpu_backward", &voxel_minpooling_cpu_backward, "minpooling backward (CPU)");
+  m.def("voxel_maxpooling_cpu_forward_point_major", &voxel_maxpooling_cpu_forward_point_major, "maxpooling forward, point-major (CPU)");
+  m.def("voxel_maxpooling_cpu_backward_point_major", &voxel_maxpooling_cpu_backward_point_major, "maxpooling backward, point-major (CPU)");
+  m.def("voxel_minpooling_cpu_forward_point_major", &voxel_minpooling_cpu_forward_point_major, "minpooling forward, point-major (CPU)");
+  m.def("voxel_minpooling_cpu_backward_point_major", &voxel_minpooling_cpu_backward_point_major, "minpooling backward, point-major (CPU)");
+  m.def("voxel_maxpooling_cpu_forward_with_idx", &voxel_maxpooling_cpu_forward_with_idx, "maxpooling forward, precomputed voxel index (CPU)");
+  m.def("voxel_minpooling_cpu_forward_with_idx", &voxel_minpooling_cpu_forward_with_idx, "minpooling forward, precomputed voxel index (CPU)");
+  m.def("voxel_unpool_cpu_forward", &voxel_unpool_cpu_forward, "unpool forward (CPU)");
+  m.def("voxel_unpool_cpu_backward", &voxel_unpool_cpu_backward, "unpool backward (CPU)");
+  m.def("pointnet_maxpooling_cpu_forward", &pointnet_maxpooling_cpu_forward, "fused pointnet + maxpooling forward (CPU)");
 }
\ No newline at end of file
@@ -13,41 +13,67 @@
 #define CHECK_INPUT(x) CHECK_CUDA(x); CHECK_CONTIGUOUS(x)
 
 
-void voxel_maxpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
+void voxel_maxpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
 at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate);
-void voxel_maxpooling_cuda_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
+void voxel_maxpooling_cuda_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size);
+void voxel_maxpooling_cuda_backward(at::Tensor pcds_ind, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
 at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate);
 
-void voxel_minpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
+void voxel_minpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
 at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate);
-void voxel_minpooling_cuda_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
+void voxel_minpooling_cuda_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size);
+void voxel_minpooling_cuda_backward(at::Tensor pcds_ind, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
 at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate);
 
+void voxel_unpool_cuda_forward(at::Tensor grid_feat, at::Tensor index, at::Tensor weight, at::Tensor pcds_feat);
+void voxel_unpool_cuda_backward(at::Tensor index, at::Tensor weight, at::Tensor grad_pcds_feat, at::Tensor grad_grid_feat);
 
-void voxel_maxpooling_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
+void pointnet_maxpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor voxel_idx, std::vector<at::Tensor> weights, std::vector<at::Tensor> biases,
+at::Tensor voxel_out);
+
+
+void voxel_maxpooling_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
 at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
 {
     CHECK_INPUT(pcds_feat);
     CHECK_INPUT(pcds_ind);
     CHECK_INPUT(voxel_out);
     CHECK_INPUT(voxel_max_idx);
+    CHECK_INPUT(voxel_max_arg);
 
     CHECK_INPUT(voxel_out_size);
     CHECK_INPUT(voxel_out_stride);
     CHECK_INPUT(output_size);
     CHECK_INPUT(scale_rate);
 
-    voxel_maxpooling_cuda_forward(pcds_feat, pcds_ind, voxel_out, voxel_max_idx,
+    voxel_maxpooling_cuda_forward(pcds_feat, pcds_ind, voxel_out, voxel_max_idx, voxel_max_arg,
     voxel_out_size, voxel_out_stride, output_size, scale_rate);
 }
 
-void voxel_maxpooling_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
-at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+void voxel_maxpooling_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size)
 {
     CHECK_INPUT(pcds_feat);
-    CHECK_INPUT(pcds_ind);
     CHECK_INPUT(voxel_out);
     CHECK_INPUT(voxel_max_idx);
+    CHECK_INPUT(voxel_max_arg);
+
+    CHECK_INPUT(voxel_out_size);
+    CHECK_INPUT(voxel_out_stride);
+    CHECK_INPUT(output_size);
+
+    voxel_maxpooling_cuda_forward_with_idx(pcds_feat, voxel_out, voxel_max_idx, voxel_max_arg,
+    voxel_out_size, voxel_out_stride, output_size);
+}
+
+void voxel_maxpooling_backward(at::Tensor pcds_ind, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    CHECK_INPUT(pcds_ind);
+    CHECK_INPUT(voxel_max_idx);
+    CHECK_INPUT(voxel_max_arg);
 
     CHECK_INPUT(grad_pcds_feat);
     CHECK_INPUT(grad_voxel_out);
@@ -56,34 +82,50 @@ at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size,
     CHECK_INPUT(output_size);
     CHECK_INPUT(scale_rate);
 
-    voxel_maxpooling_cuda_backward(pcds_feat, pcds_ind, voxel_out, voxel_max_idx,
+    voxel_maxpooling_cuda_backward(pcds_ind, voxel_max_idx, voxel_max_arg,
     grad_pcds_feat, grad_voxel_out, voxel_out_size, voxel_out_stride, output_size, scale_rate);
 }
 
-void voxel_minpooling_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
+void voxel_minpooling_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
 at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
 {
     CHECK_INPUT(pcds_feat);
     CHECK_INPUT(pcds_ind);
     CHECK_INPUT(voxel_out);
     CHECK_INPUT(voxel_min_idx);
+    CHECK_INPUT(voxel_min_arg);
 
     CHECK_INPUT(voxel_out_size);
     CHECK_INPUT(voxel_out_stride);
     CHECK_INPUT(output_size);
     CHECK_INPUT(scale_rate);
 
-    voxel_minpooling_cuda_forward(pcds_feat, pcds_ind, voxel_out, voxel_min_idx,
+    voxel_minpooling_cuda_forward(pcds_feat, pcds_ind, voxel_out, voxel_min_idx, voxel_min_arg,
     voxel_out_size, voxel_out_stride, output_size, scale_rate);
 }
 
-void voxel_minpooling_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
-at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+void voxel_minpooling_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size)
 {
     CHECK_INPUT(pcds_feat);
-    CHECK_INPUT(pcds_ind);
     CHECK_INPUT(voxel_out);
     CHECK_INPUT(voxel_min_idx);
+    CHECK_INPUT(voxel_min_arg);
+
+    CHECK_INPUT(voxel_out_size);
+    CHECK_INPUT(voxel_out_stride);
+    CHECK_INPUT(output_size);
+
+    voxel_minpooling_cuda_forward_with_idx(pcds_feat, voxel_out, voxel_min_idx, voxel_min_arg,
+    voxel_out_size, voxel_out_stride, output_size);
+}
+
+void voxel_minpooling_backward(at::Tensor pcds_ind, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    CHECK_INPUT(pcds_ind);
+    CHECK_INPUT(voxel_min_idx);
+    CHECK_INPUT(voxel_min_arg);
 
     CHECK_INPUT(grad_pcds_feat);
     CHECK_INPUT(grad_voxel_out);
@@ -92,14 +134,53 @@ at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size,
     CHECK_INPUT(output_size);
     CHECK_INPUT(scale_rate);
 
-    voxel_minpooling_cuda_backward(pcds_feat, pcds_ind, voxel_out, voxel_min_idx,
+    voxel_minpooling_cuda_backward(pcds_ind, voxel_min_idx, voxel_min_arg,
     grad_pcds_feat, grad_voxel_out, voxel_out_size, voxel_out_stride, output_size, scale_rate);
 }
 
+void voxel_unpool_forward(at::Tensor grid_feat, at::Tensor index, at::Tensor weight, at::Tensor pcds_feat)
+{
+    CHECK_INPUT(grid_feat);
+    CHECK_INPUT(index);
+    CHECK_INPUT(weight);
+    CHECK_INPUT(pcds_feat);
+
+    voxel_unpool_cuda_forward(grid_feat, index, weight, pcds_feat);
+}
+
+void voxel_unpool_backward(at::Tensor index, at::Tensor weight, at::Tensor grad_pcds_feat, at::Tensor grad_grid_feat)
+{
+    CHECK_INPUT(index);
+    CHECK_INPUT(weight);
+    CHECK_INPUT(grad_pcds_feat);
+    CHECK_INPUT(grad_grid_feat);
+
+    voxel_unpool_cuda_backward(index, weight, grad_pcds_feat, grad_grid_feat);
+}
+
+void pointnet_maxpooling_forward(at::Tensor pcds_feat, at::Tensor voxel_idx, std::vector<at::Tensor> weights, std::vector<at::Tensor> biases,
+at::Tensor voxel_out)
+{
+    CHECK_INPUT(pcds_feat);
+    CHECK_INPUT(voxel_idx);
+    CHECK_INPUT(voxel_out);
+    for(size_t l=0; l < weights.size(); l++){
+        CHECK_INPUT(weights[l]);
+        CHECK_INPUT(biases[l]);
+    }
+
+    pointnet_maxpooling_cuda_forward(pcds_feat, voxel_idx, weights, biases, voxel_out);
+}
+
 
 PYBIND11_MODULE(TORCH_EXTENSION_NAME, m){
   m.def("voxel_maxpooling_forward", &voxel_maxpooling_forward, "maxpooling forward (CUDA)");
   m.def("voxel_maxpooling_backward", &voxel_maxpooling_backward, "maxpooling backward (CUDA)");
   m.def("voxel_minpooling_forward", &voxel_minpooling_forward, "minpooling forward (CUDA)");
   m.def("voxel_minpooling_backward", &voxel_minpooling_backward, "minpooling backward (CUDA)");
+  m.def("voxel_maxpooling_forward_with_idx", &voxel_maxpooling_forward_with_idx, "maxpooling forward, precomputed voxel index (CUDA)");
+  m.def("voxel_minpooling_forward_with_idx", &voxel_minpooling_forward_with_idx, "minpooling forward, precomputed voxel index (CUDA)");
+  m.def("voxel_unpool_forward", &voxel_unpool_forward, "unpool forward (CUDA)");
+  m.def("voxel_unpool_backward", &voxel_unpool_backward, "unpool backward (CUDA)");
+  m.def("pointnet_maxpooling_forward", &pointnet_maxpooling_forward, "fused pointnet + maxpooling forward (CUDA)");
 }
\ No newline at end of file
@@ -19,9 +19,9 @@ namespace maxpool{
     // pcds_feat, (BS, C, N, 1)
     // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
     // voxel_out, (BS, C, D1, D2, ..., Dn)
-    // voxel_max_idx, (BS, N)
-    template<typename real>
-    __global__ void VoxelMaxPoolUpdateOutputComputeIdx(real* pcds_ind_data, int64_t* voxel_max_idx_data,
+    // voxel_max_idx, (BS, N): (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1
+    template<typename index_t>
+    __global__ void VoxelMaxPoolUpdateOutputComputeIdx(index_t* pcds_ind_data, int64_t* voxel_max_idx_data,
                                                     int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
                                                     int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
@@ -33,7 +33,7 @@ namespace maxpool{
             n = i - bs * N;
 
             index_ind = i * D;
-            index_voxel = bs * voxel_out_stride[0]; // bs and c=0
+            index_voxel = 0; // (bs, c) plane 안의 offset (deep_point.VoxelPlan 과 동일)
 
             int flag = 1;
             for(int64_t d=0; d < D; d++){
@@ -70,7 +70,7 @@ namespace maxpool{
             index_pcds = i;
             index_voxel0 = voxel_max_idx_data[bs * N + n];
             if(index_voxel0 >= 0){
-                voxel_out_data[index_voxel0 + c * voxel_out_stride[1]] = pcds_feat_data[index_pcds];
+                voxel_out_data[index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1]] = pcds_feat_data[index_pcds];
             }
         }
     }
@@ -93,20 +93,46 @@ namespace maxpool{
             index_pcds = i;
             index_voxel0 = voxel_max_idx_data[bs * N + n];
             if(index_voxel0 >= 0){
-                atomMax(&voxel_out_data[index_voxel0 + c * voxel_out_stride[1]], pcds_feat_data[index_pcds]);
+                atomMax(&voxel_out_data[index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1]], pcds_feat_data[index_pcds]);
+            }
+        }
+    }
+
+    // voxel_max_arg, (BS, C, D1, D2, ..., Dn), int32: voxel 값과 같은 포인트 중 가장 작은 n (빈 voxel 은 -1)
+    // -1 은 unsigned 로 보면 0xFFFFFFFF 이므로 unsigned atomicMin 으로 바로 갱신된다.
+    template<typename real>
+    __global__ void VoxelMaxPoolUpdateOutputArgKernel(real* pcds_feat_data, real* voxel_out_data, int64_t* voxel_max_idx_data, int32_t* voxel_max_arg_data,
+                                                int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
+                                                int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size)
+    {
+        for(int64_t i = blockIdx.x * blockDim.x + threadIdx.x; i < loop; i = i + blockDim.x * gridDim.x){
+            int64_t bs, c, n;
+            int64_t index_pcds, index_voxel0;
+            int64_t index_res;
+
+            bs = i / (C * N);
+            index_res = i - bs * C * N;
+            c = index_res / N;
+            n = index_res - c * N;
+
+            index_pcds = i;
+            index_voxel0 = voxel_max_idx_data[bs * N + n];
+            if(index_voxel0 >= 0){
+                int64_t index_voxel = index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+                if(voxel_out_data[index_voxel] == pcds_feat_data[index_pcds]){
+                    atomicMin(reinterpret_cast<unsigned int*>(&voxel_max_arg_data[index_voxel]), static_cast<unsigned int>(n));
+                }
             }
         }
     }
 
     // backward
-    // pcds_feat, (BS, C, N, 1)
-    // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
-    // voxel_out, (BS, C, D1, D2, ..., Dn)
     // voxel_max_idx, (BS, N)
+    // voxel_max_arg, (BS, C, D1, D2, ..., Dn)
     // grad_pcds_feat, (BS, C, N, 1)
     // grad_voxel_out, (BS, C, D1, D2, ..., Dn)
     template<typename real>
-    __global__ void VoxelMaxPoolUpdateBackwardKernel(real* pcds_feat_data, real* voxel_out_data, real* grad_pcds_feat_data, real* grad_voxel_out_data, int64_t* voxel_max_idx_data,
+    __global__ void VoxelMaxPoolUpdateBackwardKernel(real* grad_pcds_feat_data, real* grad_voxel_out_data, int64_t* voxel_max_idx_data, int32_t* voxel_max_arg_data,
                                                     int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
                                                     int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size)
     {
@@ -123,8 +149,8 @@ namespace maxpool{
             index_pcds = i;
             index_voxel0 = voxel_max_idx_data[bs * N + n];
             if(index_voxel0 >= 0){
-                int64_t index_voxel = index_voxel0 + c * voxel_out_stride[1];
-                if(voxel_out_data[index_voxel] == pcds_feat_data[index_pcds]){
+                int64_t index_voxel = index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+                if(voxel_max_arg_data[index_voxel] == n){
                     grad_pcds_feat_data[index_pcds] = grad_voxel_out_data[index_voxel];
                 }
             }
@@ -138,9 +164,9 @@ namespace minpool{
     // pcds_feat, (BS, C, N, 1)
     // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
     // voxel_out, (BS, C, D1, D2, ..., Dn)
-    // voxel_min_idx, (BS, N)
-    template<typename real>
-    __global__ void VoxelMinPoolUpdateOutputComputeIdx(real* pcds_ind_data, int64_t* voxel_min_idx_data,
+    // voxel_min_idx, (BS, N): (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1
+    template<typename index_t>
+    __global__ void VoxelMinPoolUpdateOutputComputeIdx(index_t* pcds_ind_data, int64_t* voxel_min_idx_data,
                                                     int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
                                                     int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size, float* scale_rate)
     {
@@ -152,7 +178,7 @@ namespace minpool{
             n = i - bs * N;
 
             index_ind = i * D;
-            index_voxel = bs * voxel_out_stride[0]; // bs and c=0
+            index_voxel = 0; // (bs, c) plane 안의 offset (deep_point.VoxelPlan 과 동일)
 
             int flag = 1;
             for(int64_t d=0; d < D; d++){
@@ -189,7 +215,7 @@ namespace minpool{
             index_pcds = i;
             index_voxel0 = voxel_min_idx_data[bs * N + n];
             if(index_voxel0 >= 0){
-                voxel_out_data[index_voxel0 + c * voxel_out_stride[1]] = pcds_feat_data[index_pcds];
+                voxel_out_data[index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1]] = pcds_feat_data[index_pcds];
             }
         }
     }
@@ -212,20 +238,46 @@ namespace minpool{
             index_pcds = i;
             index_voxel0 = voxel_min_idx_data[bs * N + n];
             if(index_voxel0 >= 0){
-                atomMin(&voxel_out_data[index_voxel0 + c * voxel_out_stride[1]], pcds_feat_data[index_pcds]);  // 최소값 찾기
+                atomMin(&voxel_out_data[index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1]], pcds_feat_data[index_pcds]);  // 최소값 찾기
+            }
+        }
+    }
+
+    // voxel_min_arg, (BS, C, D1, D2, ..., Dn), int32: voxel 값과 같은 포인트 중 가장 작은 n (빈 voxel 은 -1)
+    // -1 은 unsigned 로 보면 0xFFFFFFFF 이므로 unsigned atomicMin 으로 바로 갱신된다.
+    template<typename real>
+    __global__ void VoxelMinPoolUpdateOutputArgKernel(real* pcds_feat_data, real* voxel_out_data, int64_t* voxel_min_idx_data, int32_t* voxel_min_arg_data,
+                                                int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
+                                                int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size)
+    {
+        for(int64_t i = blockIdx.x * blockDim.x + threadIdx.x; i < loop; i = i + blockDim.x * gridDim.x){
+            int64_t bs, c, n;
+            int64_t index_pcds, index_voxel0;
+            int64_t index_res;
+
+            bs = i / (C * N);
+            index_res = i - bs * C * N;
+            c = index_res / N;
+            n = index_res - c * N;
+
+            index_pcds = i;
+            index_voxel0 = voxel_min_idx_data[bs * N + n];
+            if(index_voxel0 >= 0){
+                int64_t index_voxel = index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+                if(voxel_out_data[index_voxel] == pcds_feat_data[index_pcds]){
+                    atomicMin(reinterpret_cast<unsigned int*>(&voxel_min_arg_data[index_voxel]), static_cast<unsigned int>(n));
+                }
             }
         }
     }
 
     // backward
-    // pcds_feat, (BS, C, N, 1)
-    // pcds_ind,(BS, N, D, 1), D -> d1, d2, ..., dn
-    // voxel_out, (BS, C, D1, D2, ..., Dn)
     // voxel_min_idx, (BS, N)
+    // voxel_min_arg, (BS, C, D1, D2, ..., Dn)
     // grad_pcds_feat, (BS, C, N, 1)
     // grad_voxel_out, (BS, C, D1, D2, ..., Dn)
     template<typename real>
-    __global__ void VoxelMinPoolUpdateBackwardKernel(real* pcds_feat_data, real* voxel_out_data, real* grad_pcds_feat_data, real* grad_voxel_out_data, int64_t* voxel_min_idx_data,
+    __global__ void VoxelMinPoolUpdateBackwardKernel(real* grad_pcds_feat_data, real* grad_voxel_out_data, int64_t* voxel_min_idx_data, int32_t* voxel_min_arg_data,
                                                     int64_t BS, int64_t C, int64_t N, int64_t D, int64_t loop,
                                                     int64_t* voxel_out_size, int64_t* voxel_out_stride, int64_t* output_size)
     {
@@ -242,8 +294,8 @@ namespace minpool{
             index_pcds = i;
             index_voxel0 = voxel_min_idx_data[bs * N + n];
             if(index_voxel0 >= 0){
-                int64_t index_voxel = index_voxel0 + c * voxel_out_stride[1];
-                if(voxel_out_data[index_voxel] == pcds_feat_data[index_pcds]){  // 현재 포인트가 해당 복셀의 최소값을 기여한 경우
+                int64_t index_voxel = index_voxel0 + bs * voxel_out_stride[0] + c * voxel_out_stride[1];
+                if(voxel_min_arg_data[index_voxel] == n){  // 현재 포인트가 해당 복셀의 최소값으로 선택된 경우
                     grad_pcds_feat_data[index_pcds] = grad_voxel_out_data[index_voxel];
                 }
             }
@@ -251,37 +303,136 @@ namespace minpool{
     }
 }
 
-void voxel_maxpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
-at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+// pointnet + maxpool
+namespace pointnet{
+    // 1x1 conv (BN fold) + ReLU 를 포인트마다 계산하여 바로 voxel 로 max-reduce (deep_point.PointNetVoxelMaxPool, inference 전용)
+    // 포인트 하나를 스레드 하나가 맡아 layer 출력은 레지스터 (MAX_POINTNET_CHANNELS) 에만 둠
+    // pcds_feat, (BS, C0, N), voxel_idx, (BS, N) ─ 범위 밖이면 -1
+    // params, layer 별 [weight (C_{l+1}, C_l), bias (C_{l+1},)] 를 이어 붙인 1차원 텐서, channels, (L + 1,)
+    // voxel_out, (BS, CL, P) ─ 0 으로 초기화, ReLU 출력은 0 이상이므로 atomMax 만 하면 빈 voxel 은 0
+    #define MAX_POINTNET_CHANNELS 64
+    template<typename real>
+    __global__ void PointNetUpdateOutputKernel(real* pcds_feat_data, int64_t* voxel_idx_data, real* params_data, int64_t* channels, real* voxel_out_data,
+                                            int64_t BS, int64_t N, int64_t L, int64_t P, int64_t loop)
+    {
+        real x[MAX_POINTNET_CHANNELS], y[MAX_POINTNET_CHANNELS];
+        for(int64_t i = blockIdx.x * blockDim.x + threadIdx.x; i < loop; i = i + blockDim.x * gridDim.x){
+            int64_t bs = i / N;
+            int64_t n = i % N;
+            int64_t index_voxel = voxel_idx_data[i];
+            if(index_voxel < 0){
+                continue;
+            }
+
+            for(int64_t c=0; c < channels[0]; c++){
+                x[c] = pcds_feat_data[(bs * channels[0] + c) * N + n];
+            }
+            real* w = params_data;
+            for(int64_t l=0; l < L; l++){
+                int64_t cin = channels[l];
+                int64_t cout = channels[l + 1];
+                real* b = w + cout * cin;
+                for(int64_t o=0; o < cout; o++){
+                    real acc = b[o];
+                    for(int64_t c=0; c < cin; c++){
+                        acc += w[o * cin + c] * x[c];
+                    }
+                    y[o] = acc > 0 ? acc : 0;
+                }
+                for(int64_t o=0; o < cout; o++){
+                    x[o] = y[o];
+                }
+                w = b + cout;
+            }
+
+            int64_t CL = channels[L];
+            for(int64_t c=0; c < CL; c++){
+                if(x[c] > 0){
+                    atomMax(&voxel_out_data[(bs * CL + c) * P + index_voxel], x[c]);
+                }
+            }
+        }
+    }
+}
+
+// unpool
+namespace unpool{
+    // grid feature 를 포인트로 gather (deep_point.VoxelUnpool)
+    // grid_feat, (BS, C, D1 * ... * Dn)
+    // index, weight, (BS, K, N): 포인트 n 의 feature = sum_k weight[k] * grid_feat[index[k]] (범위 밖 corner 는 weight 0)
+    // pcds_feat, (BS, C, N)
+    template<typename real>
+    __global__ void VoxelUnpoolUpdateOutputKernel(real* grid_feat_data, int64_t* index_data, real* weight_data, real* pcds_feat_data,
+                                                int64_t BS, int64_t C, int64_t N, int64_t K, int64_t P, int64_t loop)
+    {
+        for(int64_t i = blockIdx.x * blockDim.x + threadIdx.x; i < loop; i = i + blockDim.x * gridDim.x){
+            int64_t bs = i / (C * N);
+            int64_t n = i % N;
+
+            real* grid = grid_feat_data + (i / N) * P;
+            int64_t* idx = index_data + bs * K * N + n;
+            real* w = weight_data + bs * K * N + n;
+
+            real acc = 0;
+            for(int64_t k=0; k < K; k++){
+                acc += w[k * N] * grid[idx[k * N]];
+            }
+            pcds_feat_data[i] = acc;
+        }
+    }
+
+    template<typename real>
+    __global__ void VoxelUnpoolUpdateBackwardKernel(int64_t* index_data, real* weight_data, real* grad_pcds_feat_data, real* grad_grid_feat_data,
+                                                int64_t BS, int64_t C, int64_t N, int64_t K, int64_t P, int64_t loop)
+    {
+        for(int64_t i = blockIdx.x * blockDim.x + threadIdx.x; i < loop; i = i + blockDim.x * gridDim.x){
+            int64_t bs = i / (C * N);
+            int64_t n = i % N;
+
+            real* grad_grid = grad_grid_feat_data + (i / N) * P;
+            int64_t* idx = index_data + bs * K * N + n;
+            real* w = weight_data + bs * K * N + n;
+
+            for(int64_t k=0; k < K; k++){
+                atomAdd(&grad_grid[idx[k * N]], w[k * N] * grad_pcds_feat_data[i]);
+            }
+        }
+    }
+}
+
+
+// voxel_max_idx 가 이미 계산된 경우 (forward 의 ComputeIdx 이후 또는 deep_point.VoxelPlan)
+void voxel_maxpooling_cuda_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size)
 {
     cudaSetDevice(pcds_feat.get_device());
     int64_t BS = pcds_feat.size(0);
     int64_t C = pcds_feat.size(1);
     int64_t N = pcds_feat.size(2);
-    int64_t D = pcds_ind.size(2);
+    int64_t D = output_size.size(0);
 
-    int64_t loop1 = BS * N;
-    int64_t loop2 = BS * C * N;
+    int64_t loop = BS * C * N;
 
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMaxPoolUpdateOutputComputeIdx", [&] {
+    // 정수 feature (ex. label) 도 pooling 가능
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_feat.scalar_type(), "VoxelMaxPoolUpdateOutputInit", [&] {
         scalar_t *pcds_feat_data = DATA_PTR<scalar_t>(pcds_feat);
-        scalar_t *pcds_ind_data = DATA_PTR<scalar_t>(pcds_ind);
         scalar_t *voxel_out_data = DATA_PTR<scalar_t>(voxel_out);
         int64_t *voxel_max_idx_data = DATA_PTR<int64_t>(voxel_max_idx);
+        int32_t *voxel_max_arg_data = DATA_PTR<int32_t>(voxel_max_arg);
 
-        maxpool::VoxelMaxPoolUpdateOutputComputeIdx<scalar_t><<<BLOCKS(loop1), THREADS>>>(pcds_ind_data, voxel_max_idx_data, BS, C, N, D, loop1,
-        DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size), DATA_PTR<float>(scale_rate));
-
-        maxpool::VoxelMaxPoolUpdateOutputInit<scalar_t><<<BLOCKS(loop2), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_max_idx_data, BS, C, N, D, loop2,
+        maxpool::VoxelMaxPoolUpdateOutputInit<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_max_idx_data, BS, C, N, D, loop,
         DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
 
-        maxpool::VoxelMaxPoolUpdateOutputKernel<scalar_t><<<BLOCKS(loop2), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_max_idx_data, BS, C, N, D, loop2,
+        maxpool::VoxelMaxPoolUpdateOutputKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_max_idx_data, BS, C, N, D, loop,
         DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
+
+        maxpool::VoxelMaxPoolUpdateOutputArgKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_max_idx_data, voxel_max_arg_data,
+        BS, C, N, D, loop, DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
     });
 }
 
-void voxel_maxpooling_cuda_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx,
-at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+void voxel_maxpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
 {
     cudaSetDevice(pcds_feat.get_device());
     int64_t BS = pcds_feat.size(0);
@@ -289,52 +440,74 @@ at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size,
     int64_t N = pcds_feat.size(2);
     int64_t D = pcds_ind.size(2);
 
-    int64_t loop = BS * C * N;
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMaxPoolUpdateBackwardKernel", [&] {
-        scalar_t *pcds_feat_data = DATA_PTR<scalar_t>(pcds_feat);
+    int64_t loop = BS * N;
+
+    // pcds_ind 는 pcds_feat 와 독립적인 dtype (float 좌표 또는 int16 / int32 / int64 voxel index)
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_ind.scalar_type(), "VoxelMaxPoolUpdateOutputComputeIdx", [&] {
         scalar_t *pcds_ind_data = DATA_PTR<scalar_t>(pcds_ind);
-        scalar_t *voxel_out_data = DATA_PTR<scalar_t>(voxel_out);
+        int64_t *voxel_max_idx_data = DATA_PTR<int64_t>(voxel_max_idx);
+
+        maxpool::VoxelMaxPoolUpdateOutputComputeIdx<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_ind_data, voxel_max_idx_data, BS, C, N, D, loop,
+        DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size), DATA_PTR<float>(scale_rate));
+    });
+
+    voxel_maxpooling_cuda_forward_with_idx(pcds_feat, voxel_out, voxel_max_idx, voxel_max_arg, voxel_out_size, voxel_out_stride, output_size);
+}
+
+void voxel_maxpooling_cuda_backward(at::Tensor pcds_ind, at::Tensor voxel_max_idx, at::Tensor voxel_max_arg,
+at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    cudaSetDevice(grad_pcds_feat.get_device());
+    int64_t BS = grad_pcds_feat.size(0);
+    int64_t C = grad_pcds_feat.size(1);
+    int64_t N = grad_pcds_feat.size(2);
+    int64_t D = pcds_ind.size(2);
+
+    int64_t loop = BS * C * N;
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_pcds_feat.scalar_type(), "VoxelMaxPoolUpdateBackwardKernel", [&] {
         int64_t* voxel_max_idx_data = DATA_PTR<int64_t>(voxel_max_idx);
+        int32_t* voxel_max_arg_data = DATA_PTR<int32_t>(voxel_max_arg);
 
         scalar_t *grad_pcds_feat_data = DATA_PTR<scalar_t>(grad_pcds_feat);
         scalar_t *grad_voxel_out_data = DATA_PTR<scalar_t>(grad_voxel_out);
 
-        maxpool::VoxelMaxPoolUpdateBackwardKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, grad_pcds_feat_data, grad_voxel_out_data, voxel_max_idx_data,
+        maxpool::VoxelMaxPoolUpdateBackwardKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(grad_pcds_feat_data, grad_voxel_out_data, voxel_max_idx_data, voxel_max_arg_data,
         BS, C, N, D, loop, DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
     });
 }
 
-void voxel_minpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
-at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+// voxel_min_idx 가 이미 계산된 경우 (forward 의 ComputeIdx 이후 또는 deep_point.VoxelPlan)
+void voxel_minpooling_cuda_forward_with_idx(at::Tensor pcds_feat, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size)
 {
     cudaSetDevice(pcds_feat.get_device());
     int64_t BS = pcds_feat.size(0);
     int64_t C = pcds_feat.size(1);
     int64_t N = pcds_feat.size(2);
-    int64_t D = pcds_ind.size(2);
+    int64_t D = output_size.size(0);
 
-    int64_t loop1 = BS * N;
-    int64_t loop2 = BS * C * N;
+    int64_t loop = BS * C * N;
 
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMinPoolUpdateOutputComputeIdx", [&] {
+    // 정수 feature (ex. label) 도 pooling 가능
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_feat.scalar_type(), "VoxelMinPoolUpdateOutputInit", [&] {
         scalar_t *pcds_feat_data = DATA_PTR<scalar_t>(pcds_feat);
-        scalar_t *pcds_ind_data = DATA_PTR<scalar_t>(pcds_ind);
         scalar_t *voxel_out_data = DATA_PTR<scalar_t>(voxel_out);
         int64_t *voxel_min_idx_data = DATA_PTR<int64_t>(voxel_min_idx);
+        int32_t *voxel_min_arg_data = DATA_PTR<int32_t>(voxel_min_arg);
 
-        minpool::VoxelMinPoolUpdateOutputComputeIdx<scalar_t><<<BLOCKS(loop1), THREADS>>>(pcds_ind_data, voxel_min_idx_data, BS, C, N, D, loop1,
-        DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size), DATA_PTR<float>(scale_rate));
-
-        minpool::VoxelMinPoolUpdateOutputInit<scalar_t><<<BLOCKS(loop2), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_min_idx_data, BS, C, N, D, loop2,
+        minpool::VoxelMinPoolUpdateOutputInit<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_min_idx_data, BS, C, N, D, loop,
         DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
 
-        minpool::VoxelMinPoolUpdateOutputKernel<scalar_t><<<BLOCKS(loop2), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_min_idx_data, BS, C, N, D, loop2,
+        minpool::VoxelMinPoolUpdateOutputKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_min_idx_data, BS, C, N, D, loop,
         DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
+
+        minpool::VoxelMinPoolUpdateOutputArgKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, voxel_min_idx_data, voxel_min_arg_data,
+        BS, C, N, D, loop, DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
     });
 }
 
-void voxel_minpooling_cuda_backward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx,
-at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+void voxel_minpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor pcds_ind, at::Tensor voxel_out, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
 {
     cudaSetDevice(pcds_feat.get_device());
     int64_t BS = pcds_feat.size(0);
@@ -342,17 +515,111 @@ at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size,
     int64_t N = pcds_feat.size(2);
     int64_t D = pcds_ind.size(2);
 
-    int64_t loop = BS * C * N;
-    AT_DISPATCH_FLOATING_TYPES_AND_HALF(pcds_feat.scalar_type(), "VoxelMinPoolUpdateBackwardKernel", [&] {
-        scalar_t *pcds_feat_data = DATA_PTR<scalar_t>(pcds_feat);
+    int64_t loop = BS * N;
+
+    // pcds_ind 는 pcds_feat 와 독립적인 dtype (float 좌표 또는 int16 / int32 / int64 voxel index)
+    AT_DISPATCH_ALL_TYPES_AND(at::ScalarType::Half, pcds_ind.scalar_type(), "VoxelMinPoolUpdateOutputComputeIdx", [&] {
         scalar_t *pcds_ind_data = DATA_PTR<scalar_t>(pcds_ind);
-        scalar_t *voxel_out_data = DATA_PTR<scalar_t>(voxel_out);
+        int64_t *voxel_min_idx_data = DATA_PTR<int64_t>(voxel_min_idx);
+
+        minpool::VoxelMinPoolUpdateOutputComputeIdx<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_ind_data, voxel_min_idx_data, BS, C, N, D, loop,
+        DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size), DATA_PTR<float>(scale_rate));
+    });
+
+    voxel_minpooling_cuda_forward_with_idx(pcds_feat, voxel_out, voxel_min_idx, voxel_min_arg, voxel_out_size, voxel_out_stride, output_size);
+}
+
+void voxel_minpooling_cuda_backward(at::Tensor pcds_ind, at::Tensor voxel_min_idx, at::Tensor voxel_min_arg,
+at::Tensor grad_pcds_feat, at::Tensor grad_voxel_out, at::Tensor voxel_out_size, at::Tensor voxel_out_stride, at::Tensor output_size, at::Tensor scale_rate)
+{
+    cudaSetDevice(grad_pcds_feat.get_device());
+    int64_t BS = grad_pcds_feat.size(0);
+    int64_t C = grad_pcds_feat.size(1);
+    int64_t N = grad_pcds_feat.size(2);
+    int64_t D = pcds_ind.size(2);
+
+    int64_t loop = BS * C * N;
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_pcds_feat.scalar_type(), "VoxelMinPoolUpdateBackwardKernel", [&] {
         int64_t* voxel_min_idx_data = DATA_PTR<int64_t>(voxel_min_idx);
+        int32_t* voxel_min_arg_data = DATA_PTR<int32_t>(voxel_min_arg);
 
         scalar_t *grad_pcds_feat_data = DATA_PTR<scalar_t>(grad_pcds_feat);
         scalar_t *grad_voxel_out_data = DATA_PTR<scalar_t>(grad_voxel_out);
 
-        minpool::VoxelMinPoolUpdateBackwardKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_out_data, grad_pcds_feat_data, grad_voxel_out_data, voxel_min_idx_data,
+        minpool::VoxelMinPoolUpdateBackwardKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(grad_pcds_feat_data, grad_voxel_out_data, voxel_min_idx_data, voxel_min_arg_data,
         BS, C, N, D, loop, DATA_PTR<int64_t>(voxel_out_size), DATA_PTR<int64_t>(voxel_out_stride), DATA_PTR<int64_t>(output_size));
     });
+}
+
+void voxel_unpool_cuda_forward(at::Tensor grid_feat, at::Tensor index, at::Tensor weight, at::Tensor pcds_feat)
+{
+    cudaSetDevice(grid_feat.get_device());
+    int64_t BS = grid_feat.size(0);
+    int64_t C = grid_feat.size(1);
+    int64_t P = grid_feat.size(2);
+    int64_t K = index.size(1);
+    int64_t N = index.size(2);
+
+    int64_t loop = BS * C * N;
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grid_feat.scalar_type(), "VoxelUnpoolUpdateOutputKernel", [&] {
+        scalar_t *grid_feat_data = DATA_PTR<scalar_t>(grid_feat);
+        int64_t *index_data = DATA_PTR<int64_t>(index);
+        scalar_t *weight_data = DATA_PTR<scalar_t>(weight);
+        scalar_t *pcds_feat_data = DATA_PTR<scalar_t>(pcds_feat);
+
+        unpool::VoxelUnpoolUpdateOutputKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(grid_feat_data, index_data, weight_data, pcds_feat_data,
+        BS, C, N, K, P, loop);
+    });
+}
+
+void voxel_unpool_cuda_backward(at::Tensor index, at::Tensor weight, at::Tensor grad_pcds_feat, at::Tensor grad_grid_feat)
+{
+    cudaSetDevice(grad_grid_feat.get_device());
+    int64_t BS = grad_grid_feat.size(0);
+    int64_t C = grad_grid_feat.size(1);
+    int64_t P = grad_grid_feat.size(2);
+    int64_t K = index.size(1);
+    int64_t N = index.size(2);
+
+    int64_t loop = BS * C * N;
+    AT_DISPATCH_FLOATING_TYPES_AND_HALF(grad_grid_feat.scalar_type(), "VoxelUnpoolUpdateBackwardKernel", [&] {
+        int64_t *index_data = DATA_PTR<int64_t>(index);
+        scalar_t *weight_data = DATA_PTR<scalar_t>(weight);
+        scalar_t *grad_pcds_feat_data = DATA_PTR<scalar_t>(grad_pcds_feat);
+        scalar_t *grad_grid_feat_data = DATA_PTR<scalar_t>(grad_grid_feat);
+
+        unpool::VoxelUnpoolUpdateBackwardKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(index_data, weight_data, grad_pcds_feat_data, grad_grid_feat_data,
+        BS, C, N, K, P, loop);
+    });
+}
+
+void pointnet_maxpooling_cuda_forward(at::Tensor pcds_feat, at::Tensor voxel_idx, std::vector<at::Tensor> weights, std::vector<at::Tensor> biases,
+at::Tensor voxel_out)
+{
+    cudaSetDevice(pcds_feat.get_device());
+    int64_t BS = pcds_feat.size(0);
+    int64_t N = pcds_feat.size(2);
+    int64_t L = weights.size();
+    int64_t P = voxel_out.numel() / (BS * voxel_out.size(1));
+
+    std::vector<at::Tensor> params;
+    std::vector<int64_t> channels = {pcds_feat.size(1)};
+    for(int64_t l=0; l < L; l++){
+        params.push_back(weights[l].reshape(-1));
+        params.push_back(biases[l].reshape(-1));
+        channels.push_back(weights[l].size(0));
+    }
+    at::Tensor params_pt = at::cat(params);
+    at::Tensor channels_pt = at::tensor(channels, at::kLong).to(pcds_feat.device());
+
+    int64_t loop = BS * N;
+    AT_DISPATCH_FLOATING_TYPES(pcds_feat.scalar_type(), "PointNetUpdateOutputKernel", [&] {
+        scalar_t *pcds_feat_data = DATA_PTR<scalar_t>(pcds_feat);
+        int64_t *voxel_idx_data = DATA_PTR<int64_t>(voxel_idx);
+        scalar_t *params_data = DATA_PTR<scalar_t>(params_pt);
+        scalar_t *voxel_out_data = DATA_PTR<scalar_t>(voxel_out);
+
+        pointnet::PointNetUpdateOutputKernel<scalar_t><<<BLOCKS(loop), THREADS>>>(pcds_feat_data, voxel_idx_data, params_data, DATA_PTR<int64_t>(channels_pt), voxel_out_data,
+        BS, N, L, P, loop);
+    });
 }
\ No newline at end of file
@@ -0,0 +1,69 @@
+import torch
+
+# 컴파일된 커널 없이 torch.scatter_reduce 로 구현한 VoxelMaxPool / VoxelMinPool (torch >= 1.12)
+# 버퍼와 결과는 커널과 같다
+# voxel_idx, (BS, N) ─ (bs, c) plane 안에서의 voxel offset, 범위 밖이면 -1 (deep_point.VoxelPlanEntry.offset)
+# voxel_arg, (BS, C, D1, D2, ..., Dn), int32 ─ voxel 별로 선택된 포인트 n (빈 voxel 은 -1, 같은 값이면 가장 작은 n)
+available = hasattr(torch.Tensor, "scatter_reduce_")
+
+
+def _point_index(voxel_idx, C, plane_size):
+    """
+    범위 안의 포인트 M 개에 대해
+    return: n (M,), out_index (C, M) ─ voxel_out.view(-1) 의 index, feat_index (C, M) ─ pcds_feat.view(-1) 의 index
+    """
+    BS, N = voxel_idx.shape
+    point = torch.nonzero(voxel_idx.view(-1) >= 0).view(-1)  # bs * N + n
+    bs, n = point // N, point % N
+    c = torch.arange(C, device=voxel_idx.device).unsqueeze(1)
+    out_index = (bs * C * plane_size + voxel_idx.view(-1)[point]).unsqueeze(0) + c * plane_size
+    feat_index = (bs * C * N + n).unsqueeze(0) + c * N
+    return n, out_index, feat_index
+
+
+def voxel_pooling_forward(reduce, pcds_feat, voxel_out, voxel_idx, voxel_arg):
+    """
+    reduce: "amax" (VoxelMaxPool) 또는 "amin" (VoxelMinPool)
+    pcds_feat: (BS, C, N, 1), voxel_out: (BS, C, D1, ..., Dn) 0 으로 초기화, voxel_arg: -1 로 초기화 (None 이면 argmax 생략)
+    """
+    C, N = pcds_feat.size(1), pcds_feat.size(2)
+    n, out_index, feat_index = _point_index(voxel_idx, C, voxel_out[0, 0].numel())
+    feat = pcds_feat.view(-1)[feat_index]  # (C, M)
+
+    # 포인트가 없는 voxel 은 0 유지 (include_self=False)
+    voxel_out.view(-1).scatter_reduce_(0, out_index.view(-1), feat.view(-1), reduce=reduce, include_self=False)
+
+    if voxel_arg is None:  # gradient 가 필요 없으면 argmax 생략
+        return
+
+    # voxel 값과 같은 포인트 중 가장 작은 n
+    n = n.to(torch.int32).expand_as(out_index)
+    hit = voxel_out.view(-1)[out_index] == feat
+    arg = torch.where(hit, n, torch.full_like(n, N))
+    voxel_arg.view(-1).scatter_reduce_(0, out_index.view(-1), arg.reshape(-1), reduce="amin", include_self=False)
+
+
+def voxel_pooling_backward(voxel_idx, voxel_arg, grad_pcds_feat, grad_voxel_out):
+    """voxel 별로 선택된 포인트 (voxel_arg) 에만 gradient 를 전달, grad_pcds_feat: (BS, C, N, 1) 0 으로 초기화"""
+    n, out_index, feat_index = _point_index(voxel_idx, grad_pcds_feat.size(1), voxel_arg[0, 0].numel())
+    win = voxel_arg.view(-1)[out_index] == n.unsqueeze(0)
+    grad = grad_voxel_out.reshape(-1)[out_index]
+    grad_pcds_feat.view(-1)[feat_index] = torch.where(win, grad, torch.zeros_like(grad))
+
+
+def pointnet_maxpool_forward(pcds_feat, voxel_idx, layers, voxel_out, chunk=16384):
+    """
+    deep_point.PointNetVoxelMaxPool 의 torch 구현, 포인트를 chunk 개씩 나누어 1x1 conv + ReLU 후 voxel 로 max-reduce
+    pcds_feat: (BS, C0, N, 1), voxel_idx: (BS, N), layers: [(weight (C_{l+1}, C_l), bias (C_{l+1},)), ...]
+    voxel_out: (BS, CL, D1, ..., Dn) 0 으로 초기화 ─ ReLU 출력은 0 이상이므로 include_self 로 chunk 끼리 누적해도 빈 voxel 은 0
+    """
+    BS, N = voxel_idx.shape
+    out = voxel_out.view(BS, voxel_out.size(1), -1)
+    for start in range(0, N, chunk):
+        x = pcds_feat[:, :, start : start + chunk, 0]
+        for weight, bias in layers:
+            x = torch.matmul(weight, x).add_(bias.unsqueeze(-1)).relu_()  # (BS, C_{l+1}, chunk)
+        idx = voxel_idx[:, start : start + chunk]
+        valid = (idx >= 0).unsqueeze(1)
+        x = torch.where(valid, x, torch.zeros_like(x))  # 범위 밖 포인트는 0 을 voxel 0 에 (결과 변화 없음)
+        out.scatter_reduce_(2, idx.clamp(min=0).unsqueeze(1).expand_as(x), x, reduce="amax", include_self=True)
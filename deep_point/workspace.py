@@ -0,0 +1,65 @@
+import collections
+
+import torch
+
+
+class Workspace:
+    """
+    gradient 가 필요 없는 VoxelMaxPool / VoxelMinPool 호출에서 voxel index (BS, N), argmax (BS, C, D1, ..., Dn) 버퍼를
+    (이름, shape, dtype, device) 별로 한 번만 할당하여 재사용한다. (스트리밍 추론처럼 같은 shape 로 반복 호출할 때 할당 없음)
+    VoxelMaxPool(..., workspace=ws) 로 넘기거나 with ws: 안에서 호출하면 사용된다.
+    버퍼는 호출 안에서만 쓰이고 결과 / backward 에는 남지 않는다.
+    """
+
+    _stack = []
+
+    def __init__(self):
+        self._buffers = {}
+
+    def buffer(self, name, shape, dtype, device):
+        key = (name, tuple(shape), dtype, str(device))
+        if key not in self._buffers:
+            self._buffers[key] = torch.empty(shape, dtype=dtype, device=device)
+        return self._buffers[key]
+
+    def clear(self):
+        self._buffers.clear()
+
+    def __enter__(self):
+        Workspace._stack.append(self)
+        return self
+
+    def __exit__(self, *args):
+        Workspace._stack.pop()
+
+    @staticmethod
+    def current():
+        """with 로 활성화된 workspace (없으면 None)"""
+        return Workspace._stack[-1] if Workspace._stack else None
+
+
+# 커널에 넘기는 voxel_out size / stride, output_size, scale_rate 텐서 캐시 (호출마다 host → device 복사하지 않도록)
+# (voxel_out shape, scale_rate, device) 별, sparse / multi-scale pooling 처럼 shape 가 계속 바뀌는 경우를 위해 개수 제한
+METADATA_CACHE_SIZE = 64
+_metadata = collections.OrderedDict()
+
+
+def metadata(voxel_out_shape, scale_rate, device):
+    """return: voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt (contiguous voxel_out 기준)"""
+    key = (tuple(voxel_out_shape), tuple(float(r) for r in scale_rate), str(device))
+    if key in _metadata:
+        _metadata.move_to_end(key)
+        return _metadata[key]
+
+    stride = [1] * len(voxel_out_shape)
+    for d in range(len(voxel_out_shape) - 2, -1, -1):
+        stride[d] = stride[d + 1] * voxel_out_shape[d + 1]
+    voxel_out_size_pt = torch.LongTensor(list(voxel_out_shape)).to(device)
+    voxel_out_stride_pt = torch.LongTensor(stride).to(device)
+    output_size_pt = voxel_out_size_pt[2:]
+    scale_rate_pt = torch.FloatTensor(list(key[1])).to(device)
+
+    _metadata[key] = (voxel_out_size_pt, voxel_out_stride_pt, output_size_pt, scale_rate_pt)
+    if len(_metadata) > METADATA_CACHE_SIZE:
+        _metadata.popitem(last=False)
+    return _metadata[key]
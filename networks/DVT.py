@@ -4,12 +4,55 @@ import torch
 from torch import nn
 from torch_scatter import scatter
 
-from config.config_MOS import get_config
 
-general_config, dataset_param_config, model_param_config, optimize_param_config = get_config()
-range_theta = general_config.Voxel.range_theta
-sphere_voxel_r = general_config.Voxel.sphere_shape[2]
-range_phi = general_config.Voxel.range_phi
+def batched_scatter_max(src, index, H, W):
+    """
+    배치 전체를 scatter 한 번으로 max-reduce (배치 루프 없음)
+    src: (B, C, M), index: (B, M) ─ 출력 cell (0‥H*W-1), 범위 밖은 H*W (dummy cell, 결과에서 버림)
+    return: (B, C, H, W), 빈 cell 은 0
+    """
+    B, C, _ = src.shape
+    out = scatter(
+        src, index.long().unsqueeze(1), dim=2, dim_size=H * W + 1, reduce="max"
+    )  # (B, C, H * W + 1), 채널 방향 broadcast
+    return out[:, :, : H * W].reshape(B, C, H, W)
+
+
+def sparse_scatter_max(src, batch, index, B, H, W):
+    """
+    occupancy 가 있는 cell 만 모아 scatter 한 번으로 max-reduce
+    src: (M, C), batch, index: (M,) ─ 배치 b, 출력 cell (0‥H*W-1, 범위 밖은 H*W)
+    return: (B, C, H, W), 빈 cell 은 0
+    """
+    C = src.size(1)
+    index = (batch * (H * W + 1) + index).unsqueeze(1)  # (M, 1), 채널 방향 broadcast
+    out = scatter(src, index, dim=0, dim_size=B * (H * W + 1), reduce="max")  # (B * (H * W + 1), C)
+    return out.view(B, H * W + 1, C)[:, : H * W].transpose(1, 2).reshape(B, C, H, W)
+
+
+def scatter_cells(feat, index, occupancy, H, W):
+    """
+    feat: (B, C, ...), index: (B, P) ─ 입력 cell 별 출력 cell
+    occupancy: None 이면 모든 입력 cell, (B, ...) bool 이면 True 인 cell 만 scatter (sparse)
+    """
+    B, C = feat.shape[:2]
+    feat = feat.reshape(B, C, -1)
+    if occupancy is None:
+        return batched_scatter_max(feat, index, H, W)
+    batch, cell = torch.nonzero(occupancy.reshape(B, -1), as_tuple=True)  # (M,)
+    return sparse_scatter_max(feat[batch, :, cell], batch, index[batch, cell], B, H, W)
+
+
+def lut_index(lut, bins):
+    """
+    정수 bin 의 target index 를 LUT 에서 gather
+    lut: (n_bins, P) int32, bins: (B, 1, ...) 정수 bin (범위 밖은 양 끝 bin 으로 clamp)
+    return: (B, P)
+    """
+    B = bins.size(0)
+    bins = bins.reshape(B, -1).long().clamp(0, lut.size(0) - 1)  # (B, P)
+    cell = torch.arange(lut.size(1), device=lut.device)
+    return lut[bins, cell]
 
 
 class RV2BEV(nn.Module):
@@ -35,35 +78,54 @@ class RV2BEV(nn.Module):
 
         theta = torch.linspace(self.theta_max, self.theta_min, self.H_r).view(1, self.H_r, 1)
         phi = torch.linspace(self.phi_min, self.phi_max, self.W_r).view(1, 1, self.W_r)
-        self.register_buffer("theta", theta)
-        self.register_buffer("phi", phi)
-
-    @torch.no_grad()
-    def forward(self, rv_feat, rv_range_bin):
-        B, C, _, _ = rv_feat.shape
-        device = rv_feat.device
-
+        # 고정 기하 buffer 는 생성자에서 다시 계산되므로 state_dict 에 저장하지 않음
+        self.register_buffer("theta", theta, persistent=False)
+        self.register_buffer("phi", phi, persistent=False)
+        # range 와 무관한 삼각함수는 미리 계산 (forward 에서는 곱셈만)
+        self.register_buffer("cos_theta", torch.cos(theta), persistent=False)
+        self.register_buffer("cos_phi", torch.cos(phi), persistent=False)
+        self.register_buffer("sin_phi", torch.sin(phi), persistent=False)
+        self.register_buffer("range_lut", None, persistent=False)
+
+    def target_index(self, rv_range_bin):
+        """
+        rv_range_bin: (..., H_r, W_r) range-bin (float 가능)
+        return: (..., H_r * W_r) RV 픽셀이 들어갈 BEV cell (v * W_b + u), 범위 밖은 H_b * W_b
+        """
         dr = (self.r_max - self.r_min) / self.r_bins
-        r = rv_range_bin.squeeze(1) * dr + (self.r_min + dr / 2)
+        r = rv_range_bin * dr + (self.r_min + dr / 2)
 
-        theta, phi = self.theta.to(device), self.phi.to(device)
-        x = r * torch.cos(theta) * torch.cos(phi)
-        y = r * torch.cos(theta) * torch.sin(phi)
+        # r * cos(θ) 를 먼저 곱해야 기존 (r * cos(θ) * cos(φ)) 과 같은 결과
+        r_xy = r * self.cos_theta
+        x = r_xy * self.cos_phi
+        y = r_xy * self.sin_phi
 
         u = ((x - self.xmin) / (self.xmax - self.xmin) * (self.W_b - 1)).long()
         v = ((self.ymax - y) / (self.ymax - self.ymin) * (self.H_b - 1)).long()
         valid = (u >= 0) & (u < self.W_b) & (v >= 0) & (v < self.H_b)
 
-        bev = torch.zeros(B, C, self.H_b, self.W_b, device=device)
-        for b in range(B):
-            m = valid[b]
-            if not m.any():
-                continue
-            idx = (v[b][m] * self.W_b + u[b][m]).view(-1)
-            src = rv_feat[b, :, m]
-            flat = scatter(src, idx.expand(C, -1), 1, dim_size=self.H_b * self.W_b, reduce="max")
-            bev[b] = flat.view(C, self.H_b, self.W_b)
-        return bev
+        index = torch.where(valid, v * self.W_b + u, torch.full_like(u, self.H_b * self.W_b))
+        return index.flatten(-2)
+
+    def lut(self):
+        """(r_bins, H_r * W_r) int32, 정수 range-bin 별 target_index (처음 사용할 때 buffer 와 같은 device 에 계산)"""
+        if self.range_lut is None:
+            bins = torch.arange(self.r_bins, device=self.theta.device, dtype=torch.float32).view(-1, 1, 1)
+            self.range_lut = self.target_index(bins).int()
+        return self.range_lut
+
+    @torch.no_grad()
+    def forward(self, rv_feat, rv_range_bin, occupancy=None):
+        """
+        rv_feat: (B, C, H_r, W_r)
+        rv_range_bin: (B, 1, H_r, W_r) ─ float 이면 그대로 기하 계산, 정수 dtype 이면 LUT gather
+        occupancy: (B, H_r, W_r) bool ─ 주어지면 포인트가 있는 RV 픽셀만 scatter (sparse)
+        """
+        if rv_range_bin.is_floating_point():
+            index = self.target_index(rv_range_bin.squeeze(1))  # (B, H_r * W_r)
+        else:
+            index = lut_index(self.lut(), rv_range_bin)
+        return scatter_cells(rv_feat, index, occupancy, self.H_b, self.W_b)
 
 
 class BEV2RV(nn.Module):
@@ -104,59 +166,63 @@ class BEV2RV(nn.Module):
         x_lin = torch.linspace(self.xmin, self.xmax, self.W_b)  # (W_b,)
 
         yg, xg = torch.meshgrid(y_lin, x_lin)  # (H_b, W_b) each
-        self.register_buffer("xg", xg)  # x 좌표
-        self.register_buffer("yg", yg)  # y 좌표
+        # 고정 기하 buffer 는 생성자에서 다시 계산되므로 state_dict 에 저장하지 않음
+        self.register_buffer("xg", xg, persistent=False)  # x 좌표
+        self.register_buffer("yg", yg, persistent=False)  # y 좌표
 
         # ───────────────── BEV 픽셀마다 고정 φ 인덱스 미리 계산 ─────────────────
         phi = torch.atan2(yg, xg)  # (H_b, W_b)
         col_idx = (
             ((phi - self.phi_min) / (self.phi_max - self.phi_min) * (self.W_r - 1)).round().clamp(0, self.W_r - 1).long()  # 0‥W_r
         )
-        self.register_buffer("col_idx", col_idx)  # 정수형 φ 인덱스
+        self.register_buffer("col_idx", col_idx, persistent=False)  # 정수형 φ 인덱스
+        self.register_buffer("rho", torch.sqrt(xg**2 + yg**2) + 1e-6, persistent=False)  # 고정 ρ
 
-    @torch.no_grad()
-    def forward(self, bev_feat: torch.Tensor, bev_z_bin: torch.Tensor) -> torch.Tensor:
+        # 정수 z-bin → RV 픽셀 LUT (lut 에서 처음 사용할 때 계산)
+        self.register_buffer("z_lut", None, persistent=False)
+
+    def target_index(self, bev_z_bin):
         """
-        bev_feat : (B, C, 512, 512)
-        bev_z_bin: (B, 1, 512, 512) ─ z-bin index (0‥29)
+        bev_z_bin: (..., H_b, W_b) z-bin (float 가능)
+        return: (..., H_b * W_b) BEV cell 이 들어갈 RV 픽셀 (row * W_r + col), NaN 은 H_r * W_r
         """
-        B, C, _, _ = bev_feat.shape
-        device = bev_feat.device
-
         # 1) z-bin  → 실제 z (센서 원점 기준)
         dz = (self.z_max - self.z_min) / self.z_bins  # bin 높이 [m]
-        z_rel = bev_z_bin.squeeze(1).float() * dz + (self.z_min + dz / 2)  # (B, H_b, W_b)
+        z_rel = bev_z_bin.float() * dz + (self.z_min + dz / 2)  # (..., H_b, W_b)
 
         # 2) 고정 ρ, φ
-        x, y = self.xg.to(device), self.yg.to(device)  # (H_b, W_b)
-        rho = torch.sqrt(x**2 + y**2) + 1e-6  # (H_b, W_b)
-        col = self.col_idx.to(device)  # (H_b, W_b)
-
-        # 3) 출력 버퍼
-        rv = torch.zeros(B, C, self.H_r, self.W_r, device=device)
-
-        # 4) 배치별 처리 (JIT/CPU 대비 간단하게 루프 유지)
-        for b in range(B):
-            theta = torch.atan2(z_rel[b], rho)  # (H_b, W_b)  θ > 0
-            # row: 위(25°) → 아래(3°)로 증가
-            row = (
-                ((self.theta_max - theta) / (self.theta_max - self.theta_min) * (self.H_r - 1))
-                .round()
-                .clamp(0, self.H_r - 1)
-                .long()
-            )
+        rho = self.rho  # (H_b, W_b)
+        col = self.col_idx  # (H_b, W_b)
 
-            valid = torch.isfinite(theta)  # NaN 방지
-            if not valid.any():
-                continue
+        # 3) θ → row (위(25°) → 아래(3°)로 증가)
+        theta = torch.atan2(z_rel, rho)  # (..., H_b, W_b)  θ > 0
+        row = (
+            ((self.theta_max - theta) / (self.theta_max - self.theta_min) * (self.H_r - 1)).round().clamp(0, self.H_r - 1).long()
+        )
+        valid = torch.isfinite(theta)  # NaN 방지
 
-            idx_flat = (row[valid] * self.W_r + col[valid]).view(-1)  # (N,)
-            src = bev_feat[b, :, valid]  # (C, N)
+        index = torch.where(valid, row * self.W_r + col, torch.full_like(row, self.H_r * self.W_r))
+        return index.flatten(-2)
 
-            rv_flat = scatter(src, idx_flat.expand(C, -1), dim=1, dim_size=self.H_r * self.W_r, reduce="max")  # or "mean"
-            rv[b] = rv_flat.view(C, self.H_r, self.W_r)
+    def lut(self):
+        """(z_bins, H_b * W_b) int32, 정수 z-bin 별 target_index (처음 사용할 때 buffer 와 같은 device 에 계산)"""
+        if self.z_lut is None:
+            bins = torch.arange(self.z_bins, device=self.xg.device).view(-1, 1, 1)
+            self.z_lut = self.target_index(bins).int()
+        return self.z_lut
 
-        return rv
+    @torch.no_grad()
+    def forward(self, bev_feat: torch.Tensor, bev_z_bin: torch.Tensor, occupancy=None) -> torch.Tensor:
+        """
+        bev_feat : (B, C, 512, 512)
+        bev_z_bin: (B, 1, 512, 512) ─ z-bin, float 이면 그대로 기하 계산, 정수 dtype (0‥29) 이면 LUT gather
+        occupancy: (B, 512, 512) bool ─ 주어지면 포인트가 있는 BEV cell 만 scatter (sparse)
+        """
+        if bev_z_bin.is_floating_point():
+            index = self.target_index(bev_z_bin.squeeze(1))  # (B, H_b * W_b)
+        else:
+            index = lut_index(self.lut(), bev_z_bin)
+        return scatter_cells(bev_feat, index, occupancy, self.H_r, self.W_r)
 
 
 sizes = {
@@ -164,15 +230,15 @@ sizes = {
     "RV": {64: (64, 2048), 32: (32, 1024), 16: (16, 512)},
 }
 
-converters = {
-    "BEV2RV": {
-        512: BEV2RV(sizes["BEV"][512], sizes["RV"][64]),
-        256: BEV2RV(sizes["BEV"][256], sizes["RV"][32]),
-        128: BEV2RV(sizes["BEV"][128], sizes["RV"][16]),
-    },
-    "RV2BEV": {
-        64: RV2BEV(sizes["RV"][64], sizes["BEV"][512]),
-        32: RV2BEV(sizes["RV"][32], sizes["BEV"][256]),
-        16: RV2BEV(sizes["RV"][16], sizes["BEV"][128]),
-    },
-}
+# 같은 layer 에서 짝을 이루는 (BEV 크기, RV 크기)
+scales = ((512, 64), (256, 32), (128, 16))
+
+
+def build_converters():
+    """
+    MultiViewNetwork 의 하위 모듈로 등록할 변환기 (.to() / .cuda() 로 buffer 가 함께 이동, state_dict 에는 저장하지 않음)
+    BEV2RV 는 BEV 크기 (H_b), RV2BEV 는 RV 크기 (H_r) 를 문자열 key 로 사용
+    """
+    bev2rv = {str(H_b): BEV2RV(sizes["BEV"][H_b], sizes["RV"][H_r]) for H_b, H_r in scales}
+    rv2bev = {str(H_r): RV2BEV(sizes["RV"][H_r], sizes["BEV"][H_b]) for H_b, H_r in scales}
+    return nn.ModuleDict({"BEV2RV": nn.ModuleDict(bev2rv), "RV2BEV": nn.ModuleDict(rv2bev)})
@@ -1,3 +1,5 @@
+import contextlib
+import functools
 import os
 
 import numpy as np
@@ -24,6 +26,26 @@ def VoxelMaxPool(pcds_feat, pcds_ind, output_size, scale_rate):
     return voxel_feat
 
 
+def _split_batch_norm_forward(bn, x, splits):
+    return torch.cat([type(bn).forward(bn, chunk) for chunk in x.chunk(splits, dim=0)], dim=0)
+
+
+@contextlib.contextmanager
+def split_batch_norm(module, splits):
+    """
+    module 안의 BatchNorm (SyncBatchNorm 포함) 이 입력을 배치 차원으로 splits 등분하여 조각마다 따로 정규화
+    (batch 통계와 running stat 갱신이 조각을 하나씩 순서대로 넣은 것과 같음)
+    """
+    bns = [m for m in module.modules() if isinstance(m, nn.modules.batchnorm._BatchNorm)]
+    for bn in bns:
+        bn.forward = functools.partial(_split_batch_norm_forward, bn, splits=splits)
+    try:
+        yield
+    finally:
+        for bn in bns:
+            del bn.forward
+
+
 class MOSNet(nn.Module):
     def __init__(self, pModel):
         super(MOSNet, self).__init__()
@@ -129,31 +151,129 @@ class MOSNet(nn.Module):
         self.point_post = CatFusion([64, 64, 32], 64)
         self.pred_layer = backbone.PredBranch(64, 3)
 
-    def stage_forward(self, xyzi, descartes_coord, sphere_coord, temporal_res):
+    def encode(self, xyzi, descartes_coord, sphere_coord, geometry=None):
         """
+        temporal_res 와 무관한 부분 (PointNet, BEV 투영, MultiViewNetwork Encoder)
         xyzi: (BS, 3, 7, 160000, 1)
         descartes_coord: (BS, 3, 160000, 3(x, y, z), 1)
         sphere_coord: (BS, 3, 160000, 3(theta, phi, r), 1)
-        temporal_res: (BS, 64, 128, 128)
+        geometry: t_0 좌표의 MultiViewNetwork.FrameGeometry (없으면 MultiViewNetwork.encode 에서 계산)
         """
         BS, T, C, N, _ = xyzi.shape
+        if self.pModel.fused_point_bev and not self.training and not torch.is_grad_enabled():
+            return self.encode_fused(xyzi, descartes_coord, sphere_coord, geometry)
 
         # PointNet
         point_feats = self.point_pre(xyzi.view(BS * T, C, N, 1))  # (BS×3, 64, 160000, 1)
 
-        # Descartes BEV 투영 (BS, 192, 512, 512)
-        descartes_feat_in = VoxelMaxPool(
-            pcds_feat=point_feats,  # (BS*T, 64, 160000, 1)
-            pcds_ind=descartes_coord.view(BS * T, N, 3, 1)[:, :, :2],  # (BS*T, N, 2, 1)
+        return self.encode_point_feats(point_feats.view(BS, T, -1, N, 1), descartes_coord, sphere_coord, geometry)
+
+    def encode_fused(self, xyzi, descartes_coord, sphere_coord, geometry=None):
+        """
+        encode 와 같은 결과 (inference 전용), t_0 이외 프레임은 PointNet + BEV 투영을 deep_point.PointNetVoxelMaxPool 로 합쳐
+        포인트 feature (BS×2, 64, 160000, 1) 를 만들지 않음 (point_post 에 필요한 t_0 의 feature 만 계산)
+        """
+        BS, T, C, N, _ = xyzi.shape
+        H, W = self.descartes_shape[:2]
+
+        # t_0: PointNet, BEV 투영 (BS, 64, 512, 512)
+        point_feats_t_0 = self.point_pre(xyzi[:, 0])  # (BS, 64, 160000, 1)
+        descartes_coord_t_0 = descartes_coord[:, 0].contiguous()  # (BS, 160000, 3, 1)
+        bev_project = self.bev_project_sparse if self.pModel.sparse_bev else self.bev_project
+        descartes_feat_t_0 = bev_project(point_feats_t_0, descartes_coord_t_0)
+
+        # t_1, t_2: BN 을 fold 한 PointNet 을 포인트마다 계산하여 바로 BEV 로 max-reduce (BS×2, 64, 512, 512)
+        descartes_feat_hist = deep_point.PointNetVoxelMaxPool(
+            pcds_feat=xyzi[:, 1:].reshape(BS * (T - 1), C, N, 1),
+            pcds_ind=descartes_coord[:, 1:, :, :2].reshape(BS * (T - 1), N, 2, 1),
+            layers=self.point_pre.fold(),
+            output_size=(H, W),
+            scale_rate=(1.0, 1.0),
+        )
+
+        # [t_0, t_1, t_2] 프레임 순서로 64채널씩 (BS, 192, 512, 512)
+        descartes_feat_in = torch.cat(
+            [descartes_feat_t_0.view(BS, 1, -1, H, W), descartes_feat_hist.view(BS, T - 1, -1, H, W)], dim=1
+        ).view(BS, -1, H, W)
+        sphere_coord_t_0 = sphere_coord[:, 0].contiguous()  # (BS, 160000, 3, 1)
+
+        return self.encode_bev(descartes_feat_in, point_feats_t_0, descartes_coord_t_0, sphere_coord_t_0, geometry)
+
+    def bev_project(self, point_feats, descartes_coord):
+        """
+        point_feats: (B, 64, 160000, 1)
+        descartes_coord: (B, 160000, 3(x, y, z), 1)
+        return: (B, 64, 512, 512)
+        """
+        return VoxelMaxPool(
+            pcds_feat=point_feats,  # (B, 64, 160000, 1)
+            pcds_ind=descartes_coord[:, :, :2],  # (B, N, 2, 1)
             output_size=self.descartes_shape[:2],
             scale_rate=(1.0, 1.0),
-        ).view(BS, -1, *self.descartes_shape[:2])
+        )
+
+    def bev_project_sparse(self, point_feats, descartes_coord):
+        """
+        bev_project 와 같은 결과, 포인트가 있는 cell (V 개) 만 (64, V) 로 pooling 한 뒤 dense 로 한 번만 변환
+        point_feats: (B, 64, 160000, 1)
+        descartes_coord: (B, 160000, 3(x, y, z), 1)
+        return: (B, 64, 512, 512)
+        """
+        output_size = self.descartes_shape[:2]
+        cells, voxel_feat = deep_point.VoxelMaxPoolSparse(
+            pcds_feat=point_feats,  # (B, 64, 160000, 1)
+            pcds_ind=descartes_coord[:, :, :2].contiguous(),  # (B, N, 2, 1)
+            output_size=output_size,
+            scale_rate=(1.0, 1.0),
+        )  # (V,), (64, V)
+        return deep_point.sparse_to_dense(cells, voxel_feat.to(point_feats.dtype), point_feats.size(0), output_size)
+
+    def encode_point_feats(self, point_feats, descartes_coord, sphere_coord, geometry=None):
+        """
+        PointNet 이후의 Encoder (point_feats 를 미리 계산해 둔 경우, ex. StreamingMOSNet)
+        point_feats: (BS, 3, 64, 160000, 1)
+        descartes_coord: (BS, 3, 160000, 3(x, y, z), 1) ─ t_0 이외의 프레임은 x, y 만 사용
+        sphere_coord: (BS, T', 160000, 3(theta, phi, r), 1) ─ t_0 만 사용
+        """
+        BS, T, C, N, _ = point_feats.shape
+
+        # Descartes BEV 투영 (BS, 192, 512, 512)
+        bev_project = self.bev_project_sparse if self.pModel.sparse_bev else self.bev_project
+        descartes_feat_in = bev_project(point_feats.view(BS * T, C, N, 1), descartes_coord.reshape(BS * T, N, 3, 1)).view(
+            BS, -1, *self.descartes_shape[:2]
+        )
 
         # t_0 시점 데이터(point피쳐, descartes좌표, sphere좌표)
-        point_feats_t_0 = point_feats.view(BS, T, -1, N, 1)[:, 0].contiguous()  # (BS, 64, 160000, 1)
+        point_feats_t_0 = point_feats[:, 0].contiguous()  # (BS, 64, 160000, 1)
         descartes_coord_t_0 = descartes_coord[:, 0].contiguous()  # (BS, 160000, 3, 1)
         sphere_coord_t_0 = sphere_coord[:, 0].contiguous()  # (BS, 160000, 3, 1)
 
+        return self.encode_bev(descartes_feat_in, point_feats_t_0, descartes_coord_t_0, sphere_coord_t_0, geometry)
+
+    def encode_bev(self, descartes_feat_in, point_feats_t_0, descartes_coord_t_0, sphere_coord_t_0, geometry=None):
+        """
+        BEV 입력 이후의 Encoder (BEV 입력을 직접 구성하는 경우, ex. StreamingMOSNet 의 bev_warp 모드)
+        descartes_feat_in: (BS, 192, 512, 512) ─ [t_0, t_1, t_2] 프레임 순서로 64채널씩
+        point_feats_t_0: (BS, 64, 160000, 1)
+        descartes_coord_t_0: (BS, 160000, 3, 1)
+        sphere_coord_t_0: (BS, 160000, 3, 1)
+        geometry: descartes_coord_t_0, sphere_coord_t_0 의 MultiViewNetwork.FrameGeometry (없으면 여기서 계산)
+        """
+        encoded = self.multi_view_network.encode(descartes_feat_in, descartes_coord_t_0, sphere_coord_t_0, geometry)
+        encoded.update(
+            {
+                "point_feats_t_0": point_feats_t_0,
+                "descartes_coord_t_0": descartes_coord_t_0,
+                "sphere_coord_t_0": sphere_coord_t_0,
+            }
+        )
+        return encoded
+
+    def decode(self, encoded, temporal_res):
+        """
+        encoded: encode() 결과
+        temporal_res: (BS, 64, 128, 128)
+        """
         (
             des_out_as_point,  # (BS, 64, 160000, 1)
             sph_out_as_point,  # (BS, 32, 160000, 1)
@@ -161,39 +281,71 @@ class MOSNet(nn.Module):
             aux2,  # (BS, 3, 256, 256)
             aux3,  # (BS, 3, 256, 256)
             temporal_res,  # (BS, 64, 128, 128)
-        ) = self.multi_view_network(descartes_feat_in, descartes_coord_t_0, sphere_coord_t_0, temporal_res)
+        ) = self.multi_view_network.decode(encoded, encoded["descartes_coord_t_0"], encoded["sphere_coord_t_0"], temporal_res)
 
-        point_feat_out = self.point_post(point_feats_t_0, des_out_as_point, sph_out_as_point)
+        point_feat_out = self.point_post(encoded["point_feats_t_0"], des_out_as_point, sph_out_as_point)
         pred_cls = self.pred_layer(point_feat_out).float()
 
         return pred_cls, aux1, aux2, aux3, temporal_res
 
+    def stage_forward(self, xyzi, descartes_coord, sphere_coord, temporal_res, geometry=None):
+        """
+        xyzi: (BS, 3, 7, 160000, 1)
+        descartes_coord: (BS, 3, 160000, 3(x, y, z), 1)
+        sphere_coord: (BS, 3, 160000, 3(theta, phi, r), 1)
+        temporal_res: (BS, 64, 128, 128)
+        geometry: t_0 좌표의 FrameGeometry (DataLoader worker 등에서 미리 계산한 경우, 없으면 여기서 프레임마다 한 번 계산)
+        """
+        if geometry is None:
+            geometry = MultiViewNetwork.FrameGeometry.build(descartes_coord[:, 0].contiguous(), sphere_coord[:, 0].contiguous())
+        encoded = self.encode(xyzi, descartes_coord, sphere_coord, geometry)
+        return self.decode(encoded, temporal_res)
+
+    def _stage_loss(self, pred_cls, aux1, aux2, aux3, label_3D_single, label_2D_single):
+        bs, time_num, _, _ = pred_cls.shape
+        aux1 = aux1.view(bs, time_num, -1).unsqueeze(-1)
+        aux2 = aux2.view(bs, time_num, -1).unsqueeze(-1)
+        aux3 = aux3.view(bs, time_num, -1).unsqueeze(-1)
+        label_3D_single = label_3D_single.contiguous().view(bs, -1, 1)
+        label_2D_single = label_2D_single.contiguous().view(bs, -1, 1)
+
+        loss_3d = self._aux_loss(pred_cls, label_3D_single, lovasz_scale=3)
+        loss_2d_1 = self._aux_loss(aux1, label_2D_single, lovasz_scale=3)
+        loss_2d_2 = self._aux_loss(aux2, label_2D_single, lovasz_scale=3)
+        loss_2d_3 = self._aux_loss(aux3, label_2D_single, lovasz_scale=3)
+        loss_2d = (loss_2d_1 + loss_2d_2 + loss_2d_3) / 3
+
+        return loss_3d + loss_2d, loss_2d, loss_3d
+
     def forward(self, xyzi_stages, descartes_coord_stages, sphere_coord_stages, label_3D_stages, label_2D_stages):
         stage = 3
         losses, losses_2d, losses_3d = [], [], []
         temporal_res = None
-        for i in range(stage):
-            pred_cls, aux1, aux2, aux3, temporal_res = self.stage_forward(
-                xyzi_stages[:, i].contiguous(),
-                descartes_coord_stages[:, i].contiguous(),
-                sphere_coord_stages[:, i].contiguous(),
-                temporal_res,
-            )
 
-            bs, time_num, _, _ = pred_cls.shape
-            aux1 = aux1.view(bs, time_num, -1).unsqueeze(-1)
-            aux2 = aux2.view(bs, time_num, -1).unsqueeze(-1)
-            aux3 = aux3.view(bs, time_num, -1).unsqueeze(-1)
-            label_3D_single = label_3D_stages[:, i].contiguous().view(bs, -1, 1)
-            label_2D_single = label_2D_stages[:, i].contiguous().view(bs, -1, 1)
+        if self.pModel.batch_stages:
+            # Encoder 는 stage 간 독립이므로 stage 를 배치 차원으로 쌓아 한 번에 실행 (stage-major: [s0 의 BS개, s1 의 BS개, ...])
+            # train 모드의 BatchNorm 은 stage 조각마다 따로 정규화하여 stage 별 loop 와 같은 통계 / running stat 갱신
+            BS = xyzi_stages.shape[0]
+            with split_batch_norm(self, stage) if self.training else contextlib.nullcontext():
+                encoded = self.encode(
+                    xyzi_stages[:, :stage].transpose(0, 1).reshape(stage * BS, *xyzi_stages.shape[2:]),
+                    descartes_coord_stages[:, :stage].transpose(0, 1).reshape(stage * BS, *descartes_coord_stages.shape[2:]),
+                    sphere_coord_stages[:, :stage].transpose(0, 1).reshape(stage * BS, *sphere_coord_stages.shape[2:]),
+                )
 
-            loss_3d = self._aux_loss(pred_cls, label_3D_single, lovasz_scale=3)
-            loss_2d_1 = self._aux_loss(aux1, label_2D_single, lovasz_scale=3)
-            loss_2d_2 = self._aux_loss(aux2, label_2D_single, lovasz_scale=3)
-            loss_2d_3 = self._aux_loss(aux3, label_2D_single, lovasz_scale=3)
-            loss_2d = (loss_2d_1 + loss_2d_2 + loss_2d_3) / 3
-
-            loss = loss_3d + loss_2d
+        for i in range(stage):
+            if self.pModel.batch_stages:
+                encoded_stage = {key: value[i * BS : (i + 1) * BS] for key, value in encoded.items()}
+                pred_cls, aux1, aux2, aux3, temporal_res = self.decode(encoded_stage, temporal_res)
+            else:
+                pred_cls, aux1, aux2, aux3, temporal_res = self.stage_forward(
+                    xyzi_stages[:, i].contiguous(),
+                    descartes_coord_stages[:, i].contiguous(),
+                    sphere_coord_stages[:, i].contiguous(),
+                    temporal_res,
+                )
+
+            loss, loss_2d, loss_3d = self._stage_loss(pred_cls, aux1, aux2, aux3, label_3D_stages[:, i], label_2D_stages[:, i])
 
             losses.append(loss)
             losses_2d.append(loss_2d)
@@ -205,11 +357,36 @@ class MOSNet(nn.Module):
 
         return loss, loss_2d, loss_3d
 
-    def infer(self, xyzi_single, descartes_coord_single, sphere_coord_single, temporal_res):
+    def infer(self, xyzi_single, descartes_coord_single, sphere_coord_single, temporal_res, geometry=None):
         pred_cls, aux1, aux2, aux3, temporal_res = self.stage_forward(
             xyzi_single,
             descartes_coord_single,
             sphere_coord_single,
             temporal_res,
+            geometry,
         )
         return pred_cls, temporal_res
+
+    def infer_sequence(self, xyzi_seq, descartes_coord_seq, sphere_coord_seq, temporal_res, chunk_size=8):
+        """
+        오프라인 추론: 연속된 F 프레임에 대해 Encoder 를 chunk_size 단위의 큰 배치로 실행하고,
+        Temporal fusion + Decoder 만 프레임 순서대로 진행한다. 프레임별 infer() 와 같은 결과.
+        xyzi_seq: (F, 3, 7, 160000, 1) ─ 시간 순서대로 정렬된 연속 프레임
+        descartes_coord_seq: (F, 3, 160000, 3, 1)
+        sphere_coord_seq: (F, 3, 160000, 3, 1)
+        temporal_res: (1, 64, 128, 128) 또는 None (첫 프레임 이전의 상태)
+        return: pred_cls (F, 3, 160000, 1), temporal_res (마지막 프레임의 상태)
+        """
+        pred_cls_list = []
+        for start in range(0, xyzi_seq.shape[0], chunk_size):
+            end = start + chunk_size
+            encoded = self.encode(
+                xyzi_seq[start:end].contiguous(),
+                descartes_coord_seq[start:end].contiguous(),
+                sphere_coord_seq[start:end].contiguous(),
+            )
+            for i in range(encoded["des3"].shape[0]):
+                encoded_single = {key: value[i : i + 1] for key, value in encoded.items()}
+                pred_cls, _, _, _, temporal_res = self.decode(encoded_single, temporal_res)
+                pred_cls_list.append(pred_cls)
+        return torch.cat(pred_cls_list, dim=0), temporal_res
@@ -7,7 +7,7 @@ import torch.nn.functional as F
 from matplotlib import pyplot as plt
 
 import deep_point
-from networks.DVT import converters
+from networks import DVT
 
 from . import backbone
 
@@ -15,17 +15,45 @@ from . import backbone
 def VoxelMaxPool(pcds_feat, pcds_ind, output_size, scale_rate):
     voxel_feat = deep_point.VoxelMaxPool(
         pcds_feat=pcds_feat.contiguous().float(),
-        pcds_ind=pcds_ind.contiguous(),
+        pcds_ind=pcds_ind if isinstance(pcds_ind, deep_point.VoxelPlan) else pcds_ind.contiguous(),
         output_size=output_size,
         scale_rate=scale_rate,
     ).to(pcds_feat.dtype)
     return voxel_feat
 
 
+def VoxelMaxPoolMultiScale(pcds_feat, pcds_ind, targets):
+    voxel_feats = deep_point.VoxelMaxPoolMultiScale(
+        pcds_feat=pcds_feat.contiguous().float(),
+        pcds_ind=pcds_ind if isinstance(pcds_ind, deep_point.VoxelPlan) else pcds_ind.contiguous(),
+        targets=targets,
+    )
+    return [voxel_feat.to(pcds_feat.dtype) for voxel_feat in voxel_feats]
+
+
+def VoxelMinPoolMultiScale(pcds_feat, pcds_ind, targets):
+    voxel_feats = deep_point.VoxelMinPoolMultiScale(
+        pcds_feat=pcds_feat.contiguous(),
+        pcds_ind=pcds_ind if isinstance(pcds_ind, deep_point.VoxelPlan) else pcds_ind.contiguous(),
+        targets=targets,
+    )
+    return [voxel_feat.to(pcds_feat.dtype) for voxel_feat in voxel_feats]
+
+
+def VoxelUnpool(grid_feat, pcds_ind, scale_rate, mode):
+    pcds_feat = deep_point.VoxelUnpool(
+        grid_feat=grid_feat,
+        pcds_ind=pcds_ind if isinstance(pcds_ind, deep_point.VoxelPlan) else pcds_ind[:, :, :2].contiguous(),  # (BS, N, 2, 1)
+        scale_rate=scale_rate,
+        mode=mode,
+    )
+    return pcds_feat
+
+
 def VoxelMinPool(pcds_feat, pcds_ind, output_size, scale_rate):
     voxel_feat = deep_point.VoxelMinPool(
         pcds_feat=pcds_feat.contiguous(),
-        pcds_ind=pcds_ind.contiguous(),
+        pcds_ind=pcds_ind if isinstance(pcds_ind, deep_point.VoxelPlan) else pcds_ind.contiguous(),
         output_size=output_size,
         scale_rate=scale_rate,
     ).to(pcds_feat.dtype)
@@ -35,6 +63,8 @@ def VoxelMinPool(pcds_feat, pcds_ind, output_size, scale_rate):
 """
 VoxelMaxPool : 두번째 파라미터가 갖는 값 quan 기준 W/H * scale_rate = output_size.
 BilinearSample : 두번째 파라미터가 갖는 값 quan 기준 W/H가 첫번째 파라미터로 되기 위한 scale_rate.
+두 함수 모두 두번째 파라미터로 좌표 대신 deep_point.VoxelPlan 을 받을 수 있다. (quantize / grid 계산 재사용)
+grid -> point 는 MultiViewNetwork.grid_to_point_modes 에 따라 BilinearSample 또는 deep_point.VoxelUnpool 을 사용한다.
 """
 
 grid_2_point_scale_full = backbone.BilinearSample((1.0, 1.0))
@@ -55,6 +85,69 @@ sphere_scale_rates = {
     8: (0.125, grid_2_point_scale_0125),
 }
 
+# is_direct 일 때 layer-1, layer-2 의 view 변환에 필요한 z map (BEV), range map (RV) 크기
+bev_z_sizes = ((256, 256), (128, 128))
+sph_range_sizes = ((32, 1024), (16, 512))
+
+
+class FrameGeometry:
+    """
+    한 프레임 (t_0) 의 좌표에서 나오는 기하 정보, 프레임마다 한 번만 계산하여 encode (view 변환) / decode (back-projection) 에서 재사용
+      - des_plan, sph_plan : BEV (x, y), RV (theta, phi) 좌표의 deep_point.VoxelPlan (voxel offset, grid_sample grid 캐시)
+      - bev_z_maps, sph_range_maps : layer 별 BEV z map (min z), RV range map (max r), {(H, W): (BS, 1, H, W)}
+    모델 파라미터와 무관하므로 DataLoader worker 에서 CPU 로 만든 뒤 .to(device) 로 옮겨 사용할 수도 있다.
+    """
+
+    def __init__(self, des_plan, sph_plan, bev_z_maps, sph_range_maps):
+        self.des_plan = des_plan
+        self.sph_plan = sph_plan
+        self.bev_z_maps = bev_z_maps
+        self.sph_range_maps = sph_range_maps
+
+    @classmethod
+    def build(cls, des_coord_t0, sph_coord_t0):
+        """
+        des_coord_t0 : [BS, N, 3, 1]
+        sph_coord_t0 : [BS, N, 3, 1]
+        """
+        des_plan = deep_point.VoxelPlan(des_coord_t0[:, :, :2])
+        sph_plan = deep_point.VoxelPlan(sph_coord_t0[:, :, :2])
+        bev_z_maps, sph_range_maps = MultiViewNetwork.height_maps(des_coord_t0, sph_coord_t0, (des_plan, sph_plan))
+
+        # back-projection 의 grid_sample grid (decode 의 des_out 은 bev_z_sizes[0], sph1 은 sph_range_sizes[0] 크기)
+        for plan, size, scale_rates in (
+            (des_plan, bev_z_sizes[0], descartes_scale_rates),
+            (sph_plan, sph_range_sizes[0], sphere_scale_rates),
+        ):
+            scale_rate = scale_rates[size[0]][0]
+            plan.sample_grid(size, (scale_rate, scale_rate))
+        return cls(des_plan, sph_plan, bev_z_maps, sph_range_maps)
+
+    @property
+    def plans(self):
+        return self.des_plan, self.sph_plan
+
+    @property
+    def height_maps(self):
+        return self.bev_z_maps, self.sph_range_maps
+
+    def __getitem__(self, index):
+        """배치 차원 slicing (encoded dict 를 프레임 / stage 별로 나눌 때)"""
+        return FrameGeometry(
+            self.des_plan[index],
+            self.sph_plan[index],
+            {size: z[index] for size, z in self.bev_z_maps.items()},
+            {size: r[index] for size, r in self.sph_range_maps.items()},
+        )
+
+    def to(self, device, non_blocking=False):
+        return FrameGeometry(
+            self.des_plan.to(device, non_blocking),
+            self.sph_plan.to(device, non_blocking),
+            {size: z.to(device, non_blocking=non_blocking) for size, z in self.bev_z_maps.items()},
+            {size: r.to(device, non_blocking=non_blocking) for size, r in self.sph_range_maps.items()},
+        )
+
 
 class MultiViewNetwork(nn.Module):
     def __init__(self):
@@ -87,6 +180,27 @@ class MultiViewNetwork(nn.Module):
         self.aux_head2 = nn.Conv2d(64, 3, 1)
         self.aux_head3 = nn.Conv2d(128, 3, 1)
 
+        self.save_image = False
+
+        # 호출 위치별 grid -> point 방식
+        #   "grid_sample": backbone.BilinearSample (F.grid_sample)
+        #   "bilinear": deep_point.VoxelUnpool, plan 에 캐시한 4 corner index / weight 로 gather (BilinearSample 과 같은 결과)
+        #   "nearest": deep_point.VoxelUnpool, 포인트가 속한 cell 하나만 gather
+        self.grid_to_point_modes = {"des_out": "grid_sample", "sph_out": "grid_sample", "2d3d2d": "grid_sample"}
+
+        # True: BEV z / RV range 를 정수 bin 으로 내려 (0 방향 버림) DVT 를 LUT gather 로 실행
+        # (float bin 으로 계산하는 기본값과 결과가 달라지므로 학습된 가중치에는 그대로 쓰지 않음)
+        self.dvt_lut = False
+
+        # True: DVT 에서 포인트가 있는 cell (VoxelPlan occupancy) 만 scatter, 빈 cell 의 feature 는 변환하지 않음
+        # (dense 변환과 결과가 달라지므로 학습된 가중치에는 그대로 쓰지 않음)
+        # dvt_occupancy: 변환별 (ex. "BEV2RV_256") 최근 occupancy 비율 (0‥1, tensor)
+        self.dvt_sparse = False
+        self.dvt_occupancy = {}
+
+        # BEV <-> RV 변환기 (DVT), 하위 모듈로 등록하여 .to() / .cuda() 로 함께 이동 (buffer 는 state_dict 에 저장하지 않음)
+        self.converters = DVT.build_converters()
+
     def _make_layer(self, block, in_planes, out_planes, num_blocks, stride=2, dilation=1):
         layer = []
         layer.append(backbone.DownSample2D(in_planes, out_planes, stride=stride))
@@ -114,52 +228,84 @@ class MultiViewNetwork(nn.Module):
         else:
             raise ValueError(f"Invalid channel_pool value: {channel_pool}")
 
-    def transform_view(self, feat, des_coord, sph_coord, is_direct):
+    def grid_to_point(self, site, grid_feat, grid_coord, scale_rates):
+        """
+        site : grid_to_point_modes 의 key
+        scale_rates : descartes_scale_rates 또는 sphere_scale_rates
+        return : (BS, C, N, 1)
+        """
+        scale_rate, bilinear_sample = scale_rates[grid_feat.shape[2]]
+        mode = self.grid_to_point_modes[site]
+        if mode == "grid_sample":
+            return bilinear_sample(grid_feat, grid_coord)
+        return VoxelUnpool(grid_feat, grid_coord, (scale_rate, scale_rate), mode)
+
+    def transform_view(self, feat, des_coord, sph_coord, is_direct, plans, height_maps=None):
+        """
+        plans : des_coord 의 (x, y), sph_coord 의 (theta, phi) 에 대한 deep_point.VoxelPlan 쌍
+        height_maps : 미리 계산한 (H, W) 별 BEV z map, RV range map 쌍 (FrameGeometry.height_maps, 없는 크기는 여기서 계산)
+        """
+        des_plan, sph_plan = plans
+        bev_z_maps, sph_range_maps = height_maps if height_maps is not None else ({}, {})
         if feat.shape[2] == feat.shape[3]:  # square(from : BEV)
             if is_direct:
-                return self.des_2_sph_2d2d(feat, des_coord)
+                return self.des_2_sph_2d2d(feat, des_coord, des_plan, bev_z_maps.get(tuple(feat.shape[2:])))
             else:
-                return self.des_2_sph_2d3d2d(feat, des_coord, sph_coord)
+                return self.des_2_sph_2d3d2d(feat, des_plan, sph_plan)
         else:  # rectangular(from : RV)
             if is_direct:
-                return self.sph_2_des_2d2d(feat, sph_coord)
+                return self.sph_2_des_2d2d(feat, sph_coord, sph_plan, sph_range_maps.get(tuple(feat.shape[2:])))
             else:
-                return self.sph_2_des_2d3d2d(feat, sph_coord, des_coord)
+                return self.sph_2_des_2d3d2d(feat, sph_plan, des_plan)
 
-    def des_2_sph_2d2d(self, bev_feat, descartes_coord_t_0):
+    def occupancy(self, name, plan, output_size, scale_rate):
+        """dvt_sparse 일 때 DVT 입력 grid 의 occupancy (BS, H, W) (아니면 None), 비율은 dvt_occupancy[name] 에 기록"""
+        if not self.dvt_sparse:
+            return None
+        occupancy = plan.entry(output_size, scale_rate).occupancy
+        self.dvt_occupancy[name] = occupancy.float().mean()
+        return occupancy
+
+    def des_2_sph_2d2d(self, bev_feat, descartes_coord_t_0, descartes_plan_t_0, bev_z_in=None):
         BS, C, Hb, Wb = bev_feat.shape
 
-        bev_z_in = VoxelMinPool(
-            pcds_feat=descartes_coord_t_0[:, :, 2:3, :].permute(0, 2, 1, 3).contiguous(),  # (BS, 1, N, 1)
-            pcds_ind=descartes_coord_t_0[:, :, :2, :],  # (BS, N, 2, 1)
-            output_size=(Hb, Wb),
-            scale_rate=(Hb / 512, Wb / 512),
-        ).view(BS, -1, Hb, Wb)
+        if bev_z_in is None:
+            bev_z_in = VoxelMinPool(
+                pcds_feat=descartes_coord_t_0[:, :, 2:3, :].permute(0, 2, 1, 3).contiguous(),  # (BS, 1, N, 1)
+                pcds_ind=descartes_plan_t_0,  # (BS, N, 2, 1)
+                output_size=(Hb, Wb),
+                scale_rate=(Hb / 512, Wb / 512),
+            ).view(BS, -1, Hb, Wb)
 
-        return converters["BEV2RV"][Hb](bev_feat, bev_z_in), bev_z_in
+        z_bin = bev_z_in.int() if self.dvt_lut else bev_z_in
+        occupancy = self.occupancy("BEV2RV_{}".format(Hb), descartes_plan_t_0, (Hb, Wb), (Hb / 512, Wb / 512))
+        return self.converters["BEV2RV"][str(Hb)](bev_feat, z_bin, occupancy), bev_z_in
 
-    def sph_2_des_2d2d(self, rv_feat, sphere_coord_t_0):
+    def sph_2_des_2d2d(self, rv_feat, sphere_coord_t_0, sphere_plan_t_0, sph_range_in=None):
         BS, C, Hr, Wr = rv_feat.shape
 
-        sph_range_in = VoxelMaxPool(
-            pcds_feat=sphere_coord_t_0[:, :, 2:3, :].permute(0, 2, 1, 3).contiguous(),  # (BS, 1, N, 1)
-            pcds_ind=sphere_coord_t_0[:, :, :2, :],  # (BS, N, 2, 1)
-            output_size=(Hr, Wr),
-            scale_rate=(Hr / 64, Wr / 2048),
-        ).view(BS, -1, Hr, Wr)
+        if sph_range_in is None:
+            sph_range_in = VoxelMaxPool(
+                pcds_feat=sphere_coord_t_0[:, :, 2:3, :].permute(0, 2, 1, 3).contiguous(),  # (BS, 1, N, 1)
+                pcds_ind=sphere_plan_t_0,  # (BS, N, 2, 1)
+                output_size=(Hr, Wr),
+                scale_rate=(Hr / 64, Wr / 2048),
+            ).view(BS, -1, Hr, Wr)
 
-        return converters["RV2BEV"][Hr](rv_feat, sph_range_in), sph_range_in
+        range_bin = sph_range_in.int() if self.dvt_lut else sph_range_in
+        occupancy = self.occupancy("RV2BEV_{}".format(Hr), sphere_plan_t_0, (Hr, Wr), (Hr / 64, Wr / 2048))
+        return self.converters["RV2BEV"][str(Hr)](rv_feat, range_bin, occupancy), sph_range_in
 
     def des_2_sph_2d3d2d(self, des, des_coord_curr, sph_coord_curr):
         BS, C, H, W = des.shape
 
-        scale_rate, grid_to_point = descartes_scale_rates[H]
-        point = grid_to_point(des, des_coord_curr)
+        scale_rate, _ = descartes_scale_rates[H]
+        point = self.grid_to_point("2d3d2d", des, des_coord_curr, descartes_scale_rates)
 
         return (
             VoxelMinPool(
                 pcds_feat=point,
-                pcds_ind=sph_coord_curr[:, :, :2],
+                pcds_ind=sph_coord_curr,
                 output_size=(int(64 * scale_rate), int(2048 * scale_rate)),
                 scale_rate=(scale_rate, scale_rate),
             ),
@@ -169,51 +315,123 @@ class MultiViewNetwork(nn.Module):
     def sph_2_des_2d3d2d(self, sph, sph_coord_curr, des_coord_curr):
         BS, C, H, W = sph.shape
 
-        scale_rate, grid_to_point = sphere_scale_rates[H]
-        point = grid_to_point(sph, sph_coord_curr)
+        scale_rate, _ = sphere_scale_rates[H]
+        point = self.grid_to_point("2d3d2d", sph, sph_coord_curr, sphere_scale_rates)
 
         return (
             VoxelMaxPool(
                 pcds_feat=point,
-                pcds_ind=des_coord_curr[:, :, :2],
+                pcds_ind=des_coord_curr,
                 output_size=(int(512 * scale_rate), int(512 * scale_rate)),
                 scale_rate=(scale_rate, scale_rate),
             ),
             None,
         )
 
-    def forward(self, descartes_feat_in, des_coord_t0, sph_coord_t0, temporal_res):
+    @staticmethod
+    def height_maps(des_coord_t0, sph_coord_t0, plans):
         """
+        layer 별 BEV z map (min z), RV range map (max r) 을 scale 별로 한 번의 pooling 으로 계산
+        return: ({(H, W): (BS, 1, H, W)}, {(H, W): (BS, 1, H, W)})
+        """
+        des_plan, sph_plan = plans
+        bev_z = VoxelMinPoolMultiScale(
+            pcds_feat=des_coord_t0[:, :, 2:3, :].permute(0, 2, 1, 3),  # (BS, 1, N, 1)
+            pcds_ind=des_plan,
+            targets=[(size, (size[0] / 512, size[1] / 512)) for size in bev_z_sizes],
+        )
+        sph_range = VoxelMaxPoolMultiScale(
+            pcds_feat=sph_coord_t0[:, :, 2:3, :].permute(0, 2, 1, 3),  # (BS, 1, N, 1)
+            pcds_ind=sph_plan,
+            targets=[(size, (size[0] / 64, size[1] / 2048)) for size in sph_range_sizes],
+        )
+        return dict(zip(bev_z_sizes, bev_z)), dict(zip(sph_range_sizes, sph_range))
+
+    def encode(self, descartes_feat_in, des_coord_t0, sph_coord_t0, geometry=None):
+        """
+        temporal_res 와 무관한 Encoder 부분 (배치 내 각 샘플이 독립적이므로 여러 프레임을 한 배치로 묶어 실행 가능)
         descartes_feat_in : [BS, C=192, H, W]
         des_coord_t0 : [BS, N, 3, 1]
         sph_coord_t0 : [BS, N, 3, 1]
-        temporal_res : [BS, C, H, W]
+        geometry : 미리 계산한 FrameGeometry (없으면 여기서 계산)
         """
 
         is_direct = True
-        save_image = False
 
-        """Encoder"""
+        # 같은 좌표를 layer 마다 여러 scale 로 pooling / sampling 하므로 voxel offset, grid, z / range map 을 프레임마다 한 번만 계산
+        if geometry is None:
+            geometry = FrameGeometry.build(des_coord_t0, sph_coord_t0)
+        plans = geometry.plans
+        height_maps = geometry.height_maps if is_direct else None
 
         ## Layer-1 ##
         des1 = self.descartes_l1(descartes_feat_in)  # (BS, C=32, H=256, W=256)
-        des1_as_sph, des1_bev_z_in = self.transform_view(des1, des_coord_t0, sph_coord_t0, is_direct)  # (BS, C=32, H=32, W=1024)
+        des1_as_sph, des1_bev_z_in = self.transform_view(
+            des1, des_coord_t0, sph_coord_t0, is_direct, plans, height_maps
+        )  # (BS, C=32, H=32, W=1024)
         sph1 = self.sphere_l1(des1_as_sph)  # (BS, C=32, H=32, W=1024)
-        sph1_as_des, sph1_bev_z_in = self.transform_view(sph1, des_coord_t0, sph_coord_t0, is_direct)  # (BS, C=32, H=256, W=256)
+        sph1_as_des, sph1_bev_z_in = self.transform_view(
+            sph1, des_coord_t0, sph_coord_t0, is_direct, plans, height_maps
+        )  # (BS, C=32, H=256, W=256)
         l1_concat = torch.cat((des1, sph1_as_des), dim=1)  # (BS, C=64, H=256, W=256)
         l1_fused = self.l1_channel_down(l1_concat)  # (BS, C=32, H=256, W=256)
 
         ## Layer-2 ##
         des2 = self.descartes_l2(l1_fused)  # (BS, C=64, H=128, W=128)
-        des2_as_sph, des2_bev_z_in = self.transform_view(des2, des_coord_t0, sph_coord_t0, is_direct)  # (BS, C=64, H=16, W=512)
+        des2_as_sph, des2_bev_z_in = self.transform_view(
+            des2, des_coord_t0, sph_coord_t0, is_direct, plans, height_maps
+        )  # (BS, C=64, H=16, W=512)
         sph2 = self.sphere_l2(des2_as_sph)  # (BS, C=64, H=16, W=512)
-        sph2_as_des, sph2_bev_z_in = self.transform_view(sph2, des_coord_t0, sph_coord_t0, is_direct)  # (BS, C=64, H=128, W=128)
+        sph2_as_des, sph2_bev_z_in = self.transform_view(
+            sph2, des_coord_t0, sph_coord_t0, is_direct, plans, height_maps
+        )  # (BS, C=64, H=128, W=128)
         l2_concat = torch.cat((des2, sph2_as_des), dim=1)  # (BS, C=128, H=128, W=128)
         l2_fused = self.l2_channel_down(l2_concat)  # (BS, C=64, H=128, W=128)
 
         # Layer-3 ##
         des3 = self.descartes_l3(l2_fused)  # (BS, C=128, H=64, W=64)
 
+        encoded = {
+            "des1": des1,
+            "sph1": sph1,
+            "l1_fused": l1_fused,
+            "l2_fused": l2_fused,
+            "des3": des3,
+            "geometry": geometry,
+        }
+        if self.save_image:
+            encoded.update(
+                {
+                    "des1_as_sph": des1_as_sph,
+                    "sph1_as_des": sph1_as_des,
+                    "l1_concat": l1_concat,
+                    "des2": des2,
+                    "des2_as_sph": des2_as_sph,
+                    "sph2": sph2,
+                    "sph2_as_des": sph2_as_des,
+                    "l2_concat": l2_concat,
+                    "des1_bev_z_in": des1_bev_z_in,
+                    "sph1_bev_z_in": sph1_bev_z_in,
+                    "des2_bev_z_in": des2_bev_z_in,
+                    "sph2_bev_z_in": sph2_bev_z_in,
+                }
+            )
+        return encoded
+
+    def decode(self, encoded, des_coord_t0, sph_coord_t0, temporal_res):
+        """
+        Temporal fusion + Decoder + Backprojection (이전 프레임의 des3 에 의존하는 순차 부분)
+        encoded : encode() 결과
+        temporal_res : [BS, C, H, W]
+        """
+        des1, sph1, l1_fused, l2_fused, des3 = (
+            encoded["des1"],
+            encoded["sph1"],
+            encoded["l1_fused"],
+            encoded["l2_fused"],
+            encoded["des3"],
+        )
+
         """Temporal fusion"""
         if temporal_res is not None:
             fused = des3 + temporal_res  # (BS, C=64, H=128, W=128)
@@ -231,32 +449,44 @@ class MultiViewNetwork(nn.Module):
         aux2 = self.aux_head2(res2)  # (BS, C=3, H=256, W=256)
         aux3 = self.aux_head3(res3)  # (BS, C=3, H=256, W=256)
 
-        if save_image:
+        if self.save_image:
             self.save_feature_as_img(des1, "1-des1")
-            self.save_feature_as_img(des1_as_sph, "2-des1_as_sph")
+            self.save_feature_as_img(encoded["des1_as_sph"], "2-des1_as_sph")
             self.save_feature_as_img(sph1, "3-sph1")
-            self.save_feature_as_img(sph1_as_des, "4-sph1_as_des")
-            self.save_feature_as_img(l1_concat, "5-l1_concat")
+            self.save_feature_as_img(encoded["sph1_as_des"], "4-sph1_as_des")
+            self.save_feature_as_img(encoded["l1_concat"], "5-l1_concat")
             self.save_feature_as_img(l1_fused, "6-l1_fused")
-            self.save_feature_as_img(des2, "7-des2")
-            self.save_feature_as_img(des2_as_sph, "8-des2_as_sph")
-            self.save_feature_as_img(sph2, "9-sph2")
-            self.save_feature_as_img(sph2_as_des, "10-sph2_as_des")
-            self.save_feature_as_img(l2_concat, "11-l2_concat")
+            self.save_feature_as_img(encoded["des2"], "7-des2")
+            self.save_feature_as_img(encoded["des2_as_sph"], "8-des2_as_sph")
+            self.save_feature_as_img(encoded["sph2"], "9-sph2")
+            self.save_feature_as_img(encoded["sph2_as_des"], "10-sph2_as_des")
+            self.save_feature_as_img(encoded["l2_concat"], "11-l2_concat")
             self.save_feature_as_img(l2_fused, "12-l2_fused")
             self.save_feature_as_img(des3, "13-des3")
-            self.save_feature_as_img(des1_bev_z_in, "14-des1_bev_z_in")
-            self.save_feature_as_img(sph1_bev_z_in, "15-sph1_range_r_in")
-            self.save_feature_as_img(des2_bev_z_in, "16-des2_bev_z_in")
-            self.save_feature_as_img(sph2_bev_z_in, "17-sph2_range_r_in")
+            self.save_feature_as_img(encoded["des1_bev_z_in"], "14-des1_bev_z_in")
+            self.save_feature_as_img(encoded["sph1_bev_z_in"], "15-sph1_range_r_in")
+            self.save_feature_as_img(encoded["des2_bev_z_in"], "16-des2_bev_z_in")
+            self.save_feature_as_img(encoded["sph2_bev_z_in"], "17-sph2_range_r_in")
             self.save_feature_as_img(des_out, "18-des_out")
             raise Exception("ALL_FEATURES_SAVED. Stopping...")
 
         """Backprojection"""
-        _, des_grid_to_point = descartes_scale_rates[des_out.shape[2]]
-        _, sph_grid_to_point = sphere_scale_rates[sph1.shape[2]]
-
-        des_out_as_point = des_grid_to_point(des_out, des_coord_t0)  # (BS, C=64, N=160000, S=1)
-        sph_out_as_point = sph_grid_to_point(sph1, sph_coord_t0)  # (BS, C=32, N=160000, S=1)
+        geometry = encoded.get("geometry")
+        des_out_as_point = self.grid_to_point(
+            "des_out", des_out, geometry.des_plan if geometry is not None else des_coord_t0, descartes_scale_rates
+        )  # (BS, C=64, N=160000, S=1)
+        sph_out_as_point = self.grid_to_point(
+            "sph_out", sph1, geometry.sph_plan if geometry is not None else sph_coord_t0, sphere_scale_rates
+        )  # (BS, C=32, N=160000, S=1)
 
         return des_out_as_point, sph_out_as_point, aux1, aux2, aux3, des3
+
+    def forward(self, descartes_feat_in, des_coord_t0, sph_coord_t0, temporal_res):
+        """
+        descartes_feat_in : [BS, C=192, H, W]
+        des_coord_t0 : [BS, N, 3, 1]
+        sph_coord_t0 : [BS, N, 3, 1]
+        temporal_res : [BS, C, H, W]
+        """
+        encoded = self.encode(descartes_feat_in, des_coord_t0, sph_coord_t0)
+        return self.decode(encoded, des_coord_t0, sph_coord_t0, temporal_res)
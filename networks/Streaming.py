@@ -0,0 +1,192 @@
+import collections
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+import deep_point
+from datasets import utils
+
+
+class StreamingMOSNet:
+    """
+    온라인(10Hz) 스트리밍 추론용 MOSNet.infer 래퍼.
+    최근 T(=seq_num) 프레임의 (raw points, pose, PointNet feature) 를 ring buffer 로 유지한다.
+
+    mode="exact"       : history 프레임의 raw points 를 새 pose 로 다시 변환하여 7채널 point feature 와 PointNet 을
+                         모두 다시 계산한다. (파일 재로딩 없음, DataloadTest + MOSNet.infer 와 같은 결과)
+    mode="reuse_feats" : history 프레임의 PointNet feature 는 해당 프레임이 t_0 였을 때 계산한 값을 재사용하고,
+                         xyz 에 의존하는 BEV 좌표만 새 pose 로 다시 변환한다. PointNet 은 새 스캔에만 실행. (근사)
+    mode="bev_warp"    : 각 프레임의 BEV 입력 (64, 512, 512) 을 해당 프레임이 t_0 였을 때 한 번만 계산해 두고,
+                         history 는 ego-motion (pose 차이의 2D 회전 + 이동) 으로 BEV 를 현재 좌표계로 warp 하여 재사용한다.
+                         PointNet 과 VoxelMaxPool 은 새 스캔에만 실행. (근사, 롤/피치/z 이동은 무시)
+                         warp_interp="nearest" (기본) 또는 "bilinear"
+
+    시퀀스 시작 (history 가 T 개 미만) 에는 가장 오래된 프레임을 반복해서 채운다.
+    (DataloadVal/DataloadTest 는 시퀀스 시작 부분에서 미래 프레임을 사용하므로 처음 T-1 프레임의 결과는 다를 수 있음)
+    """
+
+    modes = ("exact", "reuse_feats", "bev_warp")
+
+    def __init__(self, model, pDataset, mode="exact", warp_interp="nearest"):
+        assert mode in self.modes, f"mode must in {self.modes}"
+        assert warp_interp in ("nearest", "bilinear")
+        self.model = model
+        self.mode = mode
+        self.warp_interp = warp_interp
+        self.seq_num = pDataset.seq_num
+        self.frame_point_num = pDataset.frame_point_num
+        self.Voxel = pDataset.Voxel
+        self.device = next(model.parameters()).device
+        self.workspace = deep_point.Workspace()  # 스캔마다 같은 shape 로 반복되는 deep_point 버퍼 재사용
+        self.reset()
+
+    def reset(self):
+        """새 시퀀스 시작 시 호출"""
+        self.frames = collections.deque(maxlen=self.seq_num)  # frames[0] : 현재 프레임
+        self.temporal_res = None
+
+    def _pad(self, pcds):
+        return utils.pad_frames([pcds], self.frame_point_num)
+
+    def _filter(self, pcds):
+        return utils.filter_pcds_mask(pcds, range_x=self.Voxel.range_x, range_y=self.Voxel.range_y, range_z=self.Voxel.range_z)
+
+    def _form_batch(self, pcds_total, seq_num):
+        """DataloadTest.form_batch 와 동일: (seq_num, 7, N, 1), (seq_num, N, 3, 1), (seq_num, N, 3, 1)"""
+        return utils.form_batch(pcds_total, seq_num, self.Voxel)
+
+    def _quantize_xy(self, xyz):
+        """utils.Quantize 의 x, y 부분 (torch, device 상에서 계산)"""
+        range_x, range_y = self.Voxel.range_x, self.Voxel.range_y
+        dx = (range_x[1] - range_x[0]) / self.Voxel.descartes_shape[0]
+        dy = (range_y[1] - range_y[0]) / self.Voxel.descartes_shape[1]
+        return torch.stack(((xyz[:, 0] - range_x[0]) / dx, (xyz[:, 1] - range_y[0]) / dy), dim=-1)
+
+    @torch.no_grad()
+    def step(self, pcds, pose):
+        """
+        pcds: (M, 4) 현재 스캔 (센서 좌표계의 x, y, z, intensity)
+        pose: (4, 4) 현재 스캔의 pose (utils.parse_poses 결과)
+        return: pred_cls (1, 3, N, 1), valid_mask (M,) ─ pred_cls[:, :, :valid_mask.sum()] 가 valid_mask 의 포인트에 대응
+        """
+        self.frames.appendleft({"pcds": pcds, "pose": pose})
+        with self.workspace:
+            if self.mode == "exact":
+                pred_cls, valid_mask = self._step_exact()
+            elif self.mode == "reuse_feats":
+                pred_cls, valid_mask = self._step_reuse_feats()
+            else:
+                pred_cls, valid_mask = self._step_bev_warp()
+        return pred_cls, valid_mask
+
+    def _history(self):
+        frames = list(self.frames)
+        return frames + [frames[-1]] * (self.seq_num - len(frames))
+
+    def _step_exact(self):
+        current_pose_inv = np.linalg.inv(self.frames[0]["pose"])
+
+        pc_list, valid_mask_list = [], []
+        for frame in self._history():
+            pcds_ht = utils.Trans(frame["pcds"], current_pose_inv.dot(frame["pose"]))
+            valid_mask_ht = self._filter(pcds_ht)
+            pc_list.append(pcds_ht[valid_mask_ht])
+            valid_mask_list.append(valid_mask_ht)
+
+        pcds_total = utils.pad_frames(pc_list, self.frame_point_num)
+        xyzi, descartes_coord, sphere_coord = self._form_batch(pcds_total, self.seq_num)
+        pred_cls, self.temporal_res = self.model.infer(
+            xyzi.unsqueeze(0).to(self.device),
+            descartes_coord.unsqueeze(0).to(self.device),
+            sphere_coord.unsqueeze(0).to(self.device),
+            self.temporal_res,
+        )
+        return pred_cls, valid_mask_list[0]
+
+    def _step_reuse_feats(self):
+        frame = self.frames[0]
+        valid_mask = self._filter(frame["pcds"])
+        pcds = self._pad(frame["pcds"][valid_mask])
+
+        # 새 스캔만 PointNet 실행 후 ring buffer 에 저장
+        xyzi, descartes_coord, sphere_coord = self._form_batch(pcds, 1)
+        xyzi = xyzi.to(self.device)
+        frame["point_feats"] = self.model.point_pre(xyzi)[0]  # (64, N, 1)
+        frame["xyz"] = torch.from_numpy(pcds[:, :3]).to(self.device)  # (N, 3) 자기 좌표계, padding 포함
+        frame["valid_num"] = int(valid_mask.sum())
+
+        # history 프레임은 BEV 좌표만 현재 좌표계로 다시 변환
+        current_pose_inv = np.linalg.inv(frame["pose"])
+        point_feats_list = [frame["point_feats"]]
+        descartes_coord_list = [descartes_coord[0].to(self.device)]
+        for history in self._history()[1:]:
+            pose_diff = torch.from_numpy(current_pose_inv.dot(history["pose"])).float().to(self.device)
+            xyz = history["xyz"].clone()
+            n = history["valid_num"]
+            xyz[:n] = xyz[:n].mm(pose_diff[:3, :3].t()) + pose_diff[:3, 3]
+
+            descartes_coord_ht = torch.zeros_like(descartes_coord_list[0])
+            descartes_coord_ht[:, :2, 0] = self._quantize_xy(xyz)
+            point_feats_list.append(history["point_feats"])
+            descartes_coord_list.append(descartes_coord_ht)
+
+        encoded = self.model.encode_point_feats(
+            torch.stack(point_feats_list, dim=0).unsqueeze(0),
+            torch.stack(descartes_coord_list, dim=0).unsqueeze(0),
+            sphere_coord.unsqueeze(0).to(self.device),
+        )
+        pred_cls, _, _, _, self.temporal_res = self.model.decode(encoded, self.temporal_res)
+        return pred_cls, valid_mask
+
+    def _warp_theta(self, pose_diff):
+        """
+        pose_diff: (4, 4) history -> 현재 좌표계 변환
+        return: (2, 3) F.affine_grid 용 theta. 현재 BEV 셀 중심 -> history BEV 의 정규화 좌표 (align_corners=False)
+        BEV 의 dim0(H) 가 x, dim1(W) 가 y 이므로 affine_grid 의 (x, y) = (W, H) = (y, x) 순서로 바꿔서 사용
+        """
+        range_x, range_y = self.Voxel.range_x, self.Voxel.range_y
+        inv = np.linalg.inv(pose_diff)  # 현재 -> history
+        A, b = inv[:2, :2], inv[:2, 3]
+        c = np.array([(range_x[0] + range_x[1]) / 2, (range_y[0] + range_y[1]) / 2])
+        S = np.array([(range_x[1] - range_x[0]) / 2, (range_y[1] - range_y[0]) / 2])
+
+        # 정규화 좌표 n 에서 p = c + S * n, p_h = A p + b  =>  n_h = (A * S / S[:, None]) n + (A c + b - c) / S
+        M = A * S[None, :] / S[:, None]
+        t = (A.dot(c) + b - c) / S
+        theta = np.zeros((2, 3))
+        theta[:, :2] = M[::-1, ::-1]
+        theta[:, 2] = t[::-1]
+        return torch.from_numpy(theta).float()
+
+    def _step_bev_warp(self):
+        frame = self.frames[0]
+        valid_mask = self._filter(frame["pcds"])
+        pcds = self._pad(frame["pcds"][valid_mask])
+
+        # 새 스캔만 PointNet + BEV 투영 후 ring buffer 에 저장 (자기 좌표계)
+        xyzi, descartes_coord, sphere_coord = self._form_batch(pcds, 1)
+        xyzi = xyzi.to(self.device)
+        descartes_coord = descartes_coord.to(self.device)
+        point_feats_t_0 = self.model.point_pre(xyzi)  # (1, 64, N, 1)
+        frame["bev"] = self.model.bev_project(point_feats_t_0, descartes_coord)  # (1, 64, 512, 512)
+
+        # history 프레임은 BEV 를 현재 좌표계로 warp
+        current_pose_inv = np.linalg.inv(frame["pose"])
+        bev_list = [frame["bev"]]
+        for history in self._history()[1:]:
+            if history is frame:
+                bev_list.append(frame["bev"])
+                continue
+            theta = self._warp_theta(current_pose_inv.dot(history["pose"])).to(self.device)
+            grid = F.affine_grid(theta.unsqueeze(0), list(history["bev"].shape), align_corners=False)
+            bev_list.append(F.grid_sample(history["bev"], grid, mode=self.warp_interp, padding_mode="zeros", align_corners=False))
+
+        encoded = self.model.encode_bev(
+            torch.cat(bev_list, dim=1),  # (1, 192, 512, 512)
+            point_feats_t_0,
+            descartes_coord,
+            sphere_coord.to(self.device),
+        )
+        pred_cls, _, _, _, self.temporal_res = self.model.decode(encoded, self.temporal_res)
+        return pred_cls, valid_mask
@@ -2,6 +2,8 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+import deep_point
+
 act_layer = nn.ReLU(inplace=True)
 
 
@@ -338,6 +340,29 @@ class PointNet(nn.Module):
         x_feat = self.layer(x)
         return x_feat
 
+    @staticmethod
+    def _bn_scale(bn):
+        """eval 모드 BatchNorm 을 y = scale * x + shift 로"""
+        scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+        return scale, bn.bias - bn.running_mean * scale
+
+    def fold(self):
+        """
+        BatchNorm 을 conv 에 합친 (weight (cout, cin), bias (cout,)), ReLU 여부 (eval 모드 forward 와 같은 계산)
+        """
+        modules = list(self.layer)
+        conv = [m for m in modules if isinstance(m, nn.Conv2d)][0]
+        conv_i = modules.index(conv)
+        weight = conv.weight[:, :, 0, 0]
+        bias = torch.zeros_like(weight[:, 0])
+        if conv_i > 0:  # pre_bn
+            scale, shift = self._bn_scale(modules[0])
+            bias = weight @ shift
+            weight = weight * scale.unsqueeze(0)
+
+        scale, shift = self._bn_scale(modules[conv_i + 1])
+        return weight * scale.unsqueeze(1), bias * scale + shift, len(modules) > conv_i + 2
+
 
 class PointNetStacker(nn.Module):
     def __init__(self, cin, cout, pre_bn=False, post_act=True, stack_num=1):
@@ -358,6 +383,18 @@ class PointNetStacker(nn.Module):
         x_feat = self.layer(x)
         return x_feat
 
+    def fold(self):
+        """
+        deep_point.PointNetVoxelMaxPool 에 넘길 layer 목록 [(weight, bias), ...] (BatchNorm fold, eval 모드 전용)
+        모든 layer 뒤에 ReLU 가 있어야 함 (post_act=True)
+        """
+        layers = []
+        for point_net in self.layer:
+            weight, bias, act = point_net.fold()
+            assert act, "PointNetVoxelMaxPool 은 모든 layer 뒤에 ReLU 가 필요 (post_act=True)"
+            layers.append((weight.detach(), bias.detach()))
+        return layers
+
 
 class BranchAttFusion(nn.Module):
     def __init__(self, in_channel_list, out_channel):
@@ -463,9 +500,12 @@ class BilinearSample(nn.Module):
         H = grid_feat.shape[2]
         W = grid_feat.shape[3]
 
-        grid_sample_x = (2 * grid_coord[:, :, 1] * self.scale_rate[1] / (W - 1)) - 1
-        grid_sample_y = (2 * grid_coord[:, :, 0] * self.scale_rate[0] / (H - 1)) - 1
+        if isinstance(grid_coord, deep_point.VoxelPlan):
+            grid_sample_2 = grid_coord.sample_grid((H, W), self.scale_rate)  # plan 에 캐시된 grid 재사용
+        else:
+            grid_sample_x = (2 * grid_coord[:, :, 1] * self.scale_rate[1] / (W - 1)) - 1
+            grid_sample_y = (2 * grid_coord[:, :, 0] * self.scale_rate[0] / (H - 1)) - 1
 
-        grid_sample_2 = torch.stack((grid_sample_x, grid_sample_y), dim=-1)
+            grid_sample_2 = torch.stack((grid_sample_x, grid_sample_y), dim=-1)
         pc_feat = F.grid_sample(grid_feat, grid_sample_2, mode="bilinear", padding_mode="zeros", align_corners=True)
         return pc_feat
@@ -0,0 +1,102 @@
+"""
+DVT 변환기 (BEV2RV / RV2BEV) 의 dense / sparse (occupancy) 경로 벤치마크
+
+python -m networks.benchmark_dvt --threads 1 4 --n 120000
+  - 합성 scan 하나를 datasets.utils.form_batch 로 양자화하여 MultiViewNetwork 와 같은 방식으로
+    z-bin (VoxelMinPool) / range-bin (VoxelMaxPool) map 과 occupancy (VoxelPlanEntry.occupancy) 를 만든다
+  - dense: 모든 입력 cell 을 scatter, sparse: occupancy 가 True 인 cell 만 scatter (MultiViewNetwork.dvt_sparse)
+  - sparse 결과가 dense scatter 에서 빈 cell 의 target 을 dummy 로 보낸 결과 (occupied cell 로 제한한 dense) 와 같은지 확인
+  - 각 scale, 스레드 수에 대해 forward 시간을 출력 (occupancy 계산 시간은 제외)
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+import torch
+
+import deep_point
+from config import config_MOS
+from datasets import utils
+from networks import DVT
+
+
+def make_scan(n, seed=0):
+    """(1, n, 3, 1) descartes_coord, (1, n, 3, 1) sphere_coord, 원점 주변의 합성 scan"""
+    rng = np.random.RandomState(seed)
+    r = rng.uniform(2, 60, n)
+    phi = rng.uniform(-math.pi, math.pi, n)
+    z = rng.uniform(-3.5, 1.5, n)
+    pcds = np.stack([r * np.cos(phi), r * np.sin(phi), z, rng.uniform(0, 1, n)], axis=-1).astype(np.float32)
+    _, descartes_coord, sphere_coord = utils.form_batch(pcds, 1, config_MOS.get_config()[0].Voxel)
+    return descartes_coord, sphere_coord
+
+
+def timeit(fn, repeat):
+    fn()  # warm up
+    start = time.time()
+    for _ in range(repeat):
+        fn()
+    return (time.time() - start) / repeat
+
+
+def restricted_dense(converter, feat, bins, occupancy, H, W):
+    """dense scatter 에서 빈 cell 의 target 을 dummy cell (H * W) 로 보낸 결과 (sparse 경로의 기준)"""
+    B, C = feat.shape[:2]
+    index = converter.target_index(bins.squeeze(1))
+    index = torch.where(occupancy.view(B, -1), index, torch.full_like(index, H * W))
+    return DVT.batched_scatter_max(feat.reshape(B, C, -1), index, H, W)
+
+
+def main(args):
+    descartes_coord, sphere_coord = make_scan(args.n)
+    descartes_plan = deep_point.VoxelPlan(descartes_coord[:, :, :2].contiguous())
+    sphere_plan = deep_point.VoxelPlan(sphere_coord[:, :, :2].contiguous())
+    converters = DVT.build_converters()
+    g = torch.Generator().manual_seed(0)
+    print("N={}, C={}, backend={}".format(args.n, args.channels, deep_point.get_backend("cpu")))
+
+    for H_b, H_r in DVT.scales:
+        W_b, W_r = DVT.sizes["BEV"][H_b][1], DVT.sizes["RV"][H_r][1]
+        bev_scale, rv_scale = (H_b / 512, W_b / 512), (H_r / 64, W_r / 2048)
+        # MultiViewNetwork.des_2_sph_2d2d / sph_2_des_2d2d 와 같은 z-bin / range-bin map
+        bev_z_in = deep_point.VoxelMinPool(
+            descartes_coord[:, :, 2:3].permute(0, 2, 1, 3).contiguous(), descartes_plan, (H_b, W_b), bev_scale
+        )
+        rv_range_in = deep_point.VoxelMaxPool(
+            sphere_coord[:, :, 2:3].permute(0, 2, 1, 3).contiguous(), sphere_plan, (H_r, W_r), rv_scale
+        )
+        bev_occupancy = descartes_plan.entry((H_b, W_b), bev_scale).occupancy
+        rv_occupancy = sphere_plan.entry((H_r, W_r), rv_scale).occupancy
+        bev_feat = torch.randn(1, args.channels, H_b, W_b, generator=g)
+        rv_feat = torch.randn(1, args.channels, H_r, W_r, generator=g)
+
+        cases = (
+            ("BEV2RV {}".format(H_b), converters["BEV2RV"][str(H_b)], bev_feat, bev_z_in, bev_occupancy, (H_r, W_r)),
+            ("RV2BEV {}".format(H_r), converters["RV2BEV"][str(H_r)], rv_feat, rv_range_in, rv_occupancy, (H_b, W_b)),
+        )
+        for name, converter, feat, bins, occupancy, target_size in cases:
+            sparse = converter(feat, bins, occupancy)
+            same = torch.equal(sparse, restricted_dense(converter, feat, bins, occupancy, *target_size))
+            print("[{}] occupied {:.1%}, sparse == occupied-only dense: {}".format(name, occupancy.float().mean().item(), same))
+            for threads in args.threads:
+                torch.set_num_threads(threads)
+                t_dense = timeit(lambda: converter(feat, bins), args.repeat)
+                t_sparse = timeit(lambda: converter(feat, bins, occupancy), args.repeat)
+                print(
+                    "[{}] threads {:2d}: dense {:8.2f} ms, sparse {:8.2f} ms (x{:.2f})".format(
+                        name, threads, t_dense * 1000, t_sparse * 1000, t_dense / t_sparse
+                    )
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DVT dense / occupancy-sparse benchmark")
+    parser.add_argument("--n", type=int, default=120000, help="points in the synthetic scan")
+    parser.add_argument("--channels", type=int, default=32)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, torch.get_num_threads()])
+    parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# BEV2RV / RV2BEV dense vs occupancy-sparse scatter (exactness check + CPU timing)
+python3 -m networks.benchmark_dvt --threads 1 4
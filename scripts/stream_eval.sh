@@ -0,0 +1,11 @@
+#!/bin/bash
+
+ConfigPath=config/config_MOS.py
+CheckpointModelEpoch=52 # this number means the epoch of the trained model. Please check experiments/config_MOS/checkpoint.
+
+export CUDA_VISIBLE_DEVICES=0
+
+python3 SwiftMOS_stream_eval.py \
+    --config $ConfigPath \
+    --model_epoch $CheckpointModelEpoch \
+    --modes exact reuse_feats bev_warp
@@ -6,6 +6,7 @@ from torch.utils.data import DataLoader
 from torch.utils.data.distributed import DistributedSampler
 
 from datasets import data_MOS
+from datasets.frame_cache import WindowSampler
 from networks import MainNetwork
 from utils import builder
 
@@ -51,7 +52,13 @@ def load_checkpoint(filename, model, optimizer, scheduler):
 def get_dataloaders(pDataset, pGen):
     # 데이터로더 준비
     train_dataset = data_MOS.DataloadTrain(pDataset.Train)
-    train_sampler = DistributedSampler(train_dataset)
+    if pDataset.Train.window_chunk > 0:
+        # 이웃한 window 를 같은 worker 가 처리하여 worker 별 frame cache 를 재사용
+        train_sampler = WindowSampler(
+            train_dataset, pGen.batch_size_per_gpu, pDataset.Train.num_workers, chunk_size=pDataset.Train.window_chunk
+        )
+    else:
+        train_sampler = DistributedSampler(train_dataset)
     train_loader = DataLoader(
         train_dataset,
         batch_size=pGen.batch_size_per_gpu,